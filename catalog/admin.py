@@ -6,6 +6,10 @@ from .models import (
     Catalog,
     CatalogItem,
     CatalogItemGroup,
+    CatalogSyncOutbox,
+    CatalogSyncRun,
+    CatalogTombstone,
+    InventoryLedgerEntry,
     Product,
     Collection,
     ProductSet,
@@ -23,3 +27,7 @@ admin.site.register(ProductGroupItem)
 admin.site.register(ProductSetItem)
 admin.site.register(CatalogItem)
 admin.site.register(CatalogItemGroup)
+admin.site.register(CatalogSyncRun)
+admin.site.register(CatalogSyncOutbox)
+admin.site.register(CatalogTombstone)
+admin.site.register(InventoryLedgerEntry)
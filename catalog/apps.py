@@ -4,3 +4,7 @@ from django.apps import AppConfig
 
 class CatalogConfig(AppConfig):
     name = 'catalog'
+
+    def ready(self):
+        # record tombstones for products removed from catalogs
+        from . import signals  # noqa: F401
@@ -121,3 +121,17 @@ class UpdateProductForm(forms.Form):
             attrs={"class": "mx-4 p-2 border rounded border-gray-300 text-gray-400"}
         ),
     )
+
+
+class ImportProductsForm(forms.Form):
+    file = forms.FileField(
+        label="Products file (.csv or .jsonl)",
+        widget=forms.ClearableFileInput(
+            attrs={"class": "mx-4 p-2", "accept": ".csv,.jsonl,.ndjson"}
+        ),
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Only validate, do not create products",
+        widget=forms.CheckboxInput(attrs={"class": "mx-4"}),
+    )
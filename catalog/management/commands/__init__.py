@@ -0,0 +1 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
@@ -0,0 +1,57 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+import platform
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from catalog.utils.benchmarks import BENCHMARK_SIZES, run_sync_benchmark
+from core.models.utils import datetime_utc_now_with_tz
+
+
+class Command(BaseCommand):
+    help = (
+        "Time catalog sync (get_catalog_item_batch_requests and post_item_batch) on seeded stores "
+        "against a local fake Graph API, and write the results as JSON to compare runs. "
+        "The seeded stores are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=list(BENCHMARK_SIZES), help="catalog sizes to benchmark"
+        )
+        parser.add_argument("--group-size", type=int, default=5, help="variants per product group")
+        parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fake Graph API response")
+        parser.add_argument("--seed", type=int, default=0, help="seed of the fake Graph API")
+        parser.add_argument("--output", help="write the results to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        runs = []
+        # peak RSS only goes up, so the smallest catalog is measured first
+        for products in sorted(options["sizes"]):
+            self.stderr.write("benchmarking {} products".format(products))
+            run = run_sync_benchmark(products, options["group_size"], options["latency"], options["seed"])
+            self.stderr.write("  get_catalog_item_batch_requests {wall_time}s {queries} queries".format(
+                **run["get_catalog_item_batch_requests"]
+            ))
+            self.stderr.write("  post_item_batch {wall_time}s {queries} queries {bytes_sent} bytes".format(
+                **run["post_item_batch"]
+            ))
+            runs.append(run)
+        results = {
+            "created": datetime_utc_now_with_tz().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "database": connection.vendor,
+            "group_size": options["group_size"],
+            "latency": options["latency"],
+            "runs": runs,
+        }
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.stderr.write("results written to {}".format(options["output"]))
+        else:
+            self.stdout.write(output)
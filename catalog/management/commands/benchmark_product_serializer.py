@@ -0,0 +1,45 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product
+from catalog.utils.serializers import ProductRowSerializer, product_rows
+
+
+class Command(BaseCommand):
+    help = "Compare serializing products for catalog sync with Product.get_json and ProductRowSerializer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store-id", type=int, help="only serialize the products of this store")
+        parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of each path")
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options["store_id"]:
+            products = products.filter(product_group__store_id=options["store_id"]) | products.filter(
+                catalogitem__catalog__store_id=options["store_id"]
+            )
+
+        def per_instance():
+            return [product.get_json() for product in products.select_related("product_group").iterator()]
+
+        def bulk():
+            serializer = ProductRowSerializer()
+            return [serializer.get_json(row) for row in product_rows(products).iterator()]
+
+        instance_payloads = per_instance()
+        if instance_payloads != bulk():
+            self.stderr.write("payloads differ between the two paths")
+            return
+        self.stdout.write("{} products".format(len(instance_payloads)))
+        for name, path in (("Product.get_json", per_instance), ("ProductRowSerializer", bulk)):
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                path()
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            self.stdout.write("{:<22} best {:.3f}s ({:.0f} products/s)".format(
+                name, best, len(instance_payloads) / best if best else 0
+            ))
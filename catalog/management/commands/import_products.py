@@ -0,0 +1,46 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Store
+from catalog.utils.imports import IMPORT_FORMATS, get_import_format, import_products, write_import_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Create products in a store's catalog from a csv or jsonl file, with bulk inserts. "
+        "Invalid rows are skipped and reported. The products are synced by the catalog sync outbox drain."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("store_id", type=int)
+        parser.add_argument("path", help="csv file with a heading row, or jsonl file with a json object per line")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, help="rows per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="only validate the rows")
+        parser.add_argument("--report", help="write the errors of invalid rows to this csv file")
+
+    def handle(self, *args, **options):
+        store = Store.objects.filter(id=options["store_id"]).first()
+        if store is None:
+            raise CommandError("Store {} does not exist".format(options["store_id"]))
+        try:
+            format = options["format"] or get_import_format(options["path"])
+        except Exception as e:
+            raise CommandError(e)
+        with open(options["path"], "rb") as f:
+            report = import_products(store, f, format, options["batch_size"], options["dry_run"])
+        if options["dry_run"]:
+            self.stdout.write("{rows} rows, {created} valid, {failed} failed".format(**report))
+        else:
+            self.stdout.write("{rows} rows, {created} products and {groups_created} product groups created, {failed} failed".format(
+                **report
+            ))
+        if options["report"]:
+            with open(options["report"], "w", newline="") as f:
+                write_import_report(report, f)
+            self.stdout.write("errors written to {}".format(options["report"]))
+        else:
+            for error in report["errors"][:20]:
+                self.stdout.write("row {}: {}".format(error["row"], error["errors"]))
+            if report["failed"] > 20:
+                self.stdout.write("... use --report to get all {} errors".format(report["failed"]))
@@ -0,0 +1,31 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Store
+from catalog.utils.inventory import materialize_inventory, rebuild_inventory, reconcile_inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Check product inventories against the sum of their applied inventory ledger entries, "
+        "after applying the pending entries. With --rebuild, set the mismatched inventories to their ledger balance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store", type=int, help="only check the products of this store")
+        parser.add_argument("--rebuild", action="store_true", help="set mismatched inventories to their ledger balance")
+
+    def handle(self, *args, **options):
+        store = None
+        if options["store"]:
+            store = Store.objects.filter(id=options["store"]).first()
+            if store is None:
+                raise CommandError("Store {} does not exist".format(options["store"]))
+        materialize_inventory()
+        mismatches = reconcile_inventory(store)
+        for product_id, inventory, ledger_balance in mismatches:
+            self.stdout.write("{}: inventory {}, ledger {}".format(product_id, inventory, ledger_balance))
+        self.stdout.write("{} mismatched products".format(len(mismatches)))
+        if options["rebuild"] and mismatches:
+            changed = rebuild_inventory([product_id for product_id, _, _ in mismatches])
+            self.stdout.write("{} inventories rebuilt from the ledger".format(len(changed)))
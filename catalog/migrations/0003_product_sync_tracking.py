@@ -0,0 +1,30 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:25
+
+import core.models.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_auto_20210304_1956'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='last_modified',
+            field=models.DateTimeField(blank=True, default=core.models.utils.datetime_utc_now_with_tz),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='last_synced',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productgroup',
+            name='last_modified',
+            field=models.DateTimeField(blank=True, default=core.models.utils.datetime_utc_now_with_tz),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_product_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sync_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_sync_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalog',
+            name='sync_concurrency',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:28
+
+import core.models.utils
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+        ('catalog', '0005_catalog_sync_concurrency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSyncRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('FULL', 'Full'), ('DELTA', 'Delta'), ('ITEMS', 'Items')], default='FULL', max_length=5)),
+                ('status', models.CharField(choices=[('SENT', 'Sent'), ('SUCCEEDED', 'Succeeded'), ('PARTIALLY_FAILED', 'Partially failed'), ('FAILED', 'Failed')], default='SENT', max_length=16)),
+                ('attempt', models.PositiveSmallIntegerField(default=1)),
+                ('created', models.DateTimeField(blank=True, default=core.models.utils.datetime_utc_now_with_tz)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('items_sent', models.PositiveIntegerField(default=0)),
+                ('items_skipped', models.PositiveIntegerField(default=0)),
+                ('items_failed', models.PositiveIntegerField(default=0)),
+                ('chunks', models.PositiveIntegerField(default=0)),
+                ('elapsed', models.FloatField(default=0)),
+                ('handles', models.TextField(blank=True, default='[]')),
+                ('errors', models.TextField(blank=True, default='[]')),
+                ('failed_items', models.TextField(blank=True, default='[]')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.store')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:30
+
+import core.models.utils
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+        ('catalog', '0006_catalog_sync_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSyncOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.CharField(max_length=100)),
+                ('created', models.DateTimeField(blank=True, default=core.models.utils.datetime_utc_now_with_tz)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.store')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
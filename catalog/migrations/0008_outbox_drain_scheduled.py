@@ -0,0 +1,19 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_catalog_sync_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogsyncoutbox',
+            name='drain_scheduled',
+            field=models.BooleanField(default=False),
+        ),
+    ]
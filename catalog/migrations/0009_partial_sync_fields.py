@@ -0,0 +1,24 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_outbox_drain_scheduled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogsyncoutbox',
+            name='fields',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='catalogsyncrun',
+            name='mode',
+            field=models.CharField(choices=[('FULL', 'Full'), ('DELTA', 'Delta'), ('ITEMS', 'Items'), ('FIELDS', 'Fields')], default='FULL', max_length=6),
+        ),
+    ]
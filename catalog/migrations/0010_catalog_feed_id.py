@@ -0,0 +1,19 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_partial_sync_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='catalog',
+            name='feed_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
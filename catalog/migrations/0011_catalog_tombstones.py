@@ -0,0 +1,37 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:36
+
+import core.models.utils
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+        ('catalog', '0010_catalog_feed_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogsyncrun',
+            name='items_deleted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CatalogTombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('retailer_id', models.CharField(max_length=100)),
+                ('created', models.DateTimeField(blank=True, default=core.models.utils.datetime_utc_now_with_tz)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.store')),
+                ('sync_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.catalogsyncrun')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='catalogtombstone',
+            constraint=models.UniqueConstraint(fields=('store', 'retailer_id'), name='unique_tombstone_for_store'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 09:52
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+VARIATION_FIELDS = ("color", "gender", "material", "pattern", "size")
+
+
+def set_variation_signatures(apps, schema_editor):
+    # index the variations of existing variants, and record the variation fields of their groups
+    Product = apps.get_model("catalog", "Product")
+    ProductGroup = apps.get_model("catalog", "ProductGroup")
+    groups = set()
+    signatures = set()
+    for product in Product.objects.exclude(product_group=None).order_by("product_group_id", "created").iterator():
+        variations = [[field, getattr(product, field)] for field in VARIATION_FIELDS if getattr(product, field)]
+        signature = hashlib.sha256(json.dumps(variations).encode("utf-8")).hexdigest() if variations else ""
+        if (product.product_group_id, signature) in signatures:
+            # a duplicate variant from before the check was enforced, keep it distinct.
+            # Product.save keeps this signature, see Product.get_duplicate_variation_signature
+            signature = hashlib.sha256((signature + product.id).encode("utf-8")).hexdigest()
+        signatures.add((product.product_group_id, signature))
+        Product.objects.filter(id=product.id).update(variation_signature=signature)
+        if product.product_group_id not in groups:
+            # the oldest variant decides the variation fields of the group
+            groups.add(product.product_group_id)
+            ProductGroup.objects.filter(id=product.product_group_id).update(
+                **{field: bool(getattr(product, field)) for field in VARIATION_FIELDS}
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_catalog_tombstones'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='productgroup',
+            name='color_variants',
+        ),
+        migrations.RemoveField(
+            model_name='productgroup',
+            name='gender_variants',
+        ),
+        migrations.RemoveField(
+            model_name='productgroup',
+            name='material_variants',
+        ),
+        migrations.RemoveField(
+            model_name='productgroup',
+            name='pattern_variants',
+        ),
+        migrations.RemoveField(
+            model_name='productgroup',
+            name='size_variants',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='variation_signature',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(set_variation_signatures, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('product_group', 'variation_signature'), name='unique_variation_signature_in_group'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 10:05
+
+import core.models.utils
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0001_initial'),
+        ('catalog', '0012_variation_signatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryLedgerEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('OPENING', 'Opening balance'), ('FULFILLMENT', 'Order fulfillment'), ('RESTOCK', 'Order cancellation restock'), ('MANUAL', 'Manual edit'), ('COMPACTED', 'Compacted')], max_length=11)),
+                ('reference', models.CharField(blank=True, default='', max_length=100)),
+                ('created', models.DateTimeField(blank=True, default=core.models.utils.datetime_utc_now_with_tz)),
+                ('applied', models.BooleanField(default=False)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shop.store')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inventoryledgerentry',
+            index=models.Index(fields=['product', 'applied', 'quantity'], name='inventory_ledger_balance'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryledgerentry',
+            index=models.Index(fields=['applied', 'created'], name='inventory_ledger_applied'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+# Generated by Django 3.1.4 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_product_sync_base_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogsyncrun',
+            name='sync_started',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='catalogsyncrun',
+            name='status',
+            field=models.CharField(choices=[('SENT', 'Sent'), ('SUCCEEDED', 'Succeeded'), ('PARTIALLY_FAILED', 'Partially failed'), ('FAILED', 'Failed'), ('UNCONFIRMED', 'Unconfirmed')], default='SENT', max_length=16),
+        ),
+    ]
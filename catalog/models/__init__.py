@@ -9,3 +9,5 @@ from .products import (
     ProductGroup,
     ProductGroupItem,
 )
+from .sync import CatalogSyncOutbox, CatalogSyncRun, CatalogTombstone
+from .inventory import InventoryLedgerEntry
@@ -1,4 +1,5 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
+from django.conf import settings
 from django.db import models
 from core.models import BaseModel
 from shop.models import Store
@@ -11,15 +12,23 @@ class Catalog(BaseModel):
 
     fields:
     store: the store this catalog belongs to
-    feed_id: the feed api id to use for syncing catalogs (DEPRECATED)
+    feed_id: id of the FB product feed that fetches this catalog's exported feed file,
+             as an alternative to syncing with items_batch. see catalog.utils.feeds
+    sync_concurrency: number of items_batch chunks uploaded in parallel when syncing this catalog.
+                      defaults to settings.CATALOG_SYNC_CONCURRENCY
     """
 
     store = models.ForeignKey(Store, on_delete=models.CASCADE)
-    feed_id = models.IntegerField(blank=True, null=True)
+    feed_id = models.BigIntegerField(blank=True, null=True)
+    sync_concurrency = models.PositiveSmallIntegerField(blank=True, null=True)
 
     def __str__(self):
         return "Catalog for {}. id={}".format(self.store.name, self.id)
 
+    def get_sync_concurrency(self):
+        concurrency = self.sync_concurrency or settings.CATALOG_SYNC_CONCURRENCY
+        return min(concurrency, settings.CATALOG_SYNC_MAX_CONCURRENCY)
+
 class CatalogItem(BaseModel):
     """ Represents one unique product item that is in a catalog"""
 
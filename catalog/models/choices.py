@@ -36,3 +36,52 @@ class Condition(models.TextChoices):
     NEW = "NEW", gettext_lazy("New")
     USED = "USED", gettext_lazy("Used")
     REFURB = "REFURB", gettext_lazy("Refurbished")
+
+
+class SyncMode(models.TextChoices):
+    """ Which products a catalog sync sends
+
+    FULL: every product in the catalog
+    DELTA: only products changed since their last sync
+    ITEMS: a specific set of products
+    FIELDS: only some fields of a specific set of products
+    """
+
+    FULL = "FULL", gettext_lazy("Full")
+    DELTA = "DELTA", gettext_lazy("Delta")
+    ITEMS = "ITEMS", gettext_lazy("Items")
+    FIELDS = "FIELDS", gettext_lazy("Fields")
+
+
+class SyncRunStatus(models.TextChoices):
+    """ Status of a catalog sync run
+
+    SENT: items_batch requests were sent, waiting on FB to process the batches
+    SUCCEEDED: FB processed all items without errors
+    PARTIALLY_FAILED: FB processed the batches but some items failed
+    FAILED: no batch was accepted by FB
+    UNCONFIRMED: FB did not report the status of every batch in time, the items are sent again
+    """
+
+    SENT = "SENT", gettext_lazy("Sent")
+    SUCCEEDED = "SUCCEEDED", gettext_lazy("Succeeded")
+    PARTIALLY_FAILED = "PARTIALLY_FAILED", gettext_lazy("Partially failed")
+    FAILED = "FAILED", gettext_lazy("Failed")
+    UNCONFIRMED = "UNCONFIRMED", gettext_lazy("Unconfirmed")
+
+
+class InventoryChangeReason(models.TextChoices):
+    """ Reason of an inventory ledger entry
+
+    OPENING: inventory of the product when the ledger started tracking it
+    FULFILLMENT: items of a fulfilled order shipped
+    RESTOCK: items of a cancelled order put back in stock
+    MANUAL: inventory edited by the merchant
+    COMPACTED: sum of old entries merged by the ledger compaction
+    """
+
+    OPENING = "OPENING", gettext_lazy("Opening balance")
+    FULFILLMENT = "FULFILLMENT", gettext_lazy("Order fulfillment")
+    RESTOCK = "RESTOCK", gettext_lazy("Order cancellation restock")
+    MANUAL = "MANUAL", gettext_lazy("Manual edit")
+    COMPACTED = "COMPACTED", gettext_lazy("Compacted")
@@ -0,0 +1,42 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.db import models
+from core.models import BaseModel
+from core.models.utils import datetime_utc_now_with_tz
+from shop.models import Store
+from .choices import InventoryChangeReason
+from .products import Product
+
+
+class InventoryLedgerEntry(BaseModel):
+    """One inventory movement of a product, in an append-only ledger.
+    Movements are recorded without locking the product, and applied to Product.inventory
+    in batches by materialize_inventory, so Product.inventory is the sum of the applied
+    entries of the product. Quantities are never changed, except by the compaction merging
+    old applied entries into one.
+
+    fields:
+    store: the store whose catalog the product is in
+    product: the product whose inventory moved
+    quantity: units added to the inventory, negative if removed
+    reason: what moved the inventory, such as an order fulfillment
+    reference: what the movement is for, such as the ext order id of an order. optional
+    applied: the quantity is included in Product.inventory
+    """
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=11, choices=InventoryChangeReason.choices)
+    reference = models.CharField(max_length=100, blank=True, default="")
+    created = models.DateTimeField(default=datetime_utc_now_with_tz, blank=True)
+    applied = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # the quantity is in the index so the balance of a product is summed from the index alone
+            models.Index(fields=['product', 'applied', 'quantity'], name='inventory_ledger_balance'),
+            models.Index(fields=['applied', 'created'], name='inventory_ledger_applied'),
+        ]
+
+    def __str__(self):
+        return "{} {:+d} ({})".format(self.product_id, self.quantity, self.reason)
@@ -1,4 +1,6 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
+import hashlib
+import json
 import uuid
 
 from django.db import models
@@ -43,31 +45,53 @@ class ProductGroup(BaseModel):
     product_set = models.ForeignKey(ProductSet, on_delete=models.CASCADE, blank=True, null=True)
     # store: the store this product group belongs to
     store = models.ForeignKey(Store, on_delete=models.CASCADE)
-    # core FB variation fields to be used for managing variant information of items in the group
+    # core FB variation fields populated by every variant in the group.
+    # all False until the first variant is added. the values of each variant are indexed
+    # as its Product.variation_signature
     color = models.BooleanField(default=False)
-    color_variants = models.TextField(blank=True, null=True)
     gender = models.BooleanField(default=False)
-    gender_variants = models.TextField(blank=True, null=True)
     material = models.BooleanField(default=False)
-    material_variants = models.TextField(blank=True, null=True)
     pattern = models.BooleanField(default=False)
-    pattern_variants = models.TextField(blank=True, null=True)
     size = models.BooleanField(default=False)
-    size_variants = models.TextField(blank=True, null=True)
     # custom variations.  should be comma separated key:value pairs.
     # ex: Scent:Fruity,Hypoallergenic:Yes,
     additional_variations = models.TextField(blank=True, null=True)
+    # last time the group was saved. renaming a group changes item_group_id of all its products
+    last_modified = models.DateTimeField(default=datetime_utc_now_with_tz, blank=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['store', 'name'], name='unique_product_group_name_for_store')
         ]
 
+    def save(self, *args, **kwargs):
+        self.last_modified = datetime_utc_now_with_tz()
+        super().save(*args, **kwargs)
+
+    def get_variation_fields(self):
+        # variation fields populated by the variants of the group, empty if it has no variant yet
+        return [field for field in Product.VARIATION_FIELDS if getattr(self, field)]
+
+    def set_variation_fields(self, fields):
+        # record the variation fields of the group's variants, without changing last_modified
+        # as the sync payload of its products does not change
+        values = {field: field in fields for field in Product.VARIATION_FIELDS}
+        for field, value in values.items():
+            setattr(self, field, value)
+        ProductGroup.objects.filter(id=self.id).update(**values)
+
     @staticmethod
     def _missing_variation_info(product_group, new_product):
-        ''' helper method to determine if any products in group have none-matching variation fields compared to new_product '''
-        existing_products = Product.objects.filter(product_group=product_group)
-        return any(new_product._missing_variation_info(product) for product in existing_products)
+        ''' helper method to determine if the products in group have none-matching variation fields compared to new_product '''
+        fields = product_group.get_variation_fields()
+        return bool(fields) and fields != new_product.get_variation_fields()
+
+    @staticmethod
+    def _has_variant(product_group, new_product):
+        ''' helper method to determine if a product in group has exactly the same variation values as new_product '''
+        return Product.objects.filter(
+            product_group=product_group, variation_signature=new_product.get_variation_signature()
+        ).exclude(id=new_product.id).exists()
 
 
 class Product(BaseModel):
@@ -77,6 +101,11 @@ class Product(BaseModel):
 
     """
 
+    # fields that can be synced on their own as a partial update of an existing item
+    PARTIAL_SYNC_FIELDS = ("inventory", "price", "availability")
+    # core FB variation fields, the variants of a product group differ by their values
+    VARIATION_FIELDS = ("color", "gender", "material", "pattern", "size")
+
     id = models.CharField(
         max_length=100, blank=True, unique=True, default=uuid.uuid4, primary_key=True
     )
@@ -93,6 +122,18 @@ class Product(BaseModel):
     )
     # date product was created on local db
     created = models.DateTimeField(default=datetime_utc_now_with_tz, blank=True)
+    # last time the product was saved on local db
+    last_modified = models.DateTimeField(default=datetime_utc_now_with_tz, blank=True)
+    # start time of the last catalog sync that successfully sent this product to FB
+    last_synced = models.DateTimeField(null=True, blank=True)
+    # hash of the get_json() payload as of the last successful sync
+    sync_hash = models.CharField(max_length=64, blank=True, default="")
+    # hash of the same payload without the PARTIAL_SYNC_FIELDS, as of the last successful full sync.
+    # tells whether a partial update brought the whole item in sync, see get_sync_base_hash
+    sync_base_hash = models.CharField(max_length=64, blank=True, default="")
+    # hash of the populated variation fields and their values, unique within a product group.
+    # set on save, see get_variation_signature
+    variation_signature = models.CharField(max_length=64, blank=True, default="")
 
     # human readable, and FB batch api compatible availability state
     @property
@@ -190,6 +231,27 @@ class Product(BaseModel):
     def __str__(self):
         return self.title
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product_group', 'variation_signature'], name='unique_variation_signature_in_group'
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        self.last_modified = datetime_utc_now_with_tz()
+        signature = self.get_variation_signature()
+        # a duplicate variant from before signatures were enforced keeps the distinct signature
+        # migration 0012 gave it, as long as its variations and the variant it duplicates do not change
+        if not (
+            self.variation_signature == self.get_duplicate_variation_signature(signature)
+            and Product.objects.filter(
+                product_group_id=self.product_group_id, variation_signature=signature
+            ).exclude(id=self.id).exists()
+        ):
+            self.variation_signature = signature
+        super().save(*args, **kwargs)
+
     def get_reqd_headings_list(self):
         # get list of fields for syncing
         headings = [
@@ -217,15 +279,49 @@ class Product(BaseModel):
         if self.size: headings.append("size")
         return headings
 
-    def get_json(self):
+    def needs_sync(self):
+        # check the product (or its product group) was saved after the product was last synced
+        if self.last_synced is None or self.last_modified > self.last_synced:
+            return True
+        return bool(self.product_group and self.product_group.last_modified > self.last_synced)
+
+    def get_json(self, fields=None):
         # get the json for syncing this product
-        data = {h: getattr(self, h) for h in self.get_reqd_headings_list()}
+        # if fields are provided, only those (and the id) are included for a partial update
+        headings = self.get_reqd_headings_list() if fields is None else ["id", *fields]
+        data = {h: getattr(self, h) for h in headings}
         return data
 
+    @staticmethod
+    def get_sync_hash(data):
+        # stable hash of a get_json() payload, used to skip syncing unchanged products
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def get_sync_base_hash(cls, data):
+        # hash of a get_json() payload without the fields a partial update can change
+        return cls.get_sync_hash({key: value for key, value in data.items() if key not in cls.PARTIAL_SYNC_FIELDS})
+
     def has_variation_info(self):
         # check the product instance has variations
         return self.color or self.gender or self.material or self.pattern or self.size or self.additional_variant_attribute
 
+    def get_variation_fields(self):
+        # core variation fields populated on this product
+        return [field for field in self.VARIATION_FIELDS if getattr(self, field)]
+
+    def get_variation_signature(self):
+        # stable hash of the populated variation fields and their values, "" if there are none.
+        # two variants with the same signature can not be told apart
+        variations = [[field, getattr(self, field)] for field in self.get_variation_fields()]
+        if not variations:
+            return ""
+        return hashlib.sha256(json.dumps(variations).encode("utf-8")).hexdigest()
+
+    def get_duplicate_variation_signature(self, signature):
+        # signature migration 0012 gave a variant that duplicates an older variant of its group
+        return hashlib.sha256((signature + str(self.id)).encode("utf-8")).hexdigest()
+
     def _need_variation_field(self, other, field_name)->List[str]:
         # check one of two products is missing a particular variation field
         if not getattr(self, field_name) and getattr(other, field_name):
@@ -243,21 +339,6 @@ class Product(BaseModel):
                 result.setdefault(prod,[]).append(field_name)
         return result
 
-    def _variation_eq(self, other):
-        # check two products have identical variation fields and values
-        field_names = ["color", "gender", "material", "pattern", "size"]
-        self_fields = set()
-        eq_fields = set()
-        for field_name in field_names:
-            field_val = getattr(self, field_name)
-            if field_val:
-                self_fields.add(field_name)
-                if field_val == getattr(other, field_name):
-                    eq_fields.add(field_name)
-        if eq_fields==self_fields:
-            return True
-
-
 
 class ProductGroupItem(BaseModel):
     """Represents one unique product that is a variation that belongs in a
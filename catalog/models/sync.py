@@ -0,0 +1,104 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+
+from django.db import models
+from core.models import BaseModel
+from core.models.utils import datetime_utc_now_with_tz
+from shop.models import Store
+from .choices import SyncMode, SyncRunStatus
+
+
+class CatalogSyncRun(BaseModel):
+    """Represents a single catalog sync to FB and its outcome.
+    Created when the items_batch requests are sent, and completed once FB
+    reports the status of every batch handle.
+
+    fields:
+    store: the store whose catalog was synced
+    mode: full, delta or specific items sync
+    status: outcome of the sync
+    attempt: 1 for a regular sync, higher for retries of items that failed in a previous run
+    items_deleted: number of tombstoned items sent as DELETE requests
+    handles: json list of the batch handles returned by items_batch
+    errors: json list of the per item errors
+    failed_items: json list of the retailer ids that failed
+    """
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    mode = models.CharField(max_length=6, choices=SyncMode.choices, default=SyncMode.FULL)
+    status = models.CharField(
+        max_length=16,
+        choices=SyncRunStatus.choices,
+        default=SyncRunStatus.SENT,
+    )
+    attempt = models.PositiveSmallIntegerField(default=1)
+    created = models.DateTimeField(default=datetime_utc_now_with_tz, blank=True)
+    # start time of the sync, stored as last_synced of the products it marked as synced
+    sync_started = models.DateTimeField(null=True, blank=True)
+    # time FB finished processing all batches of the run
+    finished = models.DateTimeField(null=True, blank=True)
+    items_sent = models.PositiveIntegerField(default=0)
+    items_skipped = models.PositiveIntegerField(default=0)
+    items_failed = models.PositiveIntegerField(default=0)
+    items_deleted = models.PositiveIntegerField(default=0)
+    chunks = models.PositiveIntegerField(default=0)
+    # seconds spent uploading the chunks
+    elapsed = models.FloatField(default=0)
+    handles = models.TextField(blank=True, default="[]")
+    errors = models.TextField(blank=True, default="[]")
+    failed_items = models.TextField(blank=True, default="[]")
+
+    def __str__(self):
+        return "{} sync of {} ({})".format(self.mode, self.store.name, self.status)
+
+    def get_handles(self):
+        return json.loads(self.handles)
+
+    def get_errors(self):
+        return json.loads(self.errors)
+
+    def get_failed_items(self):
+        return json.loads(self.failed_items)
+
+
+class CatalogSyncOutbox(BaseModel):
+    """A product change waiting to be synced to FB.
+    Rows are written in the same transaction as the change itself, and drained
+    in batches by drain_catalog_outbox, which coalesces changes per product.
+
+    fields:
+    store: the store whose catalog the product is in
+    product_id: id of the changed product. not a foreign key so the row outlives the product
+    drain_scheduled: a debounced drain of the store's outbox has been queued for this row, and has not started yet
+    fields: comma separated Product.PARTIAL_SYNC_FIELDS that changed. blank if the whole product should be synced
+    """
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    product_id = models.CharField(max_length=100)
+    created = models.DateTimeField(default=datetime_utc_now_with_tz, blank=True)
+    drain_scheduled = models.BooleanField(default=False)
+    fields = models.CharField(max_length=100, blank=True, default="")
+
+
+class CatalogTombstone(BaseModel):
+    """A product removed from a store's catalog that still has to be deleted on FB.
+    Sent as a DELETE request by the next catalog sync, and removed once FB
+    confirms the batch it was sent in.
+
+    fields:
+    store: the store whose catalog the product was removed from
+    retailer_id: id of the removed product on FB. not a foreign key as the product may be deleted
+    sync_run: the sync the DELETE was sent in. empty while the tombstone waits for the next sync
+    attempts: number of syncs the DELETE was sent in
+    """
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE)
+    retailer_id = models.CharField(max_length=100)
+    created = models.DateTimeField(default=datetime_utc_now_with_tz, blank=True)
+    sync_run = models.ForeignKey(CatalogSyncRun, on_delete=models.SET_NULL, blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'retailer_id'], name='unique_tombstone_for_store')
+        ]
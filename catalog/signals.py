@@ -0,0 +1,31 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from catalog.models import CatalogItem, CatalogItemGroup, Product
+from catalog.utils.tombstones import record_tombstones
+
+
+@receiver(pre_delete, sender=CatalogItem)
+def tombstone_catalog_item(sender, instance, **kwargs):
+    ''' a product leaving the catalog, including when the product itself is deleted '''
+    record_tombstones(instance.catalog.store_id, [instance.product_id])
+
+
+@receiver(pre_delete, sender=CatalogItemGroup)
+def tombstone_catalog_item_group(sender, instance, **kwargs):
+    ''' all variants of a product group leaving the catalog '''
+    variant_ids = Product.objects.filter(product_group_id=instance.product_group_id).values_list("id", flat=True)
+    record_tombstones(instance.catalog.store_id, list(variant_ids))
+
+
+@receiver(pre_delete, sender=Product)
+def tombstone_variant(sender, instance, **kwargs):
+    ''' a variant deleted from a product group that is in a catalog '''
+    if not instance.product_group_id:
+        return
+    cat_item_group = CatalogItemGroup.objects.filter(
+        product_group_id=instance.product_group_id
+    ).select_related("catalog").first()
+    if cat_item_group:
+        record_tombstones(cat_item_group.catalog.store_id, [instance.id])
@@ -1,24 +1,200 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from catalog.utils import post_item_batch_by_id
+from django.conf import settings
+from django.db import transaction
+from catalog.models import CatalogSyncOutbox, CatalogSyncRun
+from catalog.models.choices import SyncRunStatus
+from catalog.utils import drain_catalog_outbox, post_item_batch_by_id
+from catalog.utils.feeds import register_catalog_feed, write_catalog_feed
+from catalog.utils.sync_runs import check_sync_run, give_up_sync_run
+from shop.models import Store
 
 logger = get_task_logger(__name__)
 
 @shared_task
-def sync_catalog_async(store_id, allow_upsert=True, items=None):
+def sync_catalog_async(store_id, allow_upsert=True, items=None, changed_only=False, attempt=1):
     ''' async task to sync catalog to FB
 
     params:
     store_id: store whose catalog is to be sync's
     allow_upsert: if True, items in the batch request not in the FB catalog will be created.
     items: specific set of items to sync
+    changed_only: if True, only sync products changed since their last sync (delta sync)
+    attempt: 1 for a regular sync, higher when retrying items that failed in a previous sync
     '''
 
-    logger.info("sync_catalog_async for store id {}{}".format(
+    logger.info("sync_catalog_async ({}) for store id {}{}".format(
+            "delta" if changed_only else "full",
             store_id,
             ", and products: {}".format(items) if items else "."
         )
     )
-    res = post_item_batch_by_id(store_id, allow_upsert, items)
-    logger.info("post_item_batch_by_id response: {}".format(res.json()))
+    sync_catalog(store_id, allow_upsert, items, changed_only, attempt)
+
+
+def sync_catalog(store_id, allow_upsert=True, items=None, changed_only=False, attempt=1):
+    ''' sync catalog to FB, and queue the polling of the sync run, or the retry of its failed items
+    see sync_catalog_async for params
+
+    returns:
+    summary: summary of the sync (see post_item_batch), None if the store can not be synced
+    '''
+    summary = post_item_batch_by_id(store_id, allow_upsert, items, changed_only, attempt)
+    if summary is None:
+        return None
+    logger.info("post_item_batch_by_id sent {} items in {} chunks in {:.2f}s, skipped {} unchanged, deleted {}, handles: {}".format(
+            summary["items"], len(summary["chunks"]), summary["elapsed"], summary["skipped"], summary["deleted"], summary["handles"]
+        )
+    )
+    for error in summary["errors"]:
+        logger.warning("post_item_batch_by_id error: {}".format(error))
+
+    follow_up_sync_run(CatalogSyncRun.objects.get(id=summary["sync_run_id"]))
+    return summary
+
+
+def sync_catalog_outbox(limit=None, store_id=None):
+    ''' sync the product changes queued in the catalog sync outbox (see drain_catalog_outbox),
+    and queue the polling of the sync runs, or the retry of their failed items, like sync_catalog
+
+    params:
+    limit: optional. max number of outbox rows to drain
+    store_id: optional. only drain the rows of this store
+    returns:
+    results: see drain_catalog_outbox
+    '''
+    results = drain_catalog_outbox(limit=limit, store_id=store_id)
+    sync_run_ids = [sync_run_id for result in results.values() for sync_run_id in result["sync_run_ids"]]
+    for sync_run in CatalogSyncRun.objects.filter(id__in=sync_run_ids):
+        follow_up_sync_run(sync_run)
+    return results
+
+
+def follow_up_sync_run(sync_run: CatalogSyncRun):
+    ''' queue the polling of a sync run FB accepted batches for, or the retry of its failed items '''
+    if sync_run.status == SyncRunStatus.SENT:
+        check_catalog_sync_run_async.apply_async(
+            args=[sync_run.id], countdown=settings.CATALOG_SYNC_STATUS_POLL_INTERVAL
+        )
+    else:
+        retry_failed_items(sync_run)
+
+
+@shared_task(bind=True, max_retries=None)
+def check_catalog_sync_run_async(self, sync_run_id):
+    ''' async task to poll the items_batch handles of a sync run until FB has processed them
+    items that failed are then synced again with backoff
+
+    params:
+    sync_run_id: id of the CatalogSyncRun to check
+    '''
+    sync_run = CatalogSyncRun.objects.get(id=sync_run_id)
+    if not check_sync_run(sync_run):
+        if self.request.retries >= settings.CATALOG_SYNC_STATUS_MAX_POLLS:
+            cleared = give_up_sync_run(sync_run)
+            logger.warning("sync run {} still not processed, giving up polling. {} products will be synced again".format(
+                    sync_run_id, cleared
+                )
+            )
+            return
+        raise self.retry(countdown=settings.CATALOG_SYNC_STATUS_POLL_INTERVAL)
+    logger.info("sync run {} finished: {}, {} failed items".format(
+            sync_run_id, sync_run.status, sync_run.items_failed
+        )
+    )
+    retry_failed_items(sync_run)
+
+
+def retry_failed_items(sync_run: CatalogSyncRun):
+    ''' queue a sync of only the items that failed in a sync run, with exponential backoff '''
+    failed_items = sync_run.get_failed_items()
+    if not failed_items:
+        return
+    if sync_run.attempt >= settings.CATALOG_SYNC_MAX_ATTEMPTS:
+        logger.warning("sync run {}: {} items still failing after {} attempts".format(
+                sync_run.id, len(failed_items), sync_run.attempt
+            )
+        )
+        return
+    countdown = settings.CATALOG_SYNC_RETRY_BACKOFF * 2 ** (sync_run.attempt - 1)
+    logger.info("retrying {} failed items of sync run {} in {}s".format(
+            len(failed_items), sync_run.id, countdown
+        )
+    )
+    sync_catalog_async.apply_async(kwargs={
+        "store_id": sync_run.store_id,
+        "items": failed_items,
+        "attempt": sync_run.attempt + 1,
+    }, countdown=countdown)
+
+
+def request_catalog_sync(store_id):
+    ''' debounced sync of the product changes queued in a store's catalog sync outbox
+    the first request queues a drain of the store's outbox in settings.CATALOG_SYNC_DEBOUNCE_SECONDS.
+    requests arriving before that drain starts are merged into it, so the products are sent once.
+    the rows are flagged and the drain queued under the store's outbox lock, in one transaction:
+    if the drain can not be queued the flags are rolled back.
+
+    params:
+    store_id: store whose queued product changes should be synced
+    returns:
+    scheduled: True if this request queued the drain, False if it was merged into a queued one
+    '''
+    with transaction.atomic():
+        lock_store_outbox(store_id)
+        pending = CatalogSyncOutbox.objects.filter(store_id=store_id)
+        if pending.filter(drain_scheduled=True).exists():
+            return False
+        if not pending.update(drain_scheduled=True):
+            return False
+        drain_store_catalog_outbox_async.apply_async(
+            kwargs={"store_id": store_id}, countdown=settings.CATALOG_SYNC_DEBOUNCE_SECONDS
+        )
+    return True
+
+
+def lock_store_outbox(store_id):
+    # the store row serializes the debounce flags of the store's outbox rows
+    list(Store.objects.select_for_update().filter(id=store_id).values_list("id", flat=True))
+
+
+@shared_task
+def drain_store_catalog_outbox_async(store_id):
+    ''' async task to sync the product changes queued in a store's catalog sync outbox
+    the drain clears the debounce flags when it starts, so changes queued while it runs get a
+    drain of their own, and requests one more drain for the rows left past the batch size.
+
+    params:
+    store_id: store whose outbox is to be drained
+    '''
+    with transaction.atomic():
+        lock_store_outbox(store_id)
+        CatalogSyncOutbox.objects.filter(store_id=store_id, drain_scheduled=True).update(drain_scheduled=False)
+    result = sync_catalog_outbox(store_id=store_id).get(store_id)
+    if result:
+        logger.info("drained {} outbox rows into a sync of {} products ({} partial) for store id {} ({} collapsed)".format(
+                result["rows"], result["items"], result["partial_items"], store_id, result["collapsed"]
+            )
+        )
+    if request_catalog_sync(store_id):
+        logger.info("outbox rows left for store id {}, drain queued".format(store_id))
+
+
+@shared_task
+def export_catalog_feed_async(store_id, register=False):
+    ''' async task to export a store's catalog as a feed file for FB to fetch
+
+    params:
+    store_id: store whose catalog is to be exported
+    register: if True, also create the FB product feed for the catalog if it does not have one yet
+    '''
+    store = Store.objects.get(id=store_id)
+    result = write_catalog_feed(store)
+    logger.info("exported {} products to the catalog feed of store id {} ({})".format(
+            result["items"], store_id, "changed" if result["changed"] else "unchanged"
+        )
+    )
+    if register:
+        feed_id = register_catalog_feed(store)
+        logger.info("catalog feed of store id {} registered as FB feed {}".format(store_id, feed_id))
@@ -1,4 +1,716 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models.utils import datetime_utc_now_with_tz
+from core.utils.fake_graph_api import fake_graph_api
+from shop.utils import createStore
+from order.models import Order
+from order.utils.synthetic import generate_orders
+from .models import (
+    CatalogItem, CatalogItemGroup, CatalogSyncOutbox, CatalogSyncRun, CatalogTombstone, InventoryLedgerEntry, Product,
+    ProductGroup,
+)
+from .models.choices import Availability, InventoryChangeReason, SyncRunStatus
+from .tasks import (
+    check_catalog_sync_run_async, drain_store_catalog_outbox_async, request_catalog_sync, sync_catalog_async,
+    sync_catalog_outbox,
+)
+from .utils import create_product
+from .utils.benchmarks import run_sync_benchmark
+from .utils.catalogs import get_catalog_item_batch_requests, post_item_batch, update_product
+from .utils.feeds import get_feed_credentials, get_feed_path, write_catalog_feed
+from .utils.imports import import_products
+from .utils.item_batch import chunk_item_batch_requests, get_upload_executor, post_item_batch_chunks
+from .utils.inventory import (
+    compact_inventory_ledger, materialize_inventory, rebuild_inventory, reconcile_inventory, record_inventory_changes,
+)
+from .utils.outbox import record_product_changes
+from .utils.serializers import ProductRowSerializer, product_rows
+from .utils.sync_runs import check_sync_run, give_up_sync_run
+from .utils.synthetic import create_synthetic_store, generate_catalog
+
+
+class CatalogItemBatchRequestsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="merchant")
+        self.store = createStore("Test Store", user, None)
+
+    def add_products(self, count):
+        ''' add `count` standalone products and a new product group with `count` variants '''
+        offset = len(get_catalog_item_batch_requests(self.store))
+        first_variant = None
+        for i in range(offset, offset + count):
+            create_product(
+                self.store.catalog_id, "", "", "Product {}".format(i), "description",
+                "10.00", 5, "https://example.com", "https://example.com/image.png",
+            )
+            variant = create_product(
+                self.store.catalog_id, "", "", "Variant {}".format(i), "description",
+                "10.00", 5, "https://example.com", "https://example.com/image.png",
+                product_group_name="Group {}".format(offset), store=self.store,
+                orig_product=first_variant, size=str(i),
+            )
+            first_variant = first_variant or variant
+
+    def test_query_count_is_constant(self):
+        self.add_products(2)
+        with self.assertNumQueries(2):
+            small = get_catalog_item_batch_requests(self.store)
+        self.add_products(10)
+        with self.assertNumQueries(2):
+            large = get_catalog_item_batch_requests(self.store)
+        self.assertEqual(len(small), 4)
+        self.assertEqual(len(large), 24)
+        grouped = [r["data"] for r in large if "item_group_id" in r["data"]]
+        self.assertEqual(len(grouped), 12)
+
+
+class ChunkItemBatchRequestsTests(SimpleTestCase):
+    def get_requests(self, count, description="description"):
+        return [{"method": "UPDATE", "data": {"id": str(n), "description": description}} for n in range(count)]
+
+    def test_chunks_bounded_by_count(self):
+        item_requests = self.get_requests(5)
+        chunks = list(chunk_item_batch_requests(item_requests, max_items=2, max_bytes=10000))
+        self.assertEqual([len(chunk) for chunk, _ in chunks], [2, 2, 1])
+        self.assertEqual([request for chunk, _ in chunks for request in chunk], item_requests)
+        for chunk, payload in chunks:
+            self.assertEqual(json.loads(payload), chunk)
+
+    def test_chunks_bounded_by_size(self):
+        item_requests = self.get_requests(20)
+        max_bytes = len(json.dumps(item_requests[:3])) + 5
+        chunks = list(chunk_item_batch_requests(item_requests, max_items=100, max_bytes=max_bytes))
+        self.assertEqual([len(chunk) for chunk, _ in chunks], [3] * 6 + [2])
+        for chunk, payload in chunks:
+            self.assertLessEqual(len(payload), max_bytes)
+            self.assertEqual(json.loads(payload), chunk)
+
+    def test_oversize_request_sent_alone(self):
+        item_requests = self.get_requests(3)
+        item_requests[1]["data"]["description"] = "x" * 500
+        chunks = list(chunk_item_batch_requests(item_requests, max_items=100, max_bytes=200))
+        self.assertEqual([[r["data"]["id"] for r in chunk] for chunk, _ in chunks], [["0"], ["1"], ["2"]])
+
+    def test_results_in_chunk_order(self):
+        # later chunks finish first
+        def post_chunk(url, data, index, chunk, payload, rate_limit_scope=None):
+            time.sleep(0.05 * (4 - index))
+            return {"index": index, "items": len(chunk), "bytes": len(payload), "status_code": 200,
+                    "handles": ["handle_{}".format(index)], "errors": [], "elapsed": 0.0}
+        posted = []
+        chunks = chunk_item_batch_requests(self.get_requests(5), max_items=1, max_bytes=10000)
+        with patch("catalog.utils.item_batch.post_item_batch_chunk", side_effect=post_chunk):
+            summary = post_item_batch_chunks(
+                "url", {}, chunks, lambda chunk, chunk_summary: posted.append(chunk[0]["data"]["id"]), concurrency=5
+            )
+        self.assertEqual([chunk["index"] for chunk in summary["chunks"]], [0, 1, 2, 3, 4])
+        self.assertEqual(summary["handles"], ["handle_{}".format(n) for n in range(5)])
+        self.assertEqual(posted, ["0", "1", "2", "3", "4"])
+        self.assertEqual(summary["items"], 5)
+
+    def test_concurrent_syncs_share_upload_threads(self):
+        uploading = []
+        max_uploading = []
+        lock = threading.Lock()
+
+        def post_chunk(url, data, index, chunk, payload, rate_limit_scope=None):
+            with lock:
+                uploading.append(index)
+                max_uploading.append(len(uploading))
+            time.sleep(0.02)
+            with lock:
+                uploading.remove(index)
+            return {"index": index, "items": len(chunk), "bytes": len(payload), "status_code": 200,
+                    "handles": ["handle"], "errors": [], "elapsed": 0.0}
+
+        def sync():
+            chunks = chunk_item_batch_requests(self.get_requests(8), max_items=1, max_bytes=10000)
+            summaries.append(post_item_batch_chunks("url", {}, chunks, concurrency=4))
+
+        summaries = []
+        with self.settings(GRAPH_API_POOL_SIZE=3), patch("catalog.utils.item_batch._upload_executor", None), \
+                patch("catalog.utils.item_batch.post_item_batch_chunk", side_effect=post_chunk):
+            syncs = [threading.Thread(target=sync) for _ in range(3)]
+            for thread in syncs:
+                thread.start()
+            for thread in syncs:
+                thread.join()
+            get_upload_executor().shutdown()
+        # 3 syncs of 4 upload slots each share the 3 threads of the pool size
+        self.assertEqual(max(max_uploading), 3)
+        self.assertEqual([summary["items"] for summary in summaries], [8, 8, 8])
+
+
+class ProductRowSerializerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="merchant")
+        self.store = createStore("Test Store", user, None)
+        create_product(
+            self.store.catalog_id, "", "", "Plain", "description",
+            "10.50", 5, "https://example.com", "https://example.com/image.png",
+        )
+        categorized = create_product(
+            self.store.catalog_id, "154", "Cameras & Optics > Cameras > Film Cameras", "Camera", "description",
+            "1234.00", 0, "https://example.com", "https://example.com/image.png", brand="Brand",
+        )
+        categorized._availability = Availability.OUT_OF_STOCK
+        categorized.save()
+        variant = create_product(
+            self.store.catalog_id, "", "", "Shirt", "description",
+            "20.00", 3, "https://example.com", "https://example.com/image.png",
+            product_group_name="Shirts", store=self.store, color="red", size="M",
+        )
+        create_product(
+            self.store.catalog_id, "", "", "Shirt", "description",
+            "20.00", 3, "https://example.com", "https://example.com/image.png",
+            store=self.store, orig_product=variant, color="blue", size="L",
+        )
+
+    def test_same_payload_as_get_json(self):
+        serializer = ProductRowSerializer()
+        rows = {row["id"]: row for row in product_rows()}
+        self.assertEqual(len(rows), 4)
+        for product in Product.objects.all():
+            self.assertEqual(serializer.get_json(rows[product.id]), product.get_json())
+            self.assertEqual(
+                serializer.get_json(rows[product.id], Product.PARTIAL_SYNC_FIELDS),
+                product.get_json(Product.PARTIAL_SYNC_FIELDS),
+            )
+
+    def test_item_batch_requests_use_same_payload(self):
+        payloads = {r["data"]["id"]: r["data"] for r in get_catalog_item_batch_requests(self.store)}
+        self.assertEqual(payloads, {product.id: product.get_json() for product in Product.objects.all()})
+
+
+class VariantSignatureTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="merchant")
+        self.store = createStore("Test Store", user, None)
+
+    def add_variant(self, **variations):
+        return create_product(
+            self.store.catalog_id, "", "", "Shirt", "description",
+            "20.00", 3, "https://example.com", "https://example.com/image.png",
+            product_group_name="Shirts", store=self.store, **variations
+        )
+
+    def test_variant_checks_do_not_grow_with_group(self):
+        first = self.add_variant(color="red", size="0")
+        self.assertEqual(first.product_group.get_variation_fields(), ["color", "size"])
+        with CaptureQueriesContext(connection) as small:
+            self.add_variant(color="red", size="1")
+        for i in range(2, 20):
+            self.add_variant(color="red", size=str(i))
+        with CaptureQueriesContext(connection) as large:
+            self.add_variant(color="red", size="20")
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Product.objects.filter(product_group=first.product_group).count(), 21)
+
+    def test_duplicate_and_mismatched_variants(self):
+        self.add_variant(color="red", size="M")
+        with self.assertRaisesMessage(Exception, "same variations"):
+            self.add_variant(color="red", size="M")
+        with self.assertRaisesMessage(Exception, "all existing variants"):
+            self.add_variant(color="blue")
+        variant = self.add_variant(color="blue", size="M")
+        self.assertEqual(variant.color, "blue")
+        self.assertNotEqual(variant.variation_signature, "")
+
+    def test_migrated_duplicate_variant_saved(self):
+        first = self.add_variant(color="red")
+        duplicate = self.add_variant(color="blue")
+        # a duplicate from before signatures were enforced, as migration 0012 left it
+        signature = first.variation_signature
+        Product.objects.filter(id=duplicate.id).update(
+            color="red", variation_signature=duplicate.get_duplicate_variation_signature(signature)
+        )
+        duplicate = Product.objects.get(id=duplicate.id)
+        duplicate.title = "Edited"
+        duplicate.save()
+        self.assertEqual(
+            Product.objects.get(id=duplicate.id).variation_signature, duplicate.get_duplicate_variation_signature(signature)
+        )
+        # once it is no longer a duplicate it gets the plain signature back
+        first.delete()
+        duplicate.save()
+        self.assertEqual(Product.objects.get(id=duplicate.id).variation_signature, signature)
+
+
+class ImportProductsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="merchant")
+        self.store = createStore("Test Store", user, None)
+
+    def test_import_csv(self):
+        rows = [
+            "id,title,description,price,inventory,link,image_link,brand,availability,item_group_id,size",
+            "p1,Plain,description,10.50 USD,5,https://example.com,https://example.com/1.png,Brand,in stock,,",
+            "s1,Shirt,description,20.00 USD,3,https://example.com,https://example.com/2.png,Brand,,Shirts,M",
+            "s2,Shirt,description,20.00 USD,3,https://example.com,https://example.com/3.png,Brand,,Shirts,L",
+            # same size as s1
+            "s3,Shirt,description,20.00 USD,3,https://example.com,https://example.com/4.png,Brand,,Shirts,M",
+            "p2,Bad price,description,ten,5,https://example.com,https://example.com/5.png,Brand,,,",
+            "p1,Repeated,description,10.50 USD,5,https://example.com,https://example.com/6.png,Brand,,,",
+        ]
+        report = import_products(self.store, io.StringIO("\n".join(rows)), "csv", batch_size=2)
+        self.assertEqual(report["rows"], 6)
+        self.assertEqual(report["created"], 3)
+        self.assertEqual(report["groups_created"], 1)
+        self.assertEqual([(e["row"], list(e["errors"])) for e in report["errors"]], [
+            (4, ["item_group_id"]), (5, ["amount"]), (6, ["id"]),
+        ])
+        self.assertTrue(CatalogItem.objects.filter(product_id="p1", catalog=self.store.catalog_id).exists())
+        self.assertEqual(CatalogItemGroup.objects.filter(catalog=self.store.catalog_id).count(), 1)
+        self.assertEqual(Product.objects.get(id="s2").product_group.name, "Shirts")
+        self.assertEqual(CatalogSyncOutbox.objects.filter(store=self.store).count(), 3)
+        payloads = {r["data"]["id"] for r in get_catalog_item_batch_requests(self.store)}
+        self.assertEqual(payloads, {"p1", "s1", "s2"})
+
+    def test_import_jsonl_into_existing_group(self):
+        create_product(
+            self.store.catalog_id, "", "", "Shirt", "description",
+            "20.00", 3, "https://example.com", "https://example.com/image.png",
+            product_group_name="Shirts", store=self.store, color="red",
+        )
+        lines = [
+            '{"id": "s2", "title": "Shirt", "description": "d", "amount": 20, "inventory": 1, '
+            '"link": "https://example.com", "image_link": "https://example.com/i.png", "brand": "B", '
+            '"item_group_id": "Shirts", "color": "blue"}',
+            '{"id": "s3", "title": "Shirt", "description": "d", "amount": 20, "inventory": 1, '
+            '"link": "https://example.com", "image_link": "https://example.com/i.png", "brand": "B", '
+            '"item_group_id": "Shirts", "size": "M"}',
+            "not json",
+        ]
+        report = import_products(self.store, io.StringIO("\n".join(lines)), "jsonl")
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["groups_created"], 0)
+        self.assertEqual([(e["row"], list(e["errors"])) for e in report["errors"]], [
+            (2, ["item_group_id"]), (3, ["__all__"]),
+        ])
+        self.assertEqual(Product.objects.filter(product_group__name="Shirts").count(), 2)
+
+    def test_import_into_group_without_variants(self):
+        # a group created without variants is not in the catalog, and has no variation fields yet
+        product_group = ProductGroup.objects.create(name="Hats", store=self.store)
+        rows = [
+            "id,title,description,price,inventory,link,image_link,brand,item_group_id,size",
+            "h1,Hat,description,20.00 USD,3,https://example.com,https://example.com/1.png,Brand,Hats,M",
+            "h2,Hat,description,20.00 USD,3,https://example.com,https://example.com/2.png,Brand,Hats,L",
+        ]
+        report = import_products(self.store, io.StringIO("\n".join(rows)), "csv")
+        self.assertEqual((report["created"], report["groups_created"]), (2, 0))
+        self.assertEqual(ProductGroup.objects.get(id=product_group.id).get_variation_fields(), ["size"])
+        self.assertTrue(CatalogItemGroup.objects.filter(catalog=self.store.catalog_id, product_group=product_group).exists())
+        payloads = {r["data"]["id"] for r in get_catalog_item_batch_requests(self.store)}
+        self.assertEqual(payloads, {"h1", "h2"})
+        # importing more variants does not add the group to the catalog twice
+        rows[1:] = ["h3,Hat,description,20.00 USD,3,https://example.com,https://example.com/3.png,Brand,Hats,S"]
+        import_products(self.store, io.StringIO("\n".join(rows)), "csv")
+        self.assertEqual(CatalogItemGroup.objects.filter(product_group=product_group).count(), 1)
+
+
+class BulkValidationTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="merchant")
+        self.store = createStore("Test Store", user, None)
+        ProductGroup.objects.create(name="Shirts", store=self.store)
+
+    def test_bulk_validate(self):
+        groups = [
+            ProductGroup(name="Hats", store=self.store),
+            ProductGroup(name="Shirts", store=self.store),
+            ProductGroup(name="Hats", store=self.store),
+            ProductGroup(name="Shoes", store_id=self.store.id + 1),
+            ProductGroup(name="", store=self.store),
+        ]
+        errors = ProductGroup.bulk_validate(groups)
+        self.assertEqual({index: list(e) for index, e in errors.items()}, {
+            1: ["__all__"], 2: ["__all__"], 3: ["store"], 4: ["name"],
+        })
+        with self.assertRaises(ValidationError):
+            ProductGroup.bulk_create_validated(groups)
+        self.assertEqual(ProductGroup.objects.count(), 1)
+
+    def test_queries_do_not_grow_with_instances(self):
+        def count_queries(n):
+            groups = [ProductGroup(name="Group {}".format(i), store=self.store) for i in range(n)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(ProductGroup.bulk_validate(groups), {})
+            return len(queries)
+        self.assertEqual(count_queries(2), count_queries(50))
+
+
+class InventoryLedgerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="merchant")
+        self.store = createStore("Test Store", user, None)
+        self.products = [
+            create_product(
+                self.store.catalog_id, "", "", "Product {}".format(i), "description",
+                "10.00", 5, "https://example.com", "https://example.com/image.png",
+            )
+            for i in range(20)
+        ]
+
+    def get_inventory(self, product):
+        return Product.objects.values_list("inventory", flat=True).get(id=product.id)
+
+    def test_changes_applied_when_materialized(self):
+        first, second, unchanged = self.products[:3]
+        CatalogSyncOutbox.objects.all().delete()
+        recorded = record_inventory_changes(
+            self.store,
+            [(first.id, -2, "order_1"), (second.id, 3, "order_2"), (unchanged.id, 0, "order_3"), ("deleted", -1, "")],
+            InventoryChangeReason.FULFILLMENT,
+        )
+        self.assertEqual(recorded, {first.id, second.id})
+        self.assertEqual(self.get_inventory(first), 5)
+
+        record_inventory_changes(self.store, [(first.id, -1, "order_4")], InventoryChangeReason.FULFILLMENT)
+        self.assertEqual(sorted(materialize_inventory()), sorted([first.id, second.id]))
+        self.assertEqual((self.get_inventory(first), self.get_inventory(second), self.get_inventory(unchanged)), (2, 8, 5))
+        # the inventory before the ledger tracked the products is their opening entry
+        self.assertEqual(
+            sorted(InventoryLedgerEntry.objects.filter(reason=InventoryChangeReason.OPENING).values_list("product_id", "quantity")),
+            sorted([(first.id, 5), (second.id, 5)]),
+        )
+        self.assertFalse(InventoryLedgerEntry.objects.filter(applied=False).exists())
+        self.assertEqual(
+            sorted(CatalogSyncOutbox.objects.values_list("product_id", "fields")),
+            sorted([(first.id, "inventory"), (second.id, "inventory")]),
+        )
+        self.assertEqual(materialize_inventory(), [])
+        self.assertEqual(reconcile_inventory(), [])
+
+    def test_queries_do_not_grow_with_products(self):
+        def count_queries(products):
+            record_inventory_changes(self.store, [(product.id, -1, "") for product in products], InventoryChangeReason.FULFILLMENT)
+            with CaptureQueriesContext(connection) as queries:
+                materialize_inventory()
+            return len(queries)
+        self.assertEqual(count_queries(self.products[:2]), count_queries(self.products[2:]))
+
+    def test_reconcile_and_rebuild(self):
+        first, second = self.products[:2]
+        record_inventory_changes(self.store, [(first.id, -1, ""), (second.id, -1, "")], InventoryChangeReason.FULFILLMENT)
+        materialize_inventory()
+        # an incident, such as a save of a stale inventory
+        Product.objects.filter(id=first.id).update(inventory=10)
+        self.assertEqual(reconcile_inventory(self.store), [(first.id, 10, 4)])
+        self.assertEqual(rebuild_inventory([first.id, second.id]), [first.id])
+        self.assertEqual(self.get_inventory(first), 4)
+        self.assertEqual(reconcile_inventory(), [])
+
+    def test_compaction_keeps_balances(self):
+        first, second = self.products[:2]
+        for i in range(3):
+            record_inventory_changes(self.store, [(first.id, -1, str(i)), (second.id, 2, str(i))], InventoryChangeReason.RESTOCK)
+            materialize_inventory()
+        self.assertEqual(InventoryLedgerEntry.objects.count(), 8)
+        deleted = compact_inventory_ledger(before=datetime_utc_now_with_tz() + timedelta(minutes=1))
+        self.assertEqual(deleted, 6)
+        self.assertEqual(
+            sorted(InventoryLedgerEntry.objects.values_list("product_id", "quantity", "reason")),
+            sorted([(first.id, 2, InventoryChangeReason.COMPACTED), (second.id, 11, InventoryChangeReason.COMPACTED)]),
+        )
+        self.assertEqual(reconcile_inventory(), [])
+
+    def test_manual_edit_recorded(self):
+        product = self.products[0]
+        record_inventory_changes(self.store, [(product.id, -2, "")], InventoryChangeReason.FULFILLMENT)
+        update_product(product.id, product.title, "edited", "10.00", 7, product.link, product.image_link)
+        self.assertEqual(self.get_inventory(product), 7)
+        self.assertEqual(
+            list(InventoryLedgerEntry.objects.filter(product=product).order_by("id").values_list("reason", "quantity", "applied")),
+            [
+                (InventoryChangeReason.FULFILLMENT, -2, True),
+                (InventoryChangeReason.OPENING, 5, True),
+                (InventoryChangeReason.MANUAL, 4, True),
+            ],
+        )
+
+
+class CatalogSyncRunTests(TestCase):
+    def setUp(self):
+        self.store = create_synthetic_store()
+        generate_catalog(self.store, 10, grouped_share=0)
+        self.product_ids = sorted(Product.objects.values_list("id", flat=True))
+
+    def sync(self, **config):
+        with fake_graph_api(**config):
+            summary = post_item_batch(self.store, items=self.product_ids)
+        return CatalogSyncRun.objects.get(id=summary["sync_run_id"])
+
+    def test_rejected_chunk_items_failed(self):
+        sync_run = self.sync(error_rate=1.0)
+        self.assertEqual(sync_run.items_failed, 10)
+        self.assertEqual(sync_run.get_failed_items(), self.product_ids)
+        self.assertFalse(Product.objects.exclude(last_synced=None).exists())
+
+    def test_accepted_chunk_items_synced(self):
+        sync_run = self.sync()
+        self.assertEqual(sync_run.items_failed, 0)
+        self.assertFalse(Product.objects.filter(last_synced=None).exists())
+
+    def test_partial_update_marks_synced(self):
+        self.sync()
+        in_sync, edited = self.product_ids[:2]
+        Product.objects.filter(id__in=[in_sync, edited]).update(inventory=F("inventory") + 1, last_modified=datetime_utc_now_with_tz())
+        Product.objects.filter(id=edited).update(title="Edited")
+        with fake_graph_api():
+            post_item_batch(self.store, items=[in_sync, edited], fields=["inventory"])
+            summary = post_item_batch(self.store, changed_only=True)
+        # only the product with changes besides the partial update is sent in full again
+        self.assertEqual(summary["items"], 1)
+        with fake_graph_api():
+            self.assertEqual(post_item_batch(self.store, changed_only=True)["items"], 0)
+
+    def test_unconfirmed_run_items_synced_again(self):
+        sync_run = self.sync()
+        self.assertEqual(give_up_sync_run(sync_run), 10)
+        self.assertEqual(CatalogSyncRun.objects.get(id=sync_run.id).status, SyncRunStatus.UNCONFIRMED)
+        with fake_graph_api():
+            self.assertEqual(post_item_batch(self.store, changed_only=True)["items"], 10)
+
+    def test_outbox_sync_runs_followed_up(self):
+        record_product_changes(self.store, self.product_ids[:3])
+        record_product_changes(self.store, self.product_ids[3:5], fields=["inventory"])
+        with fake_graph_api(), patch.object(check_catalog_sync_run_async, "apply_async") as poll:
+            results = sync_catalog_outbox()
+        self.assertFalse(CatalogSyncOutbox.objects.exists())
+        self.assertEqual(len(results[self.store.id]["sync_run_ids"]), 2)
+        self.assertEqual(
+            sorted(call.kwargs["args"][0] for call in poll.call_args_list), sorted(results[self.store.id]["sync_run_ids"])
+        )
+
+        Product.objects.filter(id__in=self.product_ids[:3]).update(title="Edited")
+        record_product_changes(self.store, self.product_ids[:3])
+        with fake_graph_api(error_rate=1.0), patch.object(sync_catalog_async, "apply_async") as retry:
+            sync_catalog_outbox()
+        self.assertEqual(retry.call_args.kwargs["kwargs"]["items"], self.product_ids[:3])
+
+
+class CatalogSyncDebounceTests(TestCase):
+    def setUp(self):
+        self.store = create_synthetic_store()
+        generate_catalog(self.store, 5, grouped_share=0)
+        self.product_ids = sorted(Product.objects.values_list("id", flat=True))
+
+    def drain(self, during=None):
+        ''' run a queued drain of the store, calling `during` while it posts the rows it read '''
+        def post(*args, **kwargs):
+            if during:
+                during()
+            return post_item_batch(*args, **kwargs)
+        with fake_graph_api(), patch.object(check_catalog_sync_run_async, "apply_async"), \
+                patch("catalog.utils.catalogs.post_item_batch", side_effect=post):
+            drain_store_catalog_outbox_async(self.store.id)
+
+    @patch.object(drain_store_catalog_outbox_async, "apply_async")
+    def test_requests_merged_until_drain_starts(self, schedule):
+        record_product_changes(self.store, self.product_ids[:1])
+        self.assertTrue(request_catalog_sync(self.store.id))
+        record_product_changes(self.store, self.product_ids[1:2])
+        self.assertFalse(request_catalog_sync(self.store.id))
+        self.assertEqual(schedule.call_count, 1)
+
+        # a change made while the drain runs is not lost with the rows it deletes
+        def change():
+            record_product_changes(self.store, self.product_ids[2:3])
+            self.assertTrue(request_catalog_sync(self.store.id))
+        self.drain(during=change)
+        self.assertEqual(schedule.call_count, 2)
+        self.assertEqual(list(CatalogSyncOutbox.objects.values_list("product_id", "drain_scheduled")), [
+            (self.product_ids[2], True),
+        ])
+
+    @patch.object(drain_store_catalog_outbox_async, "apply_async")
+    def test_rows_past_batch_size_drained_again(self, schedule):
+        record_product_changes(self.store, self.product_ids)
+        request_catalog_sync(self.store.id)
+        with self.settings(CATALOG_OUTBOX_BATCH_SIZE=3):
+            self.drain()
+        self.assertEqual(schedule.call_count, 2)
+        self.assertEqual(CatalogSyncOutbox.objects.filter(drain_scheduled=True).count(), 2)
+        self.drain()
+        self.assertEqual(schedule.call_count, 2)
+        self.assertFalse(CatalogSyncOutbox.objects.exists())
+
+    @patch.object(drain_store_catalog_outbox_async, "apply_async")
+    def test_row_committed_below_read_rows_kept(self, schedule):
+        for row_id, product_id in ((10, self.product_ids[0]), (20, self.product_ids[1])):
+            CatalogSyncOutbox.objects.create(id=row_id, store=self.store, product_id=product_id)
+
+        # a writer that took a lower id from the sequence commits after the drain read the rows
+        def commit_late():
+            CatalogSyncOutbox.objects.create(id=15, store=self.store, product_id=self.product_ids[2])
+        self.drain(during=commit_late)
+        self.assertEqual(list(CatalogSyncOutbox.objects.values_list("id", "product_id")), [(15, self.product_ids[2])])
+
+    def test_flags_rolled_back_if_drain_not_queued(self):
+        record_product_changes(self.store, self.product_ids)
+        with patch.object(drain_store_catalog_outbox_async, "apply_async", side_effect=OSError("broker down")):
+            with self.assertRaises(OSError):
+                request_catalog_sync(self.store.id)
+        self.assertFalse(CatalogSyncOutbox.objects.filter(drain_scheduled=True).exists())
+
+
+class CatalogFeedTests(TestCase):
+    def setUp(self):
+        self.store = create_synthetic_store()
+        generate_catalog(self.store, 5, grouped_share=0.5)
+        self.feed_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.feed_dir.cleanup)
+        settings_override = self.settings(CATALOG_FEED_DIR=self.feed_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = reverse("catalogFeed", args=[self.store.id])
+
+    def get_feed(self, credentials=None, **headers):
+        if credentials is None:
+            credentials = get_feed_credentials(self.store.catalog_id)
+        if credentials:
+            token = base64.b64encode("{}:{}".format(*credentials).encode("utf-8")).decode("ascii")
+            headers["HTTP_AUTHORIZATION"] = "Basic " + token
+        return self.client.get(self.url, **headers)
+
+    def test_credentials_required(self):
+        write_catalog_feed(self.store)
+        username, password = get_feed_credentials(self.store.catalog_id)
+        for credentials in (False, (username, "wrong"), ("catalog0", password)):
+            response = self.get_feed(credentials)
+            self.assertEqual(response.status_code, 401)
+            self.assertIn("WWW-Authenticate", response)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION="Basic not-base64")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.get_feed().status_code, 200)
+
+    def test_matching_etag_not_modified(self):
+        etag = write_catalog_feed(self.store)["etag"]
+        response = self.get_feed()
+        self.assertEqual(response["ETag"], '"{}"'.format(etag))
+        self.assertEqual(self.get_feed(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.get_feed(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_export_byte_stable(self):
+        first = write_catalog_feed(self.store)
+        with open(first["path"], "rb") as f:
+            content = f.read()
+        os.remove(first["path"])
+        os.remove(first["path"] + ".sha256")
+
+        second = write_catalog_feed(self.store)
+        self.assertTrue(second["changed"])
+        self.assertEqual(second["etag"], first["etag"])
+        with open(get_feed_path(self.store.catalog_id), "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(write_catalog_feed(self.store)["changed"])
+
+        Product.objects.filter(id=Product.objects.order_by("id").first().id).update(title="Renamed product")
+        self.assertTrue(write_catalog_feed(self.store)["changed"])
+
+
+class CatalogTombstoneTests(TestCase):
+    def setUp(self):
+        self.store = create_synthetic_store()
+        generate_catalog(self.store, 20, grouped_share=0.3)
+
+    def delete(self, obj):
+        # tombstones are written once the delete commits, which TestCase does not do
+        with patch("django.db.transaction.on_commit") as on_commit:
+            obj.delete()
+        for call in on_commit.call_args_list:
+            call.args[0]()
+
+    def sync(self):
+        with fake_graph_api() as app, patch.object(app, "post_items_batch", wraps=app.post_items_batch) as items_batch:
+            summary = post_item_batch(self.store)
+        deleted = [
+            item_request["data"]["id"]
+            for call in items_batch.call_args_list
+            for item_request in json.loads(call.args[1]["requests"])
+            if item_request["method"] == "DELETE"
+        ]
+        return CatalogSyncRun.objects.get(id=summary["sync_run_id"]), deleted
+
+    def test_deleted_products_removed_from_fb(self):
+        product = Product.objects.filter(product_group=None).first()
+        product_group = ProductGroup.objects.first()
+        deleted_ids = [product.id] + list(Product.objects.filter(product_group=product_group).values_list("id", flat=True))
+        self.delete(product)
+        self.delete(product_group)
+
+        sync_run, deleted = self.sync()
+        self.assertEqual(sorted(deleted), sorted(deleted_ids))
+        self.assertTrue(Product.objects.exists())
+        self.assertEqual(CatalogTombstone.objects.filter(sync_run=sync_run).count(), len(deleted))
+
+        # tombstones of the confirmed DELETEs are compacted, and not sent again
+        with fake_graph_api():
+            self.assertTrue(check_sync_run(sync_run))
+        self.assertFalse(CatalogTombstone.objects.exists())
+        self.assertEqual(self.sync()[1], [])
+
+
+class SyntheticDataTests(TestCase):
+    def generate(self, seed):
+        store = create_synthetic_store()
+        generate_catalog(store, 300, seed=seed, batch_size=100)
+        generate_orders(store, 200, days=30, end=datetime(2021, 1, 1, tzinfo=timezone.utc), seed=seed, batch_size=64)
+        products = Product.objects.filter(id__startswith="synthetic-{}-".format(store.id))
+        orders = Order.objects.filter(store=store).order_by("ext_order_id")
+        return store, products, orders
+
+    def test_same_seed_same_data(self):
+        store, products, orders = self.generate(seed=1)
+        other_store, other_products, other_orders = self.generate(seed=1)
+        self.assertEqual(products.count(), 300)
+        self.assertEqual(orders.count(), 200)
+        self.assertEqual(len(get_catalog_item_batch_requests(store)), 300)
+
+        fields = ["title", "amount", "inventory", "size", "color", "variation_signature", "product_group__name"]
+        self.assertEqual(
+            list(products.order_by("title", "size", "color").values_list(*fields)),
+            list(other_products.order_by("title", "size", "color").values_list(*fields)),
+        )
+        fields = ["order_status", "created", "customer__full_name", "orderitem__quantity"]
+        self.assertEqual(list(orders.values_list(*fields)), list(other_orders.values_list(*fields)))
+        self.assertNotEqual(list(products.values_list("amount")), list(self.generate(seed=2)[1].values_list("amount")))
+
+
+@tag("benchmark")
+class CatalogSyncBenchmarkTests(TestCase):
+    """Small runs of the catalog sync benchmark, see the benchmark_catalog_sync command for full size runs.
+    skip with `manage.py test --exclude-tag benchmark`
+    """
+
+    def test_sync_scales_without_extra_queries(self):
+        small = run_sync_benchmark(200)
+        large = run_sync_benchmark(1000)
+        self.assertEqual(small["items"], 200)
+        self.assertEqual(large["items"], 1000)
+        self.assertEqual(
+            small["get_catalog_item_batch_requests"]["queries"],
+            large["get_catalog_item_batch_requests"]["queries"],
+        )
+        self.assertEqual(large["post_item_batch"]["errors"], 0)
+        self.assertGreater(large["post_item_batch"]["bytes_sent"], small["post_item_batch"]["bytes_sent"])
+        # the seeded stores are rolled back
+        self.assertFalse(Product.objects.exists())
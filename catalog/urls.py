@@ -11,6 +11,11 @@ urlpatterns = [
         login_required(views.createProduct),
         name="createProduct",
     ),
+    path(
+        "store/<int:storeId>/products/import",
+        login_required(views.importProducts),
+        name="importProducts",
+    ),
     path(
         "store/<int:storeId>/product/<str:productId>/update",
         login_required(views.updateProduct),
@@ -32,6 +37,17 @@ urlpatterns = [
         login_required(views.syncCatalog),
         name="syncCatalog",
     ),
+    path(
+        "store/<int:storeId>/catalog/feed/export",
+        login_required(views.exportCatalogFeed),
+        name="exportCatalogFeed",
+    ),
+    # not login_required, FB fetches the feed with basic auth
+    path(
+        "store/<int:storeId>/catalog/feed.csv.gz",
+        views.catalogFeed,
+        name="catalogFeed",
+    ),
     # dummy products
     path(
         "store/<int:storeId>/create_dummy_products",
@@ -6,5 +6,15 @@ from .catalogs import (
     create_product,
     update_product,
     create_catalog,
+    drain_catalog_outbox,
 )
 from .dummy_products import create_dummy_products
+from .imports import import_products
+from .inventory import (
+    record_inventory_changes,
+    materialize_inventory,
+    set_inventory,
+    reconcile_inventory,
+    rebuild_inventory,
+    compact_inventory_ledger,
+)
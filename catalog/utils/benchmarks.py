@@ -0,0 +1,166 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import resource
+import sys
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from core.utils.fake_graph_api import start_fake_graph_server
+from shop.utils import createStore
+from fb_metadata.models import FacebookMetadata
+from catalog.models import CatalogItem, CatalogItemGroup, Product, ProductGroup
+from .catalogs import get_catalog_item_batch_requests, post_item_batch
+
+BENCHMARK_SIZES = (1000, 10000, 100000)
+# values of the size variation of the variants in a group, repeated with a suffix past the last one
+VARIANT_SIZES = ("XS", "S", "M", "L", "XL", "XXL")
+
+
+def get_peak_rss():
+    ''' peak resident set size of this process so far, in KB '''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB everywhere else
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def seed_benchmark_store(products, group_size=5, grouped_share=0.5, batch_size=2000):
+    ''' create a store with FB metadata and a catalog of `products` products, with bulk inserts
+    products are written directly, without the per product validation and queries of create_product,
+    so stores of 100k products take seconds to seed.
+
+    params:
+    products: number of products in the catalog
+    group_size: number of variants in each product group
+    grouped_share: share of the products that are variants in a product group, the rest are standalone
+    batch_size: rows per bulk insert
+    returns:
+    store: the seeded store
+    '''
+    user, _ = User.objects.get_or_create(username="benchmark")
+    store = createStore("Benchmark store {}".format(products), user, None)
+    FacebookMetadata.objects.create(
+        store=store,
+        token_info="benchmark_token",
+        fb_catalog_id="benchmark_catalog_{}".format(store.id),
+        fbe_business_vertical="ECOMMERCE",
+        fbe_domain="benchmark.example.com",
+        fbe_channel="COMMERCE",
+    )
+    catalog = store.catalog_id
+    grouped = int(products * grouped_share) // group_size * group_size
+
+    groups = [
+        ProductGroup(name="Benchmark group {}".format(n), store=store, size=True)
+        for n in range(grouped // group_size)
+    ]
+    ProductGroup.objects.bulk_create(groups, batch_size=batch_size)
+    # primary keys are not set by bulk_create on every db, read them back
+    groups = list(ProductGroup.objects.filter(store=store).order_by("id"))
+    CatalogItemGroup.objects.bulk_create(
+        [CatalogItemGroup(catalog=catalog, product_group=group) for group in groups], batch_size=batch_size
+    )
+
+    new_products = []
+    for n in range(products):
+        product = Product(
+            id="benchmark-{}-{}".format(store.id, n),
+            title="Benchmark product {}".format(n),
+            description="Benchmark product {} description".format(n),
+            amount=Decimal(n % 500) + Decimal("9.99"),
+            inventory=n % 100,
+            link="https://example.com/products/{}".format(n),
+            image_link="https://example.com/images/{}.png".format(n),
+            brand="Benchmark",
+            google_product_category="154" if n % 3 == 0 else "",
+        )
+        if n < grouped:
+            variant = n % group_size
+            product.product_group = groups[n // group_size]
+            product.size = VARIANT_SIZES[variant % len(VARIANT_SIZES)] + str(variant // len(VARIANT_SIZES) or "")
+            # bulk_create does not call Product.save
+            product.variation_signature = product.get_variation_signature()
+        new_products.append(product)
+    Product.objects.bulk_create(new_products, batch_size=batch_size)
+    CatalogItem.objects.bulk_create(
+        [CatalogItem(catalog=catalog, product=product) for product in new_products[grouped:]],
+        batch_size=batch_size,
+    )
+    return store
+
+
+class QueryCounter:
+    """Counts the queries run on a connection, without keeping their sql like CaptureQueriesContext,
+    which would add the sql of large bulk updates to the memory being measured.
+    use with connection.execute_wrapper
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(fn, app=None):
+    ''' run fn and measure it
+
+    params:
+    fn: function to measure, called without arguments
+    app: optional. the FakeGraphAPI the calls of fn go to, to count the bytes sent to it
+    returns:
+    result, stats: the return value of fn, and dict of wall time in seconds, number of db queries,
+                   peak RSS of the process in KB and bytes sent to the fake Graph API
+    '''
+    bytes_before = sum(app.bytes_received.values()) if app else 0
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        start = time.perf_counter()
+        result = fn()
+        wall_time = time.perf_counter() - start
+    stats = {
+        "wall_time": round(wall_time, 4),
+        "queries": queries.count,
+        "peak_rss_kb": get_peak_rss(),
+        "bytes_sent": sum(app.bytes_received.values()) - bytes_before if app else 0,
+    }
+    return result, stats
+
+
+def run_sync_benchmark(products, group_size=5, latency=0.0, seed=0):
+    ''' time the catalog sync hot path for a freshly seeded store, against a local fake Graph API
+    everything the benchmark writes to the db is rolled back at the end.
+    peak RSS only goes up during a process, so run smaller catalogs first to compare them.
+
+    params:
+    products: number of products in the catalog
+    group_size: number of variants in each product group
+    latency: seconds of latency added to every fake Graph API response
+    seed: seed of the fake Graph API
+    returns:
+    result: dict with the catalog size and the stats (see measure) of seeding the store, of
+            get_catalog_item_batch_requests and of a full post_item_batch sync
+    '''
+    server, base_url = start_fake_graph_server(latency=latency, seed=seed)
+    app = server.get_app()
+    result = {"products": products, "group_size": group_size}
+    try:
+        # calls go to the fake Graph API, without the shared redis rate limiter
+        with override_settings(BASE_API_URL=base_url, GRAPH_RATE_LIMIT_REDIS_URL=""), transaction.atomic():
+            store, result["seed_store"] = measure(lambda: seed_benchmark_store(products, group_size))
+            requests, result["get_catalog_item_batch_requests"] = measure(
+                lambda: get_catalog_item_batch_requests(store)
+            )
+            result["items"] = len(requests)
+            del requests
+            summary, result["post_item_batch"] = measure(lambda: post_item_batch(store), app)
+            result["post_item_batch"]["chunks"] = len(summary["chunks"])
+            result["post_item_batch"]["errors"] = len(summary["errors"])
+            transaction.set_rollback(True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return result
@@ -1,6 +1,5 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
-import json
-import requests
+import itertools
 
 from django.conf import settings
 from django.db import transaction
@@ -9,6 +8,7 @@ from django.urls import reverse
 from shop.models import Store
 from catalog.models import (
     Catalog,
+    CatalogSyncOutbox,
     CatalogItem,
     CatalogItemGroup,
     Collection,
@@ -17,7 +17,16 @@ from catalog.models import (
     Product,
 )
 
+from core.models.utils import datetime_utc_now_with_tz
+from core.utils.rate_limit import get_catalog_scope
+from catalog.models.choices import SyncMode
 from fb_metadata.models import FacebookMetadata
+from .item_batch import chunk_item_batch_requests, post_item_batch_chunks
+from .inventory import set_inventory
+from .outbox import get_product_store, record_product_changes
+from .serializers import ProductRowSerializer, product_rows
+from .sync_runs import create_sync_run, get_failed_retailer_ids
+from .tombstones import get_delete_requests, get_pending_tombstones, mark_tombstones_sent
 
 
 @transaction.atomic
@@ -139,15 +148,15 @@ def create_product(
     )
     # apply optional product fields if provided
     if color:
-        product.color=color,
+        product.color=color
     if gender:
-        product.gender=gender,
+        product.gender=gender
     if material:
-        product.material=material,
+        product.material=material
     if pattern:
-        product.pattern=pattern,
+        product.pattern=pattern
     if size:
-        product.size=size,
+        product.size=size
     if id:
         product.id = id
 
@@ -160,6 +169,8 @@ def create_product(
                 for field, val in updates.items():
                     setattr(existing_product, field, val)
                 existing_product.save()
+            if orig_product.product_group:
+                update_variation_fields(orig_product.product_group)
         # have to refresh orig_product in case it was updated
         orig_product.refresh_from_db()
         # check that both the orig and new product have variations, and the same variation fields
@@ -191,9 +202,17 @@ def create_product(
             raise Exception("You must provide all existing variants with a value for any new variant fields you are adding to the new product.")
 
         # check that no product in the product group has EXACTLY the same varition field values as the new product
-        if any(product._variation_eq(old_prod) for old_prod in Product.objects.filter(product_group=product_group)):
+        # (a standalone orig_product joins the group along with the new product)
+        joining_orig_product = orig_product and not orig_product.product_group
+        if ProductGroup._has_variant(product_group, product) or (
+            joining_orig_product and orig_product.get_variation_signature() == product.get_variation_signature()
+        ):
             raise Exception("A variant with the same variations already exist.")
 
+        # the first variant decides the variation fields of the group
+        if not product_group.get_variation_fields():
+            product_group.set_variation_fields(product.get_variation_fields())
+
         # set the new product to the product_group
         product.product_group = product_group
         product.save()
@@ -210,8 +229,8 @@ def create_product(
                 cat_item_group.save()
         else:
             # if this is a fresh variant not based on an orig_product, just add the product_group to the catalog
-            cat_item_group = CatalogItemGroup(catalog=catalog,product_group=product_group)
-            cat_item_group.save()
+            # (unless an earlier variant already did)
+            CatalogItemGroup.objects.get_or_create(catalog=catalog, product_group=product_group)
     elif product_group or product_group_name or orig_product:
         # if we are to work with variants, there must be variation info provided
         raise Exception("You must populate at least one of 'color', 'gender', 'material', 'pattern', 'size' if you wish to create a variant.")
@@ -231,9 +250,31 @@ def create_product(
         )
         product.save()
 
+    # queue the new product, and the existing variants it changed, for syncing
+    changed_product_ids = {product.id}
+    if orig_product:
+        changed_product_ids.add(orig_product.id)
+    if existing_product_variation_updates:
+        changed_product_ids.update(existing_product_variation_updates.keys())
+    record_product_changes(catalog.store, changed_product_ids)
+
     return product
 
 
+def update_variation_fields(product_group):
+    ''' record the variation fields of a product group after its variants' variation fields were edited
+    raises if the variants do not all populate the same fields
+    '''
+    populated = {
+        tuple(bool(value) for value in values)
+        for values in Product.objects.filter(product_group=product_group).values_list(*Product.VARIATION_FIELDS)
+    }
+    if len(populated) > 1:
+        raise Exception("You must provide all existing variants with a value for any new variant fields you are adding to the new product.")
+    fields = [field for field, is_set in zip(Product.VARIATION_FIELDS, populated.pop() if populated else ()) if is_set]
+    product_group.set_variation_fields(fields)
+
+
 @transaction.atomic
 def update_product(
     product_id: str,
@@ -257,31 +298,54 @@ def update_product(
     image_link: product image url
     bran: product brand
     '''
-    product = Product.objects.get(id=product_id)
+    # locked, so the inventory saved with the other fields is not a stale one
+    product = Product.objects.select_for_update().get(id=product_id)
     product.title = title
     product.description = description
     product.amount = amount
     product.brand = brand
-    product.inventory = inventory
     product.link = link
     product.image_link = image_link
+    store = get_product_store(product)
+    if store is None:
+        product.inventory = inventory
     product.save()
+    if store:
+        # manual inventory edits are recorded in the inventory ledger like other movements
+        set_inventory(store, product, inventory)
+        record_product_changes(store, [product.id])
     print("product.id (udpated): {}, {}".format(product.id, product.title))
     return product
 
 
-def post_item_batch_by_id(store_id, allow_upsert=True, items=None):
+def post_item_batch_by_id(store_id, allow_upsert=True, items=None, changed_only=False, attempt=1, fields=None):
     store = Store.objects.get(id=store_id)
-    return post_item_batch(store, allow_upsert, items)
+    return post_item_batch(store, allow_upsert, items, changed_only, attempt, fields)
 
 
-def post_item_batch(store: Store, allow_upsert=True, items=None):
+def post_item_batch(store: Store, allow_upsert=True, items=None, changed_only=False, attempt=1, fields=None):
     ''' sync catalog with FB via POST to batch api's item_batch endpoint
+    requests are sent in chunks bounded by settings.CATALOG_BATCH_MAX_ITEMS and
+    settings.CATALOG_BATCH_MAX_BYTES so large catalogs do not fail as a single request.
+    products in accepted chunks are marked as synced, and the sync is recorded as a CatalogSyncRun.
+    products removed from the catalog since the last sync (see CatalogTombstone) are sent as DELETE
+    requests ahead of the updates, except in a partial update.
 
     params:
     store: store whose catalog is to be synced
     items: if provided, only sync these specific items
+    changed_only: if True, only sync products changed since they were last synced (delta sync).
+                  otherwise every product in the catalog is sent (full sync)
+    attempt: 1 for a regular sync, higher when retrying items that failed in a previous sync
+    fields: optional, requires items. only send these Product.PARTIAL_SYNC_FIELDS as a partial
+            update of existing FB items. partial updates only mark the products as synced if
+            the rest of their payload did not change since their last full sync.
+    returns:
+    summary: handles, errors and timings across all chunks (see post_item_batch_chunks),
+             and the id of the CatalogSyncRun as "sync_run_id"
     '''
+    if fields and items is None:
+        raise Exception("Partial updates of specific fields require the items to update.")
     fb_meta = FacebookMetadata.objects.filter(store=store).first()
     if fb_meta is None:
         print(
@@ -297,39 +361,214 @@ def post_item_batch(store: Store, allow_upsert=True, items=None):
         )
         return
 
-    # get the batches of requests
-    item_batch_requests = get_catalog_item_batch_requests(store, items)
+    # products changed after this point will be picked up again by the next delta sync
+    sync_started = datetime_utc_now_with_tz()
+
+    deleted = []
+
+    def mark_synced(chunk, chunk_summary):
+        failed_ids = set(get_failed_retailer_ids(chunk_summary["errors"]))
+        accepted = [r for r in chunk if r["data"]["id"] not in failed_ids]
+        synced_products = [
+            Product(
+                id=r["data"]["id"],
+                sync_hash=Product.get_sync_hash(r["data"]),
+                sync_base_hash=Product.get_sync_base_hash(r["data"]),
+                last_synced=sync_started,
+            )
+            for r in accepted if r["method"] == "UPDATE"
+        ]
+        Product.objects.bulk_update(synced_products, ["sync_hash", "sync_base_hash", "last_synced"])
+        deleted.extend(r["data"]["id"] for r in accepted if r["method"] == "DELETE")
+
+    def mark_partial_synced(chunk, chunk_summary):
+        # the item on FB is its last full sync with the fields sent here. if the rest of the product
+        # did not change since, the item is in sync with the full payload
+        failed_ids = set(get_failed_retailer_ids(chunk_summary["errors"]))
+        sent = {r["data"]["id"]: r["data"] for r in chunk if r["data"]["id"] not in failed_ids}
+        serializer = ProductRowSerializer()
+        synced_products = []
+        for row in product_rows(Product.objects.filter(id__in=sent)):
+            data = {**serializer.get_json(row), **sent[row["id"]]}
+            if row["sync_base_hash"] and row["sync_base_hash"] == Product.get_sync_base_hash(data):
+                synced_products.append(
+                    Product(id=row["id"], sync_hash=Product.get_sync_hash(data), last_synced=sync_started)
+                )
+        Product.objects.bulk_update(synced_products, ["sync_hash", "last_synced"])
+
+    # stream the requests so only one chunk of the catalog is held in memory at a time
+    # a full sync resends everything, otherwise products identical to what was last synced are skipped
+    # a partial update can not create an item, and does not tell if the rest of the item is in sync
+    # products removed from the catalog since the last sync are deleted first
+    skipped = []
+    tombstones = [] if fields else get_pending_tombstones(store)
+    item_batch_requests = itertools.chain(
+        get_delete_requests(tombstones),
+        iter_catalog_item_batch_requests(
+            store,
+            items,
+            changed_only,
+            skip_unchanged=not fields and (changed_only or items is not None),
+            skipped=skipped,
+            fields=fields,
+        ),
+    )
     data = {
         "access_token": token,
         "item_type": "PRODUCT_ITEM",
-        "allow_upsert": allow_upsert,
-        "requests": json.dumps(item_batch_requests),
+        "allow_upsert": allow_upsert and not fields,
     }
     url = "{}{}/{}/items_batch".format(settings.BASE_API_URL, settings.API_VERSION, str(fb_meta.fb_catalog_id))
-    res = requests.post(url, data=data)
-    return res
-
+    summary = post_item_batch_chunks(
+        url,
+        data,
+        chunk_item_batch_requests(item_batch_requests),
+        mark_partial_synced if fields else mark_synced,
+        store.catalog_id.get_sync_concurrency(),
+        get_catalog_scope(fb_meta.fb_catalog_id),
+    )
+    if skipped:
+        # unchanged products are already in sync with FB
+        Product.objects.filter(id__in=skipped).update(last_synced=sync_started)
+    summary["skipped"] = len(skipped)
+    summary["deleted"] = len(deleted)
+    if fields:
+        mode = SyncMode.FIELDS
+    elif items is not None:
+        mode = SyncMode.ITEMS
+    else:
+        mode = SyncMode.DELTA if changed_only else SyncMode.FULL
+    sync_run = create_sync_run(store, summary, mode, attempt, sync_started)
+    if deleted:
+        mark_tombstones_sent(store, deleted, sync_run)
+    summary["sync_run_id"] = sync_run.id
+    print("store [{}] catalog sync sent {} items in {} chunks ({} errors, {} unchanged skipped, {} deleted)".format(
+        store.name, summary["items"], len(summary["chunks"]), len(summary["errors"]), summary["skipped"], summary["deleted"]
+    ))
+    return summary
+
+
+def drain_catalog_outbox(limit=None, store_id=None):
+    ''' sync the products in the outbox to FB and remove the drained rows
+    rows are read oldest first and multiple changes to the same product are coalesced.
+    products with only partial changes (such as inventory after a fulfillment) are sent
+    first as partial updates, then the rest of the store's products in one item batch sync.
 
-def get_catalog_item_batch_requests(store, items=None):
+    params:
+    limit: max number of outbox rows to drain. defaults to settings.CATALOG_OUTBOX_BATCH_SIZE
+    store_id: if provided, only drain the rows of this store
+    returns:
+    results: dict of store id to the number of outbox rows drained, of products synced,
+             of rows collapsed into the sync of an already queued product, and the ids of
+             the CatalogSyncRuns created, as "sync_run_ids". the sync runs are not polled nor
+             retried here, see catalog.tasks.sync_catalog_outbox
+    '''
+    limit = limit or settings.CATALOG_OUTBOX_BATCH_SIZE
+    outbox = CatalogSyncOutbox.objects.order_by("id")
+    if store_id is not None:
+        outbox = outbox.filter(store_id=store_id)
+    rows = list(outbox.values_list("id", "store_id", "product_id", "fields")[:limit])
+    if not rows:
+        return {}
+    # store id -> product id -> set of changed fields, or None if the whole product changed
+    changes_by_store = {}
+    rows_by_store = {}
+    for row_id, row_store_id, product_id, fields in rows:
+        changes = changes_by_store.setdefault(row_store_id, {})
+        if not fields or changes.get(product_id, set()) is None:
+            changes[product_id] = None
+        else:
+            changes[product_id] = changes.get(product_id, set()) | set(fields.split(","))
+        rows_by_store.setdefault(row_store_id, []).append(row_id)
+
+    results = {}
+    for row_store_id, changes in changes_by_store.items():
+        store = Store.objects.get(id=row_store_id)
+        full_product_ids = sorted(product_id for product_id, fields in changes.items() if fields is None)
+        partial_product_ids = {}
+        for product_id, fields in changes.items():
+            if fields is not None:
+                partial_product_ids.setdefault(tuple(sorted(fields)), []).append(product_id)
+        # partial updates are small, send them first
+        summaries = [
+            post_item_batch(store, items=sorted(product_ids), fields=list(fields))
+            for fields, product_ids in partial_product_ids.items()
+        ]
+        if full_product_ids:
+            summaries.append(post_item_batch(store, items=full_product_ids))
+        # the rows of this store read above are now handed off to the sync. only those are deleted:
+        # a row with a lower id may be committed after the read, it is left for the next drain.
+        # failures from here on are recorded in the CatalogSyncRuns, for the caller to poll and retry
+        with transaction.atomic():
+            CatalogSyncOutbox.objects.filter(id__in=rows_by_store[row_store_id]).delete()
+        results[row_store_id] = {
+            "rows": len(rows_by_store[row_store_id]),
+            "items": len(changes),
+            "partial_items": len(changes) - len(full_product_ids),
+            "collapsed": len(rows_by_store[row_store_id]) - len(changes),
+            "sync_run_ids": [summary["sync_run_id"] for summary in summaries if summary],
+        }
+    return results
+
+
+def get_catalog_item_batch_requests(
+    store, items=None, changed_only=False, skip_unchanged=False, skipped=None, fields=None
+):
     """ fetch the catalog and format as catalog item batch api requests
+    see iter_catalog_item_batch_requests for params
+
+    returns:
+    items_requests: list of all item batch api requests
+    """
+    return list(iter_catalog_item_batch_requests(store, items, changed_only, skip_unchanged, skipped, fields))
+
+
+def iter_catalog_item_batch_requests(
+    store, items=None, changed_only=False, skip_unchanged=False, skipped=None, fields=None
+):
+    """ stream the catalog as catalog item batch api requests
+    products are read from the db settings.CATALOG_SYNC_QUERY_CHUNK_SIZE rows at a time
 
     params:
     store: store to fetch item_batch_requests from
     items: specific items to fetch item_batch_requests from
+    changed_only: only fetch products saved (or whose product group was saved) after they were last synced
+    skip_unchanged: leave out products whose payload hash matches the one of their last sync
+    skipped: optional list, the ids of products left out by skip_unchanged are appended to it
+    fields: optional. only include these fields (and the id) in each request, for partial updates
+    yields:
+    item batch api request for each product
     """
-    if items is None:
-        products = [cat_item.product for cat_item in CatalogItem.objects.filter(catalog=store.catalog_id)]
-        products += [
-            product
-            for cig in CatalogItemGroup.objects.filter(catalog=store.catalog_id)
-            for product in Product.objects.filter(product_group=cig.product_group)
-        ]
-        items_requests = [
-            {"method": "UPDATE", "data": product.get_json()} for product in products
-        ]
-    else:
-        products = Product.objects.filter(id__in=items)
-        items_requests = [
-            {"method": "UPDATE", "data": product.get_json()} for product in products
-        ]
-    return items_requests
+    serializer = ProductRowSerializer()
+    for row in iter_catalog_product_rows(store, items):
+        if changed_only and not serializer.needs_sync(row):
+            continue
+        data = serializer.get_json(row, fields)
+        if skip_unchanged and row["sync_hash"] == Product.get_sync_hash(data):
+            if skipped is not None:
+                skipped.append(row["id"])
+            continue
+        yield {"method": "UPDATE", "data": data}
+
+
+def iter_catalog_product_rows(store, items=None):
+    """ stream the products of a store's catalog as rows for ProductRowSerializer
+    uses a constant number of queries no matter the size of the catalog: one for
+    standalone products, one for product group variants joined with their group
+
+    params:
+    store: store to fetch products from
+    items: if provided, only fetch these specific products
+    yields:
+    values() row of each product in the catalog
+    """
+    chunk_size = settings.CATALOG_SYNC_QUERY_CHUNK_SIZE
+    if items is not None:
+        yield from product_rows(Product.objects.filter(id__in=items)).iterator(chunk_size=chunk_size)
+        return
+    yield from product_rows(
+        Product.objects.filter(catalogitem__catalog=store.catalog_id)
+    ).iterator(chunk_size=chunk_size)
+    yield from product_rows(
+        Product.objects.filter(product_group__catalogitemgroup__catalog=store.catalog_id)
+    ).iterator(chunk_size=chunk_size)
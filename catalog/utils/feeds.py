@@ -0,0 +1,200 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import base64
+import binascii
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from core.utils import graph_post
+from core.utils.rate_limit import get_catalog_scope
+from shop.models import Store
+from fb_metadata.models import FacebookMetadata
+from .catalogs import iter_catalog_product_rows
+from .serializers import ProductRowSerializer
+
+# every heading Product.get_reqd_headings_list can return, in the same order.
+# a feed needs the same columns on every row, so optional headings a product does not have are left empty
+FEED_HEADINGS = (
+    "id",
+    "title",
+    "description",
+    "rich_text_description",
+    "availability",
+    "condition",
+    "price",
+    "brand",
+    "visibility",
+    "inventory",
+    "link",
+    "image_link",
+    "google_product_category",
+    "item_group_id",
+    "color",
+    "gender",
+    "material",
+    "pattern",
+    "size",
+)
+
+
+def get_feed_path(catalog):
+    ''' local path of a catalog's gzipped csv feed file '''
+    return os.path.join(settings.CATALOG_FEED_DIR, "catalog_{}.csv.gz".format(catalog.id))
+
+
+def get_feed_etag(catalog):
+    ''' sha256 of the current feed file of a catalog, None if it was never exported '''
+    try:
+        with open(get_feed_path(catalog) + ".sha256") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def get_feed_last_modified(catalog):
+    ''' time the feed file of a catalog last changed, None if it was never exported '''
+    try:
+        mtime = os.path.getmtime(get_feed_path(catalog))
+    except FileNotFoundError:
+        return None
+    return datetime.fromtimestamp(mtime, tz=timezone.utc)
+
+
+def get_feed_credentials(catalog):
+    ''' http basic auth username and password FB uses to fetch a catalog's feed
+    the password is derived from settings.SECRET_KEY so it does not need to be stored
+    '''
+    username = "catalog{}".format(catalog.id)
+    password = salted_hmac("catalog.feed", username).hexdigest()
+    return username, password
+
+
+def is_feed_request_authorized(request, catalog):
+    ''' check the basic auth credentials of a feed request '''
+    auth = request.META.get("HTTP_AUTHORIZATION", "").split(" ", 1)
+    if len(auth) != 2 or auth[0].lower() != "basic":
+        return False
+    try:
+        username, _, password = base64.b64decode(auth[1], validate=True).decode("utf-8").partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return False
+    expected_username, expected_password = get_feed_credentials(catalog)
+    return constant_time_compare(username, expected_username) and constant_time_compare(password, expected_password)
+
+
+def write_catalog_feed(store: Store):
+    ''' export a store's catalog as a gzipped csv feed file in settings.CATALOG_FEED_DIR
+    products are streamed from the db and written settings.CATALOG_SYNC_QUERY_CHUNK_SIZE rows
+    at a time, with the same values as the items_batch sync. the file is written next to the
+    current feed and swapped in atomically, and left untouched if the catalog did not change,
+    so its ETag and Last-Modified only change with the catalog.
+
+    params:
+    store: store whose catalog is to be exported
+    returns:
+    summary: dict with the feed path, number of products, etag and if the feed changed
+    '''
+    catalog = store.catalog_id
+    path = get_feed_path(catalog)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    os.makedirs(settings.CATALOG_FEED_DIR, exist_ok=True)
+
+    serializer = ProductRowSerializer()
+    rows = iter_catalog_product_rows(store)
+    count = 0
+    try:
+        # mtime=0 keeps the gzip header, and so the etag, the same for the same catalog
+        with open(tmp_path, "wb") as raw, \
+                gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) as gz, \
+                io.TextIOWrapper(gz, encoding="utf-8", newline="") as text:
+            writer = csv.writer(text)
+            writer.writerow(FEED_HEADINGS)
+            while True:
+                chunk = list(islice(rows, settings.CATALOG_SYNC_QUERY_CHUNK_SIZE))
+                if not chunk:
+                    break
+                writer.writerows(get_feed_row(serializer, row) for row in chunk)
+                count += len(chunk)
+        etag = get_file_sha256(tmp_path)
+        changed = etag != get_feed_etag(catalog)
+        if changed:
+            os.replace(tmp_path, path)
+            write_file_atomic(path + ".sha256", etag)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    print("store [{}] catalog feed exported {} products to {} ({})".format(
+        store.name, count, path, "changed" if changed else "unchanged"
+    ))
+    return {"path": path, "items": count, "etag": etag, "changed": changed}
+
+
+def get_feed_row(serializer, row):
+    # csv row of a product, optional headings the product does not have are left empty
+    values = [serializer.get_value(row, heading) for heading in FEED_HEADINGS]
+    return ["" if value is None else value for value in values]
+
+
+def get_file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_file_atomic(path, content):
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def register_catalog_feed(store: Store):
+    ''' create a scheduled product feed on the store's FB catalog pointing at its feed endpoint
+    the id of the FB feed is saved as the catalog's feed_id. does nothing if it already has one.
+
+    params:
+    store: store whose catalog feed is to be registered
+    returns:
+    feed_id: id of the FB product feed, None if it could not be created
+    '''
+    catalog = store.catalog_id
+    if catalog.feed_id:
+        return catalog.feed_id
+    fb_meta = FacebookMetadata.objects.filter(store=store).first()
+    if fb_meta is None or fb_meta.token_info is None:
+        print(
+            "store [{}] doesnot have metadata or token info, aborting feed registration".format(store.name)
+        )
+        return None
+    username, password = get_feed_credentials(catalog)
+    schedule = {
+        "interval": settings.CATALOG_FEED_INTERVAL,
+        "url": settings.DOMAIN + reverse("catalogFeed", args=[store.id]),
+        "username": username,
+        "password": password,
+    }
+    url = "{}{}/{}/product_feeds".format(settings.BASE_API_URL, settings.API_VERSION, fb_meta.fb_catalog_id)
+    res = graph_post(url, data={
+        "access_token": fb_meta.token_info,
+        "name": "{} feed".format(store.name),
+        "schedule": json.dumps(schedule),
+    }, rate_limit_scope=get_catalog_scope(fb_meta.fb_catalog_id))
+    res_json = res.json()
+    if "id" not in res_json:
+        print("store [{}] feed registration failed: {}".format(store.name, res_json))
+        return None
+    catalog.feed_id = int(res_json["id"])
+    catalog.save()
+    return catalog.feed_id
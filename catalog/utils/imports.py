@@ -0,0 +1,332 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import csv
+import io
+import json
+import uuid
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.urls import reverse
+
+from shop.models import Store
+from catalog.models import CatalogItem, CatalogItemGroup, Product, ProductGroup
+from catalog.models.choices import Availability
+from .outbox import record_product_changes
+
+# columns copied as is from an import row to the product. other columns are ignored
+IMPORT_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "rich_text_description",
+    "condition",
+    "amount",
+    "currency",
+    "brand",
+    "visibility",
+    "inventory",
+    "link",
+    "image_link",
+    "google_product_category",
+    "google_product_category_string",
+)
+VARIATION_FIELDS = Product.VARIATION_FIELDS
+IMPORT_FORMATS = ("csv", "jsonl")
+
+
+def get_import_format(filename):
+    ''' import format of a file from its extension, such as "products.csv" or "products.jsonl" '''
+    for extension in IMPORT_FORMATS + ("json", "ndjson"):
+        if filename.lower().endswith("." + extension):
+            return "csv" if extension == "csv" else "jsonl"
+    raise Exception("Unsupported import file {}, expected one of {}".format(filename, IMPORT_FORMATS))
+
+
+def iter_import_rows(file, format):
+    ''' stream the rows of a csv (with a heading row) or jsonl product file
+
+    params:
+    file: binary or text file object
+    format: "csv" or "jsonl"
+    yields:
+    row_number, row, error: 1 based number of the row, dict of its columns, and the error if it
+                            could not be parsed (row is None then)
+    '''
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        # utf-8-sig drops the byte order mark spreadsheet exports start with
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if format == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, row, None
+        return
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, "invalid json: {}".format(e)
+            continue
+        if isinstance(row, dict):
+            yield row_number, row, None
+        else:
+            yield row_number, None, "expected a json object"
+
+
+def get_import_value(row, column):
+    # import values are strings in csv, and may be numbers or null in jsonl
+    value = row.get(column)
+    return "" if value is None else str(value).strip()
+
+
+def build_import_product(store, row, availability_values):
+    ''' an unsaved Product from an import row, and the name of its product group
+    the feed export columns are accepted too: `price` as "<amount> <currency>", `availability`
+    as its label and `item_group_id` as the product group name, so an exported feed can be imported.
+    '''
+    product = Product()
+    for column in IMPORT_COLUMNS + VARIATION_FIELDS:
+        value = get_import_value(row, column)
+        if value:
+            setattr(product, column, value)
+    if not get_import_value(row, "id"):
+        product.id = str(uuid.uuid4())
+    price = get_import_value(row, "price").split()
+    if price and not get_import_value(row, "amount"):
+        product.amount = price[0]
+        if len(price) > 1:
+            product.currency = price[1]
+    availability = get_import_value(row, "availability")
+    if availability:
+        product._availability = availability_values.get(availability.lower(), availability)
+    if settings.GENERATE_PRODUCT_LINK:
+        # same product url create_product generates
+        product.link = settings.DOMAIN + reverse("viewProduct", args=[store.id, product.id])
+    return product, get_import_value(row, "item_group_id") or get_import_value(row, "product_group")
+
+
+def clean_import_product(product):
+    ''' validate the fields of an import product without querying the db
+    uniqueness and the product group are checked for the whole batch by import_products
+
+    returns:
+    errors: dict of field name to list of messages, empty if the product is valid
+    '''
+    try:
+        product.full_clean(exclude=["product_group"], validate_unique=False)
+    except ValidationError as e:
+        return e.message_dict
+    # bulk_create does not call Product.save
+    product.variation_signature = product.get_variation_signature()
+    return {}
+
+
+class ImportGroups:
+    """Product groups of the rows imported so far, resolved in memory.
+    Holds for every group name its id (None until it is created), the variation fields its
+    variants populate and their variation signatures, so a row is checked against its group
+    without a query. Groups already in the db are loaded from the variation signature index
+    once, a batch at a time.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.groups = {}
+
+    def load(self, names):
+        # load the groups of these names that exist in the db, and the variation signatures of their products
+        names = set(names) - set(self.groups)
+        if not names:
+            return
+        ids = {}
+        for name, group_id, *populated in ProductGroup.objects.filter(store=self.store, name__in=names).values_list(
+            "name", "id", *VARIATION_FIELDS
+        ):
+            fields = [field for field, is_set in zip(VARIATION_FIELDS, populated) if is_set]
+            self.groups[name] = {"id": group_id, "fields": fields or None, "signatures": set()}
+            ids[group_id] = name
+        for name in names - set(ids.values()):
+            self.groups[name] = {"id": None, "fields": None, "signatures": set()}
+        signatures = Product.objects.filter(product_group_id__in=ids).values_list("product_group_id", "variation_signature")
+        for group_id, signature in signatures:
+            self.groups[ids[group_id]]["signatures"].add(signature)
+
+    def add(self, name, product):
+        group = self.groups[name]
+        group["fields"] = group["fields"] or product.get_variation_fields()
+        group["signatures"].add(product.variation_signature)
+
+    def check(self, name, product):
+        ''' errors of adding the product as a variant of the group, same rules as create_product '''
+        fields = product.get_variation_fields()
+        if not fields:
+            return {"item_group_id": [
+                "Variants must populate at least one of {}.".format(", ".join(VARIATION_FIELDS))
+            ]}
+        group = self.groups[name]
+        if group["fields"] is not None and fields != group["fields"]:
+            return {"item_group_id": [
+                "All variants of group '{}' must populate the same variation fields: {}.".format(
+                    name, ", ".join(group["fields"])
+                )
+            ]}
+        if product.variation_signature in group["signatures"]:
+            return {"item_group_id": ["A variant with the same variations already exist in group '{}'.".format(name)]}
+        return {}
+
+
+def import_products(store: Store, file, format, batch_size=None, dry_run=False):
+    ''' create products in a store's catalog from a csv or jsonl file, with bulk inserts
+    the file is streamed and handled `batch_size` rows at a time: rows are validated without
+    per row queries, product groups are resolved in memory, and the valid rows are written with
+    bulk_create in one transaction per batch and queued in the catalog sync outbox.
+    invalid rows are reported and skipped, the rest of the file is still imported.
+
+    params:
+    store: store whose catalog the products are created in
+    file: binary or text file object
+    format: "csv" or "jsonl", see get_import_format
+    batch_size: rows per batch. defaults to settings.CATALOG_IMPORT_BATCH_SIZE
+    dry_run: if True, only validate the rows
+    returns:
+    report: dict with the number of rows, of created (or valid, in a dry run) products, of created
+            product groups, of failed rows,
+            and the errors of each failed row as {"row", "id", "errors": {field: [messages]}}
+    '''
+    batch_size = batch_size or settings.CATALOG_IMPORT_BATCH_SIZE
+    report = {"rows": 0, "created": 0, "groups_created": 0, "failed": 0, "errors": []}
+    availability_values = {str(label).lower(): value for value, label in Availability.choices}
+    groups = ImportGroups(store)
+    seen_ids = set()
+    rows = iter_import_rows(file, format)
+
+    def fail(row_number, product_id, errors):
+        report["failed"] += 1
+        report["errors"].append({"row": row_number, "id": product_id, "errors": errors})
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        report["rows"] += len(batch)
+
+        candidates = []
+        for row_number, row, error in batch:
+            if error:
+                fail(row_number, None, {"__all__": [error]})
+                continue
+            product, group_name = build_import_product(store, row, availability_values)
+            errors = clean_import_product(product)
+            if not group_name and any(getattr(product, field) for field in VARIATION_FIELDS):
+                errors["item_group_id"] = ["Variants need a product group (item_group_id)."]
+            if product.id in seen_ids:
+                errors["id"] = ["Product id is repeated in the file."]
+            seen_ids.add(product.id)
+            if errors:
+                fail(row_number, product.id, errors)
+            else:
+                candidates.append((row_number, product, group_name))
+
+        existing_ids = set(Product.objects.filter(id__in=[p.id for _, p, _ in candidates]).values_list("id", flat=True))
+        groups.load(group_name for _, _, group_name in candidates if group_name)
+        products = []
+        for row_number, product, group_name in candidates:
+            if product.id in existing_ids:
+                fail(row_number, product.id, {"id": ["Product with this Id already exists."]})
+                continue
+            if group_name:
+                errors = groups.check(group_name, product)
+                if errors:
+                    fail(row_number, product.id, errors)
+                    continue
+                groups.add(group_name, product)
+            products.append((row_number, product, group_name))
+
+        if products and not dry_run:
+            try:
+                report["groups_created"] += write_import_batch(store, groups, products)
+            except DatabaseError as e:
+                # such as a product created with the same id since the batch was checked.
+                # the groups of the batch are loaded again from the db by the next batch using them
+                for row_number, product, group_name in products:
+                    fail(row_number, product.id, {"__all__": ["Could not be saved: {}".format(e)]})
+                    groups.groups.pop(group_name, None)
+                continue
+        report["created"] += len(products)
+
+    report["errors"].sort(key=lambda error: error["row"])
+    print("store [{}] product import: {} rows, {} created, {} failed{}".format(
+        store.name, report["rows"], report["created"], report["failed"], " (dry run)" if dry_run else ""
+    ))
+    return report
+
+
+@transaction.atomic
+def write_import_batch(store, groups, products):
+    ''' bulk insert a validated batch of import products, their new product groups and catalog entries
+
+    params:
+    store: store the products are imported into
+    groups: ImportGroups of the import
+    products: list of (row number, Product, product group name)
+    returns:
+    groups_created: number of product groups created
+    '''
+    catalog = store.catalog_id
+    new_names = sorted({name for _, _, name in products if name and groups.groups[name]["id"] is None})
+    existing_ids = {groups.groups[name]["id"] for _, _, name in products if name and name not in new_names}
+    if existing_ids:
+        # like create_product, a group without variants yet takes the variation fields of its first
+        # variants, and is added to the catalog if it is not in it already
+        for product_group in ProductGroup.objects.filter(id__in=existing_ids):
+            if not product_group.get_variation_fields():
+                product_group.set_variation_fields(groups.groups[product_group.name]["fields"])
+        in_catalog = set(CatalogItemGroup.objects.filter(
+            catalog=catalog, product_group_id__in=existing_ids
+        ).values_list("product_group_id", flat=True))
+        CatalogItemGroup.objects.bulk_create([
+            CatalogItemGroup(catalog=catalog, product_group_id=group_id) for group_id in existing_ids - in_catalog
+        ])
+    if new_names:
+        ProductGroup.objects.bulk_create([
+            ProductGroup(name=name, store=store, **{
+                field: field in groups.groups[name]["fields"] for field in VARIATION_FIELDS
+            })
+            for name in new_names
+        ])
+        # primary keys are not set by bulk_create on every db, read them back
+        created = ProductGroup.objects.filter(store=store, name__in=new_names).values_list("name", "id")
+        CatalogItemGroup.objects.bulk_create(
+            [CatalogItemGroup(catalog=catalog, product_group_id=group_id) for _, group_id in created]
+        )
+        for name, group_id in created:
+            groups.groups[name]["id"] = group_id
+
+    for _, product, name in products:
+        if name:
+            product.product_group_id = groups.groups[name]["id"]
+    Product.objects.bulk_create([product for _, product, _ in products])
+    CatalogItem.objects.bulk_create(
+        [CatalogItem(catalog=catalog, product=product) for _, product, name in products if not name]
+    )
+    record_product_changes(store, [product.id for _, product, _ in products])
+    return len(new_names)
+
+
+def write_import_report(report, file):
+    ''' write the errors of an import report as csv, one line per error message
+
+    params:
+    report: report returned by import_products
+    file: text file object to write to
+    '''
+    writer = csv.writer(file)
+    writer.writerow(["row", "id", "field", "message"])
+    for error in report["errors"]:
+        for field, messages in error["errors"].items():
+            for message in messages:
+                writer.writerow([error["row"], error["id"] or "", field, message])
@@ -0,0 +1,230 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from datetime import timedelta
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+
+from core.models.utils import datetime_utc_now_with_tz
+from shop.models import Store
+from catalog.models import InventoryLedgerEntry, Product
+from catalog.models.choices import InventoryChangeReason
+from .outbox import record_product_changes
+
+# products materialized, compacted or rebuilt per transaction, to keep the locks and sql bounded
+INVENTORY_BATCH_SIZE = 500
+
+
+def record_inventory_changes(store: Store, changes: List[Tuple[str, int, str]], reason: InventoryChangeReason):
+    ''' append inventory movements to the inventory ledger, with one insert
+    the products are not locked nor changed, so concurrent movements of the same products do not
+    wait for each other. the movements are applied to Product.inventory by materialize_inventory.
+
+    params:
+    store: store whose catalog the products are in
+    changes: list of (product id, quantity to add, negative to remove, reference) tuples
+    reason: InventoryChangeReason of the movements
+    returns:
+    product_ids: ids of the products a movement was recorded for. products that do not
+                 exist (anymore) and zero quantities are skipped
+    '''
+    changes = [(product_id, quantity, reference) for product_id, quantity, reference in changes if quantity]
+    existing = set(Product.objects.filter(id__in={c[0] for c in changes}).values_list("id", flat=True))
+    entries = [
+        InventoryLedgerEntry(store=store, product_id=product_id, quantity=quantity, reason=reason, reference=reference)
+        for product_id, quantity, reference in changes if product_id in existing
+    ]
+    InventoryLedgerEntry.objects.bulk_create(entries)
+    return {entry.product_id for entry in entries}
+
+
+def materialize_inventory(product_ids=None):
+    ''' apply the inventory ledger entries not applied yet to Product.inventory
+    each batch of products is locked in id order, so concurrent runs wait for each other instead
+    of deadlocking, then changed with one UPDATE ... SET inventory = inventory + CASE id WHEN ... END.
+    the entries read are marked applied in the same transaction. a product the ledger did not
+    track yet first gets an OPENING entry of its current inventory.
+    the changed products are queued for an inventory only sync.
+
+    params:
+    product_ids: optional. only materialize these products, all products with pending entries by default
+    returns:
+    changed: ids of the products whose inventory changed
+    '''
+    pending = InventoryLedgerEntry.objects.filter(applied=False)
+    if product_ids is not None:
+        pending = pending.filter(product_id__in=product_ids)
+    product_ids = sorted(set(pending.values_list("product_id", flat=True)))
+    changed = []
+    for start in range(0, len(product_ids), INVENTORY_BATCH_SIZE):
+        changed += materialize_inventory_batch(product_ids[start:start + INVENTORY_BATCH_SIZE])
+    return changed
+
+
+@transaction.atomic
+def materialize_inventory_batch(product_ids):
+    ''' materialize_inventory for one batch of products, see materialize_inventory '''
+    inventory = dict(
+        Product.objects.select_for_update().filter(id__in=product_ids).order_by("id").values_list("id", "inventory")
+    )
+    # read after the lock, so entries applied by a concurrent run are not applied again
+    pending = list(
+        InventoryLedgerEntry.objects.filter(product_id__in=inventory, applied=False)
+        .values_list("id", "product_id", "store_id", "quantity")
+    )
+    if not pending:
+        return []
+    quantities, stores = {}, {}
+    for _, product_id, store_id, quantity in pending:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+        stores[product_id] = store_id
+
+    tracked = set(
+        InventoryLedgerEntry.objects.filter(product_id__in=quantities, applied=True)
+        .values_list("product_id", flat=True).distinct()
+    )
+    InventoryLedgerEntry.objects.bulk_create([
+        InventoryLedgerEntry(
+            store_id=stores[product_id], product_id=product_id, quantity=inventory[product_id],
+            reason=InventoryChangeReason.OPENING, applied=True,
+        )
+        for product_id in quantities if product_id not in tracked
+    ])
+    InventoryLedgerEntry.objects.filter(id__in=[entry[0] for entry in pending]).update(applied=True)
+
+    changes = {product_id: quantity for product_id, quantity in quantities.items() if quantity}
+    if changes:
+        Product.objects.filter(id__in=changes).update(
+            inventory=F("inventory") + Case(
+                *[When(id=product_id, then=Value(quantity)) for product_id, quantity in changes.items()],
+                output_field=IntegerField(),
+            ),
+            # as Product.save would
+            last_modified=datetime_utc_now_with_tz(),
+        )
+    # queue the inventory changes for syncing, in the same transaction
+    for store in Store.objects.filter(id__in={stores[product_id] for product_id in changes}):
+        record_product_changes(store, [p for p in changes if stores[p] == store.id], fields=["inventory"])
+    return list(changes)
+
+
+@transaction.atomic
+def set_inventory(store: Store, product: Product, inventory: int, reason=InventoryChangeReason.MANUAL):
+    ''' set the inventory of a product through the inventory ledger, such as for a manual edit
+    records the movement from the current balance to `inventory`, and materializes it right away
+
+    params:
+    store: store whose catalog the product is in
+    product: the Product, its inventory is updated too
+    inventory: new inventory of the product
+    reason: InventoryChangeReason of the movement
+    '''
+    materialize_inventory([product.id])
+    current = Product.objects.select_for_update().values_list("inventory", flat=True).get(id=product.id)
+    if inventory != current:
+        record_inventory_changes(store, [(product.id, inventory - current, "")], reason)
+        materialize_inventory([product.id])
+    product.inventory = inventory
+
+
+def get_ledger_balances():
+    # sum of the applied ledger entries of a product, as a subquery, summed from the index
+    return Subquery(
+        InventoryLedgerEntry.objects.filter(product=OuterRef("pk"), applied=True)
+        .order_by().values("product").annotate(balance=Sum("quantity")).values("balance"),
+        output_field=IntegerField(),
+    )
+
+
+def reconcile_inventory(store: Store = None):
+    ''' find the products whose inventory is not the sum of their applied inventory ledger entries,
+    such as after a product was saved with a stale inventory. one query, the sums are read from
+    the ledger balance index. products the ledger does not track yet are skipped.
+
+    params:
+    store: optional. only check the products of this store
+    returns:
+    mismatches: list of (product id, inventory, ledger balance) tuples
+    '''
+    products = Product.objects.annotate(ledger_balance=get_ledger_balances()).filter(ledger_balance__isnull=False)
+    if store is not None:
+        products = products.filter(id__in=InventoryLedgerEntry.objects.filter(store=store).values("product_id"))
+    return list(
+        products.exclude(inventory=F("ledger_balance")).order_by("id").values_list("id", "inventory", "ledger_balance")
+    )
+
+
+def rebuild_inventory(product_ids):
+    ''' set the inventory of products to the sum of their applied inventory ledger entries,
+    such as for the mismatches found by reconcile_inventory after an incident.
+    the changed products are queued for an inventory only sync.
+
+    params:
+    product_ids: ids of the products to rebuild. products the ledger does not track are skipped
+    returns:
+    changed: ids of the products whose inventory changed
+    '''
+    product_ids = sorted(product_ids)
+    changed = []
+    for start in range(0, len(product_ids), INVENTORY_BATCH_SIZE):
+        with transaction.atomic():
+            batch = list(
+                Product.objects.select_for_update().filter(id__in=product_ids[start:start + INVENTORY_BATCH_SIZE])
+                .order_by("id").values_list("id", flat=True)
+            )
+            mismatches = list(
+                Product.objects.filter(id__in=batch).annotate(ledger_balance=get_ledger_balances())
+                .filter(ledger_balance__isnull=False).exclude(inventory=F("ledger_balance")).values_list("id", flat=True)
+            )
+            stores = dict(
+                InventoryLedgerEntry.objects.filter(product_id__in=mismatches).values_list("product_id", "store_id")
+            )
+            Product.objects.filter(id__in=stores).update(
+                inventory=get_ledger_balances(), last_modified=datetime_utc_now_with_tz()
+            )
+            for store in Store.objects.filter(id__in=set(stores.values())):
+                record_product_changes(store, [p for p in stores if stores[p] == store.id], fields=["inventory"])
+            changed += stores
+    return changed
+
+
+def compact_inventory_ledger(before=None):
+    ''' merge the applied inventory ledger entries created before `before` into one
+    COMPACTED entry per product, to keep the ledger of busy products short.
+    the balances are unchanged: the newest old entry of a product takes the sum of its old entries,
+    and the others are deleted. products are locked in id order, like materialize_inventory.
+
+    params:
+    before: optional. datetime, defaults to settings.INVENTORY_LEDGER_RETENTION_DAYS ago
+    returns:
+    deleted: number of entries merged away
+    '''
+    before = before or datetime_utc_now_with_tz() - timedelta(days=settings.INVENTORY_LEDGER_RETENTION_DAYS)
+    old = InventoryLedgerEntry.objects.filter(applied=True, created__lt=before)
+    product_ids = sorted(
+        old.values("product_id").annotate(entries=Count("id")).filter(entries__gt=1).values_list("product_id", flat=True)
+    )
+    deleted = 0
+    for start in range(0, len(product_ids), INVENTORY_BATCH_SIZE):
+        with transaction.atomic():
+            batch = list(
+                Product.objects.select_for_update().filter(id__in=product_ids[start:start + INVENTORY_BATCH_SIZE])
+                .order_by("id").values_list("id", flat=True)
+            )
+            # summed again under the lock, entries may have been applied since
+            kept = {
+                last_id: quantity for last_id, quantity in old.filter(product_id__in=batch).order_by()
+                .values("product_id").annotate(last_id=Max("id"), quantity=Sum("quantity"))
+                .values_list("last_id", "quantity")
+            }
+            InventoryLedgerEntry.objects.filter(id__in=kept).update(
+                quantity=Case(
+                    *[When(id=last_id, then=Value(quantity)) for last_id, quantity in kept.items()],
+                    output_field=IntegerField(),
+                ),
+                reason=InventoryChangeReason.COMPACTED,
+                reference="",
+            )
+            deleted += old.filter(product_id__in=batch).exclude(id__in=kept).delete()[0]
+    return deleted
@@ -0,0 +1,182 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+
+from core.utils.graph import graph_post
+
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+
+def chunk_item_batch_requests(item_batch_requests, max_items=None, max_bytes=None):
+    ''' split item batch requests into chunks bounded by item count and serialized size
+
+    params:
+    item_batch_requests: iterable of item batch api requests
+    max_items: max number of requests per chunk. defaults to settings.CATALOG_BATCH_MAX_ITEMS
+    max_bytes: max size of a chunk's serialized `requests` param. defaults to settings.CATALOG_BATCH_MAX_BYTES
+    yields:
+    chunk, payload: list of requests in the chunk and the chunk serialized as a json string
+    '''
+    max_items = max_items or settings.CATALOG_BATCH_MAX_ITEMS
+    max_bytes = max_bytes or settings.CATALOG_BATCH_MAX_BYTES
+    chunk = []
+    serialized = []
+    # json.dumps escapes non ascii chars by default, so string length == byte size
+    # start at 2 for the enclosing brackets
+    size = 2
+    for item_request in item_batch_requests:
+        item_json = json.dumps(item_request)
+        # +1 for the separating comma
+        item_size = len(item_json) + 1
+        if chunk and (len(chunk) >= max_items or size + item_size > max_bytes):
+            yield chunk, "[{}]".format(",".join(serialized))
+            chunk = []
+            serialized = []
+            size = 2
+        if item_size + 2 > max_bytes:
+            # a single request can not be split, send it on its own and let the api report on it
+            print("WARN: item batch request for {} is larger than {} bytes".format(
+                item_request.get("data", {}).get("id"), max_bytes
+            ))
+        chunk.append(item_request)
+        serialized.append(item_json)
+        size += item_size
+    if chunk:
+        yield chunk, "[{}]".format(",".join(serialized))
+
+
+def get_item_errors(response_json, chunk=None):
+    ''' get the per item errors from an items_batch response
+
+    params:
+    response_json: json of an items_batch response
+    chunk: optional. the requests sent, if the request failed as a whole all of their items failed
+    returns:
+    errors: list of validation statuses that contain errors, and the api error if the request failed
+            with the retailer ids of the chunk as "retailer_ids"
+    '''
+    errors = [
+        status for status in response_json.get("validation_status", [])
+        if status.get("errors")
+    ]
+    if "error" in response_json:
+        errors.append(get_chunk_error(response_json["error"], chunk or []))
+    return errors
+
+
+def get_chunk_error(error, chunk):
+    ''' an error that failed every item of a chunk, with the chunk's retailer ids so the items are retried '''
+    return {**error, "retailer_ids": [r.get("data", {}).get("id") for r in chunk]}
+
+
+def get_upload_executor():
+    ''' per process executor uploading the chunks of every catalog sync running in the process
+    it has settings.GRAPH_API_POOL_SIZE threads, so concurrent syncs, such as the stores of
+    core.utils.store_engine, together never upload more chunks than the session has connections
+    '''
+    global _upload_executor
+    with _upload_executor_lock:
+        if _upload_executor is None:
+            _upload_executor = ThreadPoolExecutor(
+                max_workers=settings.GRAPH_API_POOL_SIZE, thread_name_prefix="item-batch-upload"
+            )
+    return _upload_executor
+
+
+def post_item_batch_chunk(url, data, index, chunk, payload, rate_limit_scope=None):
+    ''' POST a single chunk of item batch requests. safe to call from upload threads.
+    sent with graph_post, so it is rate limited and retried on server errors.
+
+    params:
+    url: items_batch endpoint url of the catalog
+    data: request params shared by all chunks, such as access_token and item_type
+    index: position of the chunk in the sync
+    chunk: list of requests in the chunk
+    payload: the chunk serialized as a json string
+    rate_limit_scope: optional. rate limit scope of the catalog, see core.utils.rate_limit
+    returns:
+    chunk_summary: dict with the handles, errors and timing of the chunk
+    '''
+    chunk_start = time.monotonic()
+    chunk_summary = {
+        "index": index,
+        "items": len(chunk),
+        "bytes": len(payload),
+        "status_code": None,
+        "handles": [],
+        "errors": [],
+    }
+    try:
+        res = graph_post(url, data={**data, "requests": payload}, rate_limit_scope=rate_limit_scope)
+        chunk_summary["status_code"] = res.status_code
+        res_json = res.json()
+    except (requests.RequestException, ValueError) as e:
+        # a failed chunk should not stop the rest of the catalog from syncing
+        chunk_summary["errors"].append(get_chunk_error({"message": str(e)}, chunk))
+    else:
+        chunk_summary["handles"] = res_json.get("handles", [])
+        chunk_summary["errors"] = get_item_errors(res_json, chunk)
+    chunk_summary["elapsed"] = time.monotonic() - chunk_start
+    return chunk_summary
+
+
+def post_item_batch_chunks(url, data, chunks, on_chunk_posted=None, concurrency=1, rate_limit_scope=None):
+    ''' POST each chunk of item batch requests to the items_batch endpoint
+    up to `concurrency` chunks are uploaded at the same time, by the shared executor of
+    get_upload_executor. chunks are read from `chunks` only as upload slots free up, and results
+    are handled in chunk order on the calling thread, so on_chunk_posted can safely use the db.
+
+    params:
+    url: items_batch endpoint url of the catalog
+    data: request params shared by all chunks, such as access_token and item_type
+    chunks: iterable of (chunk, payload) tuples, as yielded by chunk_item_batch_requests
+    on_chunk_posted: optional. called with (chunk, chunk_summary) for every chunk the api accepted
+    concurrency: max number of chunks uploaded in parallel
+    rate_limit_scope: optional. rate limit scope of the catalog, see core.utils.rate_limit
+    returns:
+    summary: dict with the handles, errors and timings of all chunks, and a per chunk breakdown
+    '''
+    summary = {
+        "handles": [],
+        "errors": [],
+        "chunks": [],
+        "items": 0,
+        "bytes": 0,
+        "elapsed": 0.0,
+    }
+    start = time.monotonic()
+
+    def collect(chunk, future):
+        chunk_summary = future.result()
+        if on_chunk_posted and chunk_summary["handles"]:
+            on_chunk_posted(chunk, chunk_summary)
+        summary["handles"] += chunk_summary["handles"]
+        summary["errors"] += chunk_summary["errors"]
+        summary["items"] += chunk_summary["items"]
+        summary["bytes"] += chunk_summary["bytes"]
+        summary["chunks"].append(chunk_summary)
+
+    executor = get_upload_executor()
+    in_flight = deque()
+    try:
+        for index, (chunk, payload) in enumerate(chunks):
+            if len(in_flight) >= max(1, concurrency):
+                collect(*in_flight.popleft())
+            in_flight.append((chunk, executor.submit(
+                post_item_batch_chunk, url, data, index, chunk, payload, rate_limit_scope
+            )))
+        while in_flight:
+            collect(*in_flight.popleft())
+    finally:
+        # the executor is shared, do not leave the uploads of a failed sync queued in it
+        for _, future in in_flight:
+            future.cancel()
+    summary["elapsed"] = time.monotonic() - start
+    return summary
@@ -0,0 +1,35 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from catalog.models import CatalogItem, CatalogSyncOutbox, Product
+
+
+def get_product_store(product):
+    ''' get the store whose catalog a product is in, either directly or through its product group
+
+    params:
+    product: Product to find the store of
+    returns:
+    store: the Store, or None if the product is in no catalog
+    '''
+    if product.product_group_id:
+        return product.product_group.store
+    cat_item = CatalogItem.objects.filter(product=product).select_related("catalog__store").first()
+    return cat_item and cat_item.catalog.store
+
+
+def record_product_changes(store, product_ids, fields=None):
+    ''' write product changes to the catalog sync outbox
+    call this inside the transaction that changes the products, so the change and
+    the outbox row are committed (or rolled back) together
+
+    params:
+    store: store whose catalog the products are in
+    product_ids: ids of the changed products
+    fields: optional. if only some of Product.PARTIAL_SYNC_FIELDS changed, only those are synced
+    '''
+    if fields and not set(fields) <= set(Product.PARTIAL_SYNC_FIELDS):
+        raise Exception("Only {} can be synced as a partial update".format(Product.PARTIAL_SYNC_FIELDS))
+    CatalogSyncOutbox.objects.bulk_create([
+        CatalogSyncOutbox(store=store, product_id=product_id, fields=",".join(fields or []))
+        for product_id in product_ids
+    ])
+
@@ -0,0 +1,149 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.models.utils import datetime_utc_now_with_tz
+from core.utils.graph import graph_get
+from core.utils.rate_limit import get_catalog_scope
+from catalog.models import CatalogSyncRun, CatalogTombstone, Product
+from catalog.models.choices import SyncRunStatus
+from fb_metadata.models import FacebookMetadata
+from .tombstones import compact_tombstones
+
+
+def create_sync_run(store, summary, mode, attempt=1, started=None):
+    ''' persist a catalog sync from the summary returned by post_item_batch_chunks
+
+    params:
+    store: store whose catalog was synced
+    summary: summary of the sync
+    mode: SyncMode of the sync
+    attempt: 1 for a regular sync, higher for retries of failed items
+    started: optional. start time of the sync, the last_synced of the products it marked as synced
+    returns:
+    sync_run: the new CatalogSyncRun
+    '''
+    failed_items = get_failed_retailer_ids(summary["errors"])
+    sync_run = CatalogSyncRun(
+        store=store,
+        mode=mode,
+        attempt=attempt,
+        sync_started=started,
+        items_sent=summary["items"],
+        items_skipped=summary.get("skipped", 0),
+        items_failed=len(failed_items),
+        items_deleted=summary.get("deleted", 0),
+        chunks=len(summary["chunks"]),
+        elapsed=summary["elapsed"],
+        handles=json.dumps(summary["handles"]),
+        errors=json.dumps(summary["errors"]),
+        failed_items=json.dumps(failed_items),
+    )
+    if not summary["handles"]:
+        # nothing was accepted by FB, there is nothing to poll
+        sync_run.status = SyncRunStatus.FAILED if summary["items"] else SyncRunStatus.SUCCEEDED
+        sync_run.finished = datetime_utc_now_with_tz()
+    sync_run.save()
+    return sync_run
+
+
+def get_failed_retailer_ids(errors):
+    ''' get the unique retailer ids from a list of item errors, and of the chunks rejected as a whole '''
+    retailer_ids = {error["retailer_id"] for error in errors if error.get("retailer_id")}
+    for error in errors:
+        retailer_ids.update(retailer_id for retailer_id in error.get("retailer_ids", []) if retailer_id)
+    return sorted(retailer_ids)
+
+
+def get_batch_status(fb_meta, handle):
+    ''' get the processing status of an items_batch handle
+
+    params:
+    fb_meta: FacebookMetadata of the store the batch was sent for
+    handle: handle returned by items_batch
+    returns:
+    status: the status dict of the handle, such as {"status": "finished", "errors": [...]}
+    '''
+    url = "{}{}/{}/check_batch_request_status".format(
+        settings.BASE_API_URL, settings.API_VERSION, str(fb_meta.fb_catalog_id)
+    )
+    params = {
+        "access_token": fb_meta.token_info,
+        "handle": handle,
+        "load_ids_of_invalid_requests": True,
+    }
+    res = graph_get(url, params=params, rate_limit_scope=get_catalog_scope(fb_meta.fb_catalog_id))
+    return res.json().get("data", [{}])[0]
+
+
+def check_sync_run(sync_run: CatalogSyncRun):
+    ''' poll the batch handles of a sync run and record the outcome once all are processed
+    products that failed get their sync state cleared so later syncs send them again,
+    and tombstones whose DELETE FB confirmed are removed
+
+    params:
+    sync_run: the CatalogSyncRun to check
+    returns:
+    finished: False if FB is still processing at least one batch
+    '''
+    fb_meta = FacebookMetadata.objects.get(store=sync_run.store)
+    errors = sync_run.get_errors()
+    for handle in sync_run.get_handles():
+        try:
+            status = get_batch_status(fb_meta, handle)
+        except (requests.RequestException, ValueError) as e:
+            print("check_batch_request_status failed for handle {}: {}".format(handle, e))
+            return False
+        if status.get("status") != "finished":
+            return False
+        errors += [
+            {"retailer_id": error.get("id"), "errors": [error]}
+            for error in status.get("errors", [])
+        ]
+        errors += [
+            {"retailer_id": retailer_id, "errors": [{"message": "invalid request"}]}
+            for retailer_id in status.get("ids_of_invalid_requests", [])
+        ]
+
+    failed_items = get_failed_retailer_ids(errors)
+    with transaction.atomic():
+        if failed_items:
+            Product.objects.filter(id__in=failed_items).update(sync_hash="", sync_base_hash="", last_synced=None)
+        compact_tombstones(sync_run, failed_items)
+        sync_run.errors = json.dumps(errors)
+        sync_run.failed_items = json.dumps(failed_items)
+        sync_run.items_failed = len(failed_items)
+        sync_run.status = SyncRunStatus.PARTIALLY_FAILED if failed_items else SyncRunStatus.SUCCEEDED
+        sync_run.finished = datetime_utc_now_with_tz()
+        sync_run.save()
+    return True
+
+
+def give_up_sync_run(sync_run: CatalogSyncRun):
+    ''' record that FB did not report the outcome of a sync run in time
+    products are marked as synced as soon as FB accepts their batch, so the products the run marked
+    get their sync state cleared, and later syncs send them again in case FB failed them.
+    the tombstones sent in the run are sent again too.
+
+    params:
+    sync_run: the CatalogSyncRun, still SENT
+    returns:
+    cleared: number of products whose sync state was cleared
+    '''
+    with transaction.atomic():
+        cleared = 0
+        if sync_run.sync_started:
+            catalog = sync_run.store.catalog_id
+            cleared = Product.objects.filter(
+                Q(catalogitem__catalog=catalog) | Q(product_group__catalogitemgroup__catalog=catalog),
+                last_synced=sync_run.sync_started,
+            ).update(sync_hash="", sync_base_hash="", last_synced=None)
+        CatalogTombstone.objects.filter(sync_run=sync_run).update(sync_run=None)
+        sync_run.status = SyncRunStatus.UNCONFIRMED
+        sync_run.finished = datetime_utc_now_with_tz()
+        sync_run.save()
+    return cleared
@@ -0,0 +1,179 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import random
+from decimal import Decimal
+from itertools import accumulate, product as cartesian_product
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from shop.models import Store
+from shop.utils import createStore
+from fb_metadata.models import FacebookMetadata
+from catalog.models import CatalogItem, CatalogItemGroup, Product, ProductGroup
+from catalog.models.choices import Availability, Condition
+from .dummy_products import DUMMY_PRODUCTS
+
+# rows per bulk insert and per transaction
+SYNTHETIC_BATCH_SIZE = 5000
+SYNTHETIC_BRANDS = 500
+SYNTHETIC_SIZES = ("XS", "S", "M", "L", "XL", "XXL")
+SYNTHETIC_COLORS = ("Black", "White", "Grey", "Navy", "Blue", "Red", "Green", "Beige")
+# variation fields of a product group, and the share of groups using them
+SYNTHETIC_GROUP_VARIATIONS = ((("size",), 0.5), (("color",), 0.2), (("color", "size"), 0.3))
+
+
+def get_zipf_cum_weights(n, s=1.0):
+    ''' cumulative weights of a zipf distribution over n ranks, for random.choices(cum_weights=...)
+    the item of rank k is picked in proportion to 1 / k**s: a few items get most of the picks,
+    like the best sellers of a catalog or the repeat buyers of a store.
+    '''
+    return list(accumulate(1 / rank ** s for rank in range(1, n + 1)))
+
+
+def create_synthetic_store(username="synthetic"):
+    ''' create a store, with its catalog and FB metadata, to generate synthetic data in '''
+    user, _ = User.objects.get_or_create(username=username)
+    store = createStore("Synthetic store {}".format(Store.objects.filter(merchant=user).count() + 1), user, None)
+    FacebookMetadata.objects.create(
+        store=store,
+        token_info="synthetic_token",
+        fb_catalog_id="synthetic_catalog_{}".format(store.id),
+        fbe_business_vertical="ECOMMERCE",
+        fbe_domain="synthetic.example.com",
+        fbe_channel="COMMERCE",
+    )
+    return store
+
+
+def get_synthetic_price(rng):
+    # log-normal prices, median around $27 with a long tail, ending in .99
+    price = min(int(rng.lognormvariate(3.3, 0.9)), 9999)
+    return Decimal(max(price, 1)) - Decimal("0.01")
+
+
+def get_synthetic_inventory(rng):
+    # some products are sold out, most have a little stock and a few a lot
+    if rng.random() < 0.07:
+        return 0
+    return min(int(rng.paretovariate(1.2) * 4), 10000)
+
+
+def get_synthetic_variations(rng, remaining):
+    ''' variation values of the variants of a new product group, at most `remaining` of them '''
+    fields = rng.choices(
+        [fields for fields, _ in SYNTHETIC_GROUP_VARIATIONS], [share for _, share in SYNTHETIC_GROUP_VARIATIONS]
+    )[0]
+    values = []
+    for field in fields:
+        if field == "size":
+            # a run of consecutive sizes, such as S, M, L
+            count = rng.randint(2, len(SYNTHETIC_SIZES))
+            start = rng.randint(0, len(SYNTHETIC_SIZES) - count)
+            values.append(SYNTHETIC_SIZES[start:start + count])
+        else:
+            values.append(rng.sample(SYNTHETIC_COLORS, rng.randint(2, 4)))
+    return [dict(zip(fields, variation)) for variation in cartesian_product(*values)][:remaining]
+
+
+def generate_catalog(store: Store, products, grouped_share=0.4, seed=0, batch_size=None):
+    ''' add `products` synthetic products to a store's catalog, with bulk inserts
+    the same seed always generates the same products. prices are log-normal, inventory has
+    sold out products and a long tail, brands and categories are zipf distributed, and a share of
+    the products are variants of product groups of 2 to 24 sizes and/or colors.
+    products are not queued in the catalog sync outbox, a full sync sends them.
+
+    params:
+    store: store whose catalog the products are created in
+    products: number of products to create
+    grouped_share: share of the products that are variants in a product group, the rest are standalone
+    seed: seed of the random values
+    batch_size: rows per bulk insert and transaction. defaults to SYNTHETIC_BATCH_SIZE
+    returns:
+    summary: dict with the number of products and of product groups created
+    '''
+    batch_size = batch_size or SYNTHETIC_BATCH_SIZE
+    rng = random.Random(seed)
+    first_id = "synthetic-{}-0".format(store.id)
+    if Product.objects.filter(id=first_id).exists():
+        raise Exception("store [{}] already has synthetic products".format(store.name))
+    brand_weights = get_zipf_cum_weights(SYNTHETIC_BRANDS)
+    category_weights = get_zipf_cum_weights(len(DUMMY_PRODUCTS))
+    summary = {"products": 0, "groups": 0}
+
+    # products of the current batch, with the name of their new product group (or None)
+    batch = []
+    group_number = 0
+    grouped = 0
+    while summary["products"] + len(batch) < products:
+        n = summary["products"] + len(batch)
+        category = rng.choices(DUMMY_PRODUCTS, cum_weights=category_weights)[0]
+        brand = "Brand {}".format(rng.choices(range(SYNTHETIC_BRANDS), cum_weights=brand_weights)[0])
+        base = dict(
+            title="{} {} {}".format(brand, category["title"], n),
+            description="{}. Synthetic product {}.".format(category["desc"], n),
+            amount=get_synthetic_price(rng),
+            image_link="https://picsum.photos/id/{}/200/300".format(category["link"]),
+            brand=brand,
+            google_product_category=category["category_id"],
+            google_product_category_string=category["category_string"],
+            condition=rng.choices([Condition.NEW, Condition.REFURB, Condition.USED], [92, 5, 3])[0],
+        )
+        # a group of variants whenever the catalog falls short of the grouped share
+        if grouped < grouped_share * n:
+            group_name = "Synthetic group {}".format(group_number)
+            group_number += 1
+            variations = get_synthetic_variations(rng, products - n)
+            grouped += len(variations)
+        else:
+            group_name, variations = None, [{}]
+        for variation in variations:
+            product = Product(id="synthetic-{}-{}".format(store.id, summary["products"] + len(batch)), **base)
+            product.link = "https://example.com/products/{}".format(product.id)
+            product.inventory = get_synthetic_inventory(rng)
+            if product.inventory == 0:
+                product._availability = Availability.OUT_OF_STOCK
+            elif rng.random() < 0.01:
+                product._availability = Availability.DISCONTINUED
+            for field, value in variation.items():
+                setattr(product, field, value)
+            # bulk_create does not call Product.save
+            product.variation_signature = product.get_variation_signature()
+            batch.append((product, group_name))
+        if len(batch) >= batch_size:
+            write_synthetic_products(store, batch, summary)
+            batch = []
+    if batch:
+        write_synthetic_products(store, batch, summary)
+    return summary
+
+
+@transaction.atomic
+def write_synthetic_products(store, batch, summary):
+    ''' bulk insert a batch of synthetic products, their product groups and catalog entries '''
+    catalog = store.catalog_id
+    group_fields = {}
+    for product, group_name in batch:
+        if group_name:
+            group_fields.setdefault(group_name, product.get_variation_fields())
+    if group_fields:
+        ProductGroup.objects.bulk_create([
+            ProductGroup(name=name, store=store, **{field: True for field in fields})
+            for name, fields in group_fields.items()
+        ])
+        # primary keys are not set by bulk_create on every db, read them back
+        group_ids = dict(ProductGroup.objects.filter(store=store, name__in=group_fields).values_list("name", "id"))
+        CatalogItemGroup.objects.bulk_create(
+            [CatalogItemGroup(catalog=catalog, product_group_id=group_id) for group_id in group_ids.values()]
+        )
+    for product, group_name in batch:
+        if group_name:
+            product.product_group_id = group_ids[group_name]
+    Product.objects.bulk_create([product for product, _ in batch])
+    CatalogItem.objects.bulk_create(
+        [CatalogItem(catalog=catalog, product=product) for product, group_name in batch if not group_name]
+    )
+    summary["products"] += len(batch)
+    summary["groups"] += len(group_fields)
+    print("store [{}] synthetic catalog: {} products, {} product groups".format(
+        store.name, summary["products"], summary["groups"]
+    ))
@@ -0,0 +1,90 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from shop.models import Store
+from catalog.models import CatalogTombstone, Product
+
+
+def record_tombstones(store_id, retailer_ids):
+    ''' record products removed from a store's catalog so the next sync deletes them on FB
+    the tombstones are written once the surrounding transaction commits, leaving out products
+    that are still in the catalog by then, such as a product moved into a product group.
+
+    params:
+    store_id: id of the store whose catalog the products were removed from
+    retailer_ids: ids of the removed products
+    '''
+    retailer_ids = set(retailer_ids)
+    if not retailer_ids:
+        return
+
+    def write_tombstones():
+        if not Store.objects.filter(id=store_id).exists():
+            # the whole store was deleted
+            return
+        removed_ids = retailer_ids - get_catalog_product_ids(store_id, retailer_ids)
+        CatalogTombstone.objects.bulk_create(
+            [CatalogTombstone(store_id=store_id, retailer_id=retailer_id) for retailer_id in removed_ids],
+            ignore_conflicts=True,
+        )
+
+    transaction.on_commit(write_tombstones)
+
+
+def get_catalog_product_ids(store_id, product_ids):
+    ''' the subset of product_ids that are in the store's catalog, directly or through a product group '''
+    return set(
+        Product.objects.filter(id__in=product_ids).filter(
+            Q(catalogitem__catalog__store_id=store_id)
+            | Q(product_group__catalogitemgroup__catalog__store_id=store_id)
+        ).values_list("id", flat=True)
+    )
+
+
+def get_pending_tombstones(store):
+    ''' retailer ids of the tombstones of a store not sent to FB yet
+    tombstones of products added back to the catalog since are dropped, the sync updates them instead
+    '''
+    pending = CatalogTombstone.objects.filter(store=store, sync_run=None)
+    retailer_ids = set(pending.values_list("retailer_id", flat=True))
+    restored_ids = get_catalog_product_ids(store.id, retailer_ids)
+    if restored_ids:
+        pending.filter(retailer_id__in=restored_ids).delete()
+    return sorted(retailer_ids - restored_ids)
+
+
+def get_delete_requests(retailer_ids):
+    ''' item batch api DELETE requests for the given retailer ids '''
+    for retailer_id in retailer_ids:
+        yield {"method": "DELETE", "data": {"id": retailer_id}}
+
+
+def mark_tombstones_sent(store, retailer_ids, sync_run):
+    ''' link tombstones whose DELETE was accepted by FB to the sync run they were sent in '''
+    CatalogTombstone.objects.filter(store=store, retailer_id__in=retailer_ids).update(
+        sync_run=sync_run, attempts=F("attempts") + 1
+    )
+
+
+def compact_tombstones(sync_run, failed_items):
+    ''' remove the tombstones FB confirmed deleting in a finished sync run
+    tombstones whose DELETE failed are sent again by the next sync, up to settings.CATALOG_SYNC_MAX_ATTEMPTS times
+
+    params:
+    sync_run: the finished CatalogSyncRun
+    failed_items: retailer ids that failed in the run
+    returns:
+    compacted: number of tombstones removed
+    '''
+    sent = CatalogTombstone.objects.filter(sync_run=sync_run)
+    compacted, _ = sent.exclude(retailer_id__in=failed_items).delete()
+    failed = sent.filter(retailer_id__in=failed_items)
+    given_up, _ = failed.filter(attempts__gte=settings.CATALOG_SYNC_MAX_ATTEMPTS).delete()
+    if given_up:
+        print("sync run {}: gave up deleting {} items after {} attempts".format(
+            sync_run.id, given_up, settings.CATALOG_SYNC_MAX_ATTEMPTS
+        ))
+    failed.update(sync_run=None)
+    return compacted
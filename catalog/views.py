@@ -1,17 +1,29 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
+import os
+
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render, redirect
+from django.views.decorators.http import condition
 
 from shop.models import Store
 from shop.utils import canViewThisStore
 from fb_metadata.utils import getFBEOnboardingDetails
 from .models import CatalogItem, CatalogItemGroup, Product
-from .forms import CreateProductForm, UpdateProductForm
+from .forms import CreateProductForm, ImportProductsForm, UpdateProductForm
 from .utils import (
     create_product,
     create_dummy_products,
+    import_products,
     update_product,
 )
-from .tasks import sync_catalog_async
+from .utils.imports import get_import_format
+from .utils.feeds import (
+    get_feed_etag,
+    get_feed_last_modified,
+    get_feed_path,
+    is_feed_request_authorized,
+)
+from .tasks import export_catalog_feed_async, request_catalog_sync, sync_catalog_async
 
 
 def viewProducts(request, storeId):
@@ -102,6 +114,45 @@ def createProduct(request, storeId):
         return render(request, "403.html")
 
 
+# view for importing products from a file
+def importProducts(request, storeId):
+    ''' view method for creating products for a store from an uploaded csv or jsonl file '''
+    if not canViewThisStore(storeId, request.user.id):
+        return render(request, "403.html")
+    store = Store.objects.get(id=storeId)
+    report = None
+    if request.method == "POST":
+        form = ImportProductsForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                format = get_import_format(upload.name)
+            except Exception as e:
+                form.add_error("file", str(e))
+            else:
+                report = import_products(store, upload, format, dry_run=form.cleaned_data["dry_run"])
+                if report["created"] and not form.cleaned_data["dry_run"]:
+                    # the new products are synced to FB from the catalog sync outbox
+                    request_catalog_sync(storeId)
+    else:
+        form = ImportProductsForm()
+
+    breadcrumbs = [
+        (store.name, "viewStore", store.id),
+        ("Products", "viewProducts", store.id),
+    ]
+    context = {
+        "form": form,
+        "page_title": "Import Products",
+        "store": store,
+        "breadcrumbs": breadcrumbs,
+        "report": report,
+        # large reports are cut short on the page, the command can write them all to a file
+        "errors": report and report["errors"][:500],
+    }
+    return render(request, "catalog/import.html", context)
+
+
 # view for updating a product for a store
 def updateProduct(request, productId, storeId):
     ''' view method for updating a specific product for a store '''
@@ -112,10 +163,11 @@ def updateProduct(request, productId, storeId):
         form = UpdateProductForm(request.POST)
         # Check if the form is valid:
         if form.is_valid():
-            # do the create product, then redirect to product view
+            # do the update product, then redirect to product view
+            # the change is synced to FB from the catalog sync outbox
             if form.cleaned_data:
-                product = update_product(productId, **form.cleaned_data)
-                sync_catalog_async.delay(storeId, items=[productId])
+                update_product(productId, **form.cleaned_data)
+                request_catalog_sync(storeId)
             return redirect("viewProducts", storeId)
 
     product = Product.objects.filter(id=productId).values()[0]
@@ -142,6 +194,47 @@ def syncCatalog(request, storeId):
     return redirect("viewProducts", storeId)
 
 
+# "view" to call catalog feed export function
+def exportCatalogFeed(request, storeId):
+    ''' view method to call the async task to export a store's catalog feed and register it with FB '''
+    if canViewThisStore(storeId, request.user.id):
+        export_catalog_feed_async.delay(storeId, register=True)
+        return redirect("viewProducts", storeId)
+    else:
+        return render(request, "403.html")
+
+
+def catalogFeed(request, storeId):
+    ''' view serving the exported catalog feed file of a store
+    FB fetches it with the feed's basic auth credentials, users that can view the store can download it.
+    conditional requests get a 304 when the feed did not change since the fetcher's copy.
+    '''
+    store = Store.objects.filter(id=storeId).first()
+    if store is None:
+        raise Http404("Store does not exist")
+    catalog = store.catalog_id
+    if not (
+        is_feed_request_authorized(request, catalog)
+        or (request.user.is_authenticated and canViewThisStore(storeId, request.user.id))
+    ):
+        response = HttpResponse("Unauthorized", status=401)
+        response["WWW-Authenticate"] = 'Basic realm="catalog feed"'
+        return response
+
+    path = get_feed_path(catalog)
+    if not os.path.exists(path):
+        raise Http404("Catalog feed has not been exported yet")
+
+    @condition(
+        etag_func=lambda request: get_feed_etag(catalog),
+        last_modified_func=lambda request: get_feed_last_modified(catalog),
+    )
+    def serveFeed(request):
+        return FileResponse(open(path, "rb"), filename=os.path.basename(path))
+
+    return serveFeed(request)
+
+
 def createDummyProducts(request, storeId):
     ''' view method to populate a store's catalog with dummy product and variants '''
     create_dummy_products(storeId)
@@ -30,9 +30,10 @@ APP_SECRET = os.getenv("FB_APP_SECRET")
 
 API_VERSION = os.getenv("GRAPH_API_VERSION", "v9.0")
 
-BASE_API_URL = "https://graph.facebook.com/"
+# point at a local stand-in, such as `manage.py run_fake_graph_api`, to run without calling FB
+BASE_API_URL = os.getenv("GRAPH_API_BASE_URL", "https://graph.facebook.com/").rstrip("/") + "/"
 
-GET_ACCESS_TOKEN_URL = "https://graph.facebook.com/{}/oauth/access_token?client_id={}&redirect_uri={}&client_secret={}&code=".format(
+GET_ACCESS_TOKEN_URL = BASE_API_URL + "{}/oauth/access_token?client_id={}&redirect_uri={}&client_secret={}&code=".format(
     API_VERSION, APP_ID, REDIRECT_URI, APP_SECRET
 )
 
@@ -42,9 +43,37 @@ FBE_MANAGEMENT_VIEW_REDIRECT = "https://www.facebook.com/facebook_business_exten
 
 FBE_ONBOARDING_URL = "https://facebook.com/dialog/oauth?client_id={}&display=page&redirect_uri={}&response_type=code&scope={}&state={}&extras={}"
 
-FBE_INFO_API_URL = "https://graph.facebook.com/"+API_VERSION+"/fbe_business/fbe_installs?fbe_external_business_id={}&access_token={}"
-
-SYSTEM_USER_TOKEN_API_URL = "https://graph.facebook.com/"+API_VERSION+"/{}/access_token"
+FBE_INFO_API_URL = BASE_API_URL+API_VERSION+"/fbe_business/fbe_installs?fbe_external_business_id={}&access_token={}"
+
+SYSTEM_USER_TOKEN_API_URL = BASE_API_URL+API_VERSION+"/{}/access_token"
+
+# limits for a single items_batch request when syncing catalogs.
+# catalogs larger than this are split into multiple requests.
+CATALOG_BATCH_MAX_ITEMS = int(os.getenv("CATALOG_BATCH_MAX_ITEMS", 5000))
+CATALOG_BATCH_MAX_BYTES = int(os.getenv("CATALOG_BATCH_MAX_BYTES", 4 * 1024 * 1024))
+# number of products read from the db at a time while streaming a catalog sync
+CATALOG_SYNC_QUERY_CHUNK_SIZE = int(os.getenv("CATALOG_SYNC_QUERY_CHUNK_SIZE", 2000))
+# number of items_batch chunks uploaded in parallel, per catalog (see Catalog.sync_concurrency)
+CATALOG_SYNC_CONCURRENCY = int(os.getenv("CATALOG_SYNC_CONCURRENCY", 4))
+CATALOG_SYNC_MAX_CONCURRENCY = int(os.getenv("CATALOG_SYNC_MAX_CONCURRENCY", 16))
+# seconds between checks of the items_batch handles of a sync, and how long to keep checking
+CATALOG_SYNC_STATUS_POLL_INTERVAL = int(os.getenv("CATALOG_SYNC_STATUS_POLL_INTERVAL", 30))
+CATALOG_SYNC_STATUS_MAX_POLLS = int(os.getenv("CATALOG_SYNC_STATUS_MAX_POLLS", 40))
+# items that failed are synced again up to this many attempts in total,
+# waiting CATALOG_SYNC_RETRY_BACKOFF * 2^(attempt - 1) seconds before each retry
+CATALOG_SYNC_MAX_ATTEMPTS = int(os.getenv("CATALOG_SYNC_MAX_ATTEMPTS", 3))
+CATALOG_SYNC_RETRY_BACKOFF = int(os.getenv("CATALOG_SYNC_RETRY_BACKOFF", 60))
+# max number of catalog sync outbox rows read by a single drain
+CATALOG_OUTBOX_BATCH_SIZE = int(os.getenv("CATALOG_OUTBOX_BATCH_SIZE", 10000))
+# product edits and fulfillments of a store within this many seconds are synced as one batch
+CATALOG_SYNC_DEBOUNCE_SECONDS = int(os.getenv("CATALOG_SYNC_DEBOUNCE_SECONDS", 10))
+# directory catalog feed files are exported to (ignored by git when left in the source tree), and how often FB fetches a registered feed
+CATALOG_FEED_DIR = os.getenv("CATALOG_FEED_DIR", os.path.join(BASE_DIR, "catalog_feeds"))
+CATALOG_FEED_INTERVAL = os.getenv("CATALOG_FEED_INTERVAL", "DAILY")
+# rows validated and written per transaction when importing products from a file
+CATALOG_IMPORT_BATCH_SIZE = int(os.getenv("CATALOG_IMPORT_BATCH_SIZE", 1000))
+# applied inventory ledger entries older than this are merged into one entry per product by the ledger compaction
+INVENTORY_LEDGER_RETENTION_DAYS = int(os.getenv("INVENTORY_LEDGER_RETENTION_DAYS", 30))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.1/howto/deployment/checklist/
@@ -72,7 +101,7 @@ INSTALLED_APPS = [
     "django_celery_results",
 
     "order",
-    "catalog",
+    "catalog.apps.CatalogConfig",
     "member",
     "shop",
     "core",
@@ -162,6 +191,41 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_BACKEND = "django-db"
 
+# Graph API calls of all workers share token buckets in this redis, the celery broker by default.
+# leave empty to disable rate limiting
+GRAPH_RATE_LIMIT_REDIS_URL = os.getenv("GRAPH_RATE_LIMIT_REDIS_URL", CELERY_BROKER_URL)
+# seconds to wait for the rate limiter's redis to connect or answer before sending the call unthrottled
+GRAPH_RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv("GRAPH_RATE_LIMIT_REDIS_TIMEOUT", 0.5))
+# calls per second, and burst size, of the app's bucket and of each catalog's and page's bucket
+GRAPH_RATE_LIMIT_RATE = float(os.getenv("GRAPH_RATE_LIMIT_RATE", 10))
+GRAPH_RATE_LIMIT_BURST = int(os.getenv("GRAPH_RATE_LIMIT_BURST", 20))
+# calls slow down once the usage headers report more than this percentage of the limits, must be below 100
+GRAPH_RATE_LIMIT_USAGE_THRESHOLD = int(os.getenv("GRAPH_RATE_LIMIT_USAGE_THRESHOLD", 75))
+# seconds to pause a bucket when throttled without an estimated time to regain access
+GRAPH_RATE_LIMIT_THROTTLED_BACKOFF = int(os.getenv("GRAPH_RATE_LIMIT_THROTTLED_BACKOFF", 60))
+# max seconds a single call waits for the limiter
+GRAPH_RATE_LIMIT_MAX_WAIT = int(os.getenv("GRAPH_RATE_LIMIT_MAX_WAIT", 300))
+
+# max stores synced at the same time by a worker running the multi store sync tasks,
+# see core.utils.store_engine
+STORE_SYNC_ENGINE_CONCURRENCY = int(os.getenv("STORE_SYNC_ENGINE_CONCURRENCY", 32))
+
+# outbound calls share one connection pool of this size per process, and the catalog syncs of a process
+# one upload executor with as many threads, see core.utils.graph and catalog.utils.item_batch
+GRAPH_API_POOL_SIZE = int(os.getenv(
+    "GRAPH_API_POOL_SIZE", max(CATALOG_SYNC_MAX_CONCURRENCY, STORE_SYNC_ENGINE_CONCURRENCY)
+))
+# seconds to wait for a connection, and for a response
+GRAPH_API_CONNECT_TIMEOUT = float(os.getenv("GRAPH_API_CONNECT_TIMEOUT", 5))
+GRAPH_API_READ_TIMEOUT = float(os.getenv("GRAPH_API_READ_TIMEOUT", 60))
+# connection errors, server errors and rate limiting are retried up to this many times,
+# waiting a random time up to GRAPH_API_RETRY_BACKOFF * 2^retry seconds, capped at GRAPH_API_RETRY_MAX_BACKOFF
+GRAPH_API_MAX_RETRIES = int(os.getenv("GRAPH_API_MAX_RETRIES", 3))
+GRAPH_API_RETRY_BACKOFF = float(os.getenv("GRAPH_API_RETRY_BACKOFF", 1))
+GRAPH_API_RETRY_MAX_BACKOFF = float(os.getenv("GRAPH_API_RETRY_MAX_BACKOFF", 30))
+# max sub-requests per Graph batch call, 50 is the Graph API limit
+GRAPH_BATCH_MAX_REQUESTS = int(os.getenv("GRAPH_BATCH_MAX_REQUESTS", 50))
+
 LOGIN_REDIRECT_URL = "/"
 LOGIN_URL = "/accounts/login/"
 LOGOUT_REDIRECT_URL = LOGIN_URL
@@ -0,0 +1,58 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product
+from core.utils.fake_graph_api import FakeGraphAPI, make_fake_graph_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Graph API endpoints this project calls. "
+        "Set GRAPH_API_BASE_URL to the printed url to sync catalogs and orders against it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+        parser.add_argument("--latency-jitter", type=float, default=0.0, help="up to this many extra seconds at random")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls failing with a 500")
+        parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls failing with a rate limit error")
+        parser.add_argument("--item-error-rate", type=float, default=0.0, help="fraction of items_batch items failing validation")
+        parser.add_argument("--usage", type=int, default=0, help="percentage reported in the usage headers")
+        parser.add_argument("--orders", type=int, default=100, help="number of orders served by commerce_orders")
+        parser.add_argument("--items-per-order", type=int, default=2)
+        parser.add_argument("--page-size", type=int, default=25, help="orders per commerce_orders page")
+        parser.add_argument("--store-id", type=int, help="pick order items from the products of this store")
+        parser.add_argument("--seed", type=int, help="seed for repeatable errors and datasets")
+        parser.add_argument("--verbose-requests", action="store_true", help="log every request")
+
+    def handle(self, *args, **options):
+        retailer_ids = None
+        if options["store_id"]:
+            products = Product.objects.filter(product_group__store_id=options["store_id"]) | Product.objects.filter(
+                catalogitem__catalog__store_id=options["store_id"]
+            )
+            retailer_ids = list(products.values_list("id", flat=True))
+        app = FakeGraphAPI(
+            latency=options["latency"],
+            latency_jitter=options["latency_jitter"],
+            error_rate=options["error_rate"],
+            throttle_rate=options["throttle_rate"],
+            item_error_rate=options["item_error_rate"],
+            usage=options["usage"],
+            orders=options["orders"],
+            items_per_order=options["items_per_order"],
+            page_size=options["page_size"],
+            retailer_ids=retailer_ids,
+            seed=options["seed"],
+        )
+        server = make_fake_graph_server(app, options["host"], options["port"], quiet=not options["verbose_requests"])
+        self.stdout.write("fake Graph API listening, use GRAPH_API_BASE_URL=http://{}:{}/".format(*server.server_address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write("calls: {}".format(dict(app.calls)))
@@ -0,0 +1,36 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.db import migrations
+
+# task, interval and period of the schedules of the catalog sync and inventory ledger tasks.
+# the schedules are regular django_celery_beat PeriodicTasks, edit them in the admin
+SCHEDULES = (
+    # safety net for the debounced per store drains, see catalog.tasks.request_catalog_sync
+    ("core.tasks.periodic_drain_catalog_outbox", 5, "minutes"),
+    # inventory ledger entries left pending by a failed materialization, and compaction
+    ("core.tasks.periodic_compact_inventory_ledger", 1, "minutes"),
+    ("core.tasks.periodic_reconcile_inventory", 1, "days"),
+)
+
+
+def add_schedules(apps, schema_editor):
+    IntervalSchedule = apps.get_model("django_celery_beat", "IntervalSchedule")
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    for task, every, period in SCHEDULES:
+        interval, _ = IntervalSchedule.objects.get_or_create(every=every, period=period)
+        PeriodicTask.objects.get_or_create(name=task, defaults={"task": task, "interval": interval})
+
+
+def remove_schedules(apps, schema_editor):
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name__in=[task for task, _, _ in SCHEDULES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_celery_beat", "0015_edit_solarschedule_events_choices"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_schedules, remove_schedules),
+    ]
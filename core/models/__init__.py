@@ -1,4 +1,4 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
 # Import all models and managers so no code change is needed elsewhere in the app
 # flake8: noqa
-from .abstract import BaseModel
+from .abstract import BaseModel, skip_validation
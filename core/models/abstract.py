@@ -1,6 +1,34 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.db import models
 
+# max instances looked up by one query of a multi field uniqueness check, to keep the sql bounded
+BULK_VALIDATION_CHUNK_SIZE = 500
+
+_skip_validation = ContextVar("skip_validation", default=False)
+
+
+@contextmanager
+def skip_validation():
+    ''' skip the full_clean of BaseModel.save within the block
+    for trusted internal paths that save values already validated, or set from choices
+    constants, such as order state updates. the setting is local to the current thread or task.
+    '''
+    token = _skip_validation.set(True)
+    try:
+        yield
+    finally:
+        _skip_validation.reset(token)
+
+
+def is_validation_skipped():
+    return _skip_validation.get()
+
 
 class BaseModel(models.Model):
     '''Models do not automatically enforce certain required field rules.
@@ -8,11 +36,162 @@ class BaseModel(models.Model):
     We are to run validation ourselves in each model.
     Overriding save in models.Model is one recommended way.
     In order for this to work the class must be marked abstract using the Meta class
-    below.'''
+    below.
+
+    full_clean runs a query per foreign key and per uniqueness check of every instance saved.
+    to write many instances, validate them together with bulk_validate, or use
+    bulk_create_validated / bulk_update_validated, and skip_validation for trusted paths.'''
 
     def save(self, *args, **kwargs):
-        self.full_clean()
+        if not is_validation_skipped():
+            self.full_clean()
         super().save(*args, **kwargs)
 
     class Meta:
         abstract = True
+
+    @classmethod
+    def bulk_validate(cls, instances, exclude=None):
+        ''' validate instances of this model like full_clean, with queries per field instead of per instance
+        foreign keys are checked with one query per foreign key field, and uniqueness (unique fields,
+        unique_together and unique constraints) with one query per check, against the db and among
+        the instances themselves.
+
+        params:
+        instances: list of instances to validate
+        exclude: optional. names of fields not to validate, such as fields a bulk update does not change
+        returns:
+        errors: dict of the index of each invalid instance to its errors, as ValidationError.message_dict
+        '''
+        exclude = set(exclude or [])
+        relations = [
+            field for field in cls._meta.concrete_fields
+            if (field.many_to_one or field.one_to_one) and field.name not in exclude
+        ]
+        errors = {}
+        for index, instance in enumerate(instances):
+            try:
+                instance.full_clean(exclude=exclude | {field.name for field in relations}, validate_unique=False)
+            except ValidationError as e:
+                errors[index] = e.message_dict
+        for field in relations:
+            cls._bulk_validate_relation(instances, field, errors)
+        if instances:
+            unique_checks, _ = instances[0]._get_unique_checks(exclude=exclude)
+            for model_class, unique_check in unique_checks:
+                cls._bulk_validate_unique(instances, model_class, unique_check, errors)
+        return errors
+
+    @staticmethod
+    def _add_errors(errors, index, key, messages):
+        errors.setdefault(index, {}).setdefault(key, []).extend(messages)
+
+    @classmethod
+    def _bulk_validate_relation(cls, instances, field, errors):
+        # same checks as ForeignKey.validate, with one query for all the instances
+        values = {}
+        for index, instance in enumerate(instances):
+            if field.name in errors.get(index, {}):
+                continue
+            value = getattr(instance, field.attname)
+            try:
+                # null, blank and choices checks, without the db lookup of ForeignKey.validate
+                models.Field.validate(field, value, instance)
+            except ValidationError as e:
+                cls._add_errors(errors, index, field.name, e.messages)
+                continue
+            if value is not None:
+                values.setdefault(value, []).append(index)
+        if not values:
+            return
+        remote_field = field.remote_field
+        existing = set(
+            remote_field.model._base_manager.filter(**{remote_field.field_name + "__in": list(values)})
+            .complex_filter(field.get_limit_choices_to())
+            .values_list(remote_field.field_name, flat=True)
+        )
+        for value in set(values) - existing:
+            error = ValidationError(
+                field.error_messages["invalid"],
+                code="invalid",
+                params={
+                    "model": remote_field.model._meta.verbose_name,
+                    "pk": value,
+                    "field": remote_field.field_name,
+                    "value": value,
+                },
+            )
+            for index in values[value]:
+                cls._add_errors(errors, index, field.name, error.messages)
+
+    @classmethod
+    def _bulk_validate_unique(cls, instances, model_class, unique_check, errors):
+        # same check as Model._perform_unique_checks, with one query per chunk of instances
+        fields = [cls._meta.get_field(name) for name in unique_check]
+        attnames = [field.attname for field in fields]
+        lookups = {}
+        for index, instance in enumerate(instances):
+            if any(field.primary_key and not instance._state.adding for field in fields):
+                # no need to check for unique primary key when editing
+                continue
+            if any(name in errors.get(index, {}) for name in unique_check):
+                # like full_clean, fields that did not validate are not checked for uniqueness
+                continue
+            key = tuple(getattr(instance, attname) for attname in attnames)
+            if any(value is None for value in key):
+                continue
+            lookups.setdefault(key, []).append(index)
+        if not lookups:
+            return
+
+        # rows in the db with the same values, and their pk
+        existing = {}
+        keys = list(lookups)
+        manager = model_class._default_manager
+        if len(attnames) == 1:
+            chunks = [keys]
+        else:
+            chunks = [keys[i:i + BULK_VALIDATION_CHUNK_SIZE] for i in range(0, len(keys), BULK_VALIDATION_CHUNK_SIZE)]
+        for chunk in chunks:
+            if len(attnames) == 1:
+                rows = manager.filter(**{attnames[0] + "__in": [key[0] for key in chunk]})
+            else:
+                rows = manager.filter(reduce(or_, (models.Q(**dict(zip(attnames, key))) for key in chunk)))
+            for pk, *values in rows.values_list("pk", *attnames):
+                existing.setdefault(tuple(values), set()).add(pk)
+
+        error_key = unique_check[0] if len(unique_check) == 1 else NON_FIELD_ERRORS
+        for key, indexes in lookups.items():
+            pks = existing.get(key, set())
+            for position, index in enumerate(indexes):
+                instance = instances[index]
+                # the instance's own row when editing, and instances earlier in the list, do not count
+                own_pk = None if instance._state.adding else instance._get_pk_val(model_class._meta)
+                if pks - {own_pk} or position > 0:
+                    cls._add_errors(errors, index, error_key, [instance.unique_error_message(model_class, unique_check)])
+
+    @classmethod
+    def bulk_create_validated(cls, instances, batch_size=None):
+        ''' validate instances with bulk_validate, then insert them with bulk_create
+        raises a ValidationError listing the errors of each invalid instance, without inserting any
+        '''
+        errors = cls.bulk_validate(instances)
+        if errors:
+            raise ValidationError(cls.get_bulk_error_messages(errors))
+        return cls._default_manager.bulk_create(instances, batch_size=batch_size)
+
+    @classmethod
+    def bulk_update_validated(cls, instances, fields, batch_size=None):
+        ''' validate the updated fields of instances with bulk_validate, then save them with bulk_update
+        raises a ValidationError listing the errors of each invalid instance, without updating any
+        '''
+        exclude = [field.name for field in cls._meta.concrete_fields if field.name not in fields]
+        errors = cls.bulk_validate(instances, exclude=exclude)
+        if errors:
+            raise ValidationError(cls.get_bulk_error_messages(errors))
+        return cls._default_manager.bulk_update(instances, fields, batch_size=batch_size)
+
+    @staticmethod
+    def get_bulk_error_messages(errors):
+        # one message per invalid instance, such as "2: {'amount': ['This field cannot be null.']}"
+        return ["{}: {}".format(index, instance_errors) for index, instance_errors in sorted(errors.items())]
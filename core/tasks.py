@@ -4,7 +4,11 @@
 from celery import shared_task
 from celery.utils.log import get_task_logger
 from order.tasks import fetch_orders_async
-from catalog.tasks import sync_catalog_async
+from order.utils import fetch_and_ack_orders_by_id
+from catalog.tasks import export_catalog_feed_async, request_catalog_sync, sync_catalog, sync_catalog_async, sync_catalog_outbox
+from catalog.models import InventoryLedgerEntry
+from catalog.utils import compact_inventory_ledger, materialize_inventory, reconcile_inventory
+from core.utils.store_engine import run_for_stores
 from shop.models import Store
 
 logger = get_task_logger(__name__)
@@ -24,10 +28,95 @@ def periodic_orders_sync_all_stores():
 
 @shared_task
 def periodic_catalog_sync_all_stores():
-    ''' Scheduled task to sync catalog for all stores '''
+    ''' Scheduled task to sync catalog for all stores
+    only products changed since their last sync are sent. a full sync can still be
+    triggered per store with sync_catalog_async.
+    '''
     logger.info("periodic_catalog_sync_all_stores")
     stores = Store.objects.all()
     for index, store in enumerate(stores, start=1):
         sync_catalog_async.apply_async(kwargs={
-            "store_id": store.id
+            "store_id": store.id,
+            "changed_only": True,
         }, countdown = index + 3, expires = 5 * 60)
+
+@shared_task
+def periodic_drain_catalog_outbox():
+    ''' Scheduled task to sync the product changes queued in the catalog sync outbox
+    one items_batch sync is sent per store for all products changed since the last drain,
+    and its sync run is polled and its failed items retried like any other sync
+    '''
+    logger.info("periodic_drain_catalog_outbox")
+    results = sync_catalog_outbox()
+    for store_id, result in results.items():
+        logger.info("drained {} outbox rows into a sync of {} products ({} partial) for store id {} ({} collapsed)".format(
+                result["rows"], result["items"], result["partial_items"], store_id, result["collapsed"]
+            )
+        )
+
+@shared_task
+def periodic_compact_inventory_ledger():
+    ''' Scheduled task to apply the inventory ledger entries left pending, such as when the
+    materialization after an order update failed, then merge the old applied entries of each product.
+    a sync of the stores whose inventory changed is requested.
+    '''
+    changed = materialize_inventory()
+    for store_id in InventoryLedgerEntry.objects.filter(product_id__in=changed).values_list("store_id", flat=True).order_by().distinct():
+        request_catalog_sync(store_id)
+    deleted = compact_inventory_ledger()
+    logger.info("periodic_compact_inventory_ledger: inventory of {} products updated, {} ledger entries compacted".format(
+            len(changed), deleted
+        )
+    )
+
+@shared_task
+def periodic_reconcile_inventory():
+    ''' Scheduled task to check every product inventory against the sum of its applied inventory ledger entries
+    mismatches are only logged. fix them with the reconcile_inventory command and --rebuild
+    '''
+    mismatches = reconcile_inventory()
+    logger.info("periodic_reconcile_inventory: {} mismatched products".format(len(mismatches)))
+    for product_id, inventory, ledger_balance in mismatches:
+        logger.warning("product id {} has inventory {}, its inventory ledger has {}".format(product_id, inventory, ledger_balance))
+
+@shared_task
+def periodic_export_catalog_feeds():
+    ''' Scheduled task to export the catalog feed file of every store with a registered FB feed
+    FB fetches the file on the feed's own schedule and skips it when unchanged
+    '''
+    logger.info("periodic_export_catalog_feeds")
+    stores = Store.objects.filter(catalog_id__feed_id__isnull=False)
+    for index, store in enumerate(stores, start=1):
+        export_catalog_feed_async.apply_async(kwargs={
+            "store_id": store.id,
+        }, countdown = index + 3, expires = 30 * 60)
+
+def get_store_shard(shard, shards):
+    ''' ids of the stores in one of `shards` equal shards, so several workers can split all stores '''
+    return [store_id for store_id in Store.objects.values_list("id", flat=True) if store_id % shards == shard]
+
+@shared_task
+def periodic_orders_sync_stores_concurrently(shard=0, shards=1, concurrency=None):
+    ''' Scheduled task to sync orders for a shard of all stores in this worker
+    alternative to periodic_orders_sync_all_stores. stores are synced concurrently
+    by core.utils.store_engine instead of one task per store.
+    '''
+    store_ids = get_store_shard(shard, shards)
+    logger.info("periodic_orders_sync_stores_concurrently for {} stores (shard {}/{})".format(len(store_ids), shard, shards))
+    results = run_for_stores(store_ids, fetch_and_ack_orders_by_id, concurrency)
+    for store_id, result in results.items():
+        if isinstance(result, Exception):
+            logger.warning("order sync failed for store id {}: {!r}".format(store_id, result))
+
+@shared_task
+def periodic_catalog_sync_stores_concurrently(shard=0, shards=1, concurrency=None):
+    ''' Scheduled task to delta sync catalogs for a shard of all stores in this worker
+    alternative to periodic_catalog_sync_all_stores. stores are synced concurrently
+    by core.utils.store_engine instead of one task per store.
+    '''
+    store_ids = get_store_shard(shard, shards)
+    logger.info("periodic_catalog_sync_stores_concurrently for {} stores (shard {}/{})".format(len(store_ids), shard, shards))
+    results = run_for_stores(store_ids, lambda store_id: sync_catalog(store_id, changed_only=True), concurrency)
+    for store_id, result in results.items():
+        if isinstance(result, Exception):
+            logger.warning("catalog sync failed for store id {}: {!r}".format(store_id, result))
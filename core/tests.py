@@ -1,4 +1,226 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
-from django.test import TestCase # noqa F401
+import json
+import socket
+import time
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+import redis
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase
+
+from core.utils import rate_limit
+from core.utils.fake_graph_api import fake_graph_api
+from core.utils.graph import get_batch_request, graph_batch, graph_request
+from core.utils.store_engine import run_for_stores
+
+
+class RateLimitTests(TestCase):
+    def test_unresponsive_redis_fails_open(self):
+        # accepts connections but never answers
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        redis_url = "redis://127.0.0.1:{}/0".format(server.getsockname()[1])
+        try:
+            with self.settings(GRAPH_RATE_LIMIT_REDIS_URL=redis_url, GRAPH_RATE_LIMIT_REDIS_TIMEOUT=0.2), \
+                    patch.object(rate_limit, "_redis", None):
+                start = time.monotonic()
+                self.assertEqual(rate_limit.throttle("catalog:1"), 0)
+                self.assertLess(time.monotonic() - start, 2)
+        finally:
+            server.close()
+
+    def test_usage_threshold_below_100(self):
+        with self.settings(GRAPH_RATE_LIMIT_REDIS_URL="redis://127.0.0.1:1/0", GRAPH_RATE_LIMIT_USAGE_THRESHOLD=100), \
+                patch.object(rate_limit, "_redis", None):
+            with self.assertRaises(ImproperlyConfigured):
+                rate_limit.throttle()
+
+
+def make_response(status_code, body=None, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body or {}).encode("utf-8")
+    response.headers.update({key: json.dumps(value) for key, value in (headers or {}).items()})
+    return response
+
+
+class UsageHeadersTests(SimpleTestCase):
+    def test_get_usage(self):
+        response = make_response(200, headers={
+            "X-App-Usage": {"call_count": 12, "total_time": 40, "total_cputime": 3},
+            "X-Business-Use-Case-Usage": {"123": [
+                {"type": "catalog_management", "call_count": 20, "total_time": 5, "estimated_time_to_regain_access": 0},
+                {"type": "catalog_batch", "call_count": 95, "total_cputime": 10, "estimated_time_to_regain_access": 2},
+            ]},
+        })
+        self.assertEqual(rate_limit.get_usage(response.headers), (40, 95, 120))
+        self.assertEqual(rate_limit.get_usage({}), (None, None, 0))
+        self.assertEqual(rate_limit.get_usage({"X-App-Usage": "not json"}), (None, None, 0))
+
+    def test_is_throttled(self):
+        self.assertTrue(rate_limit.is_throttled(make_response(429)))
+        for code in (4, 17, 32, 613, 80004):
+            self.assertTrue(rate_limit.is_throttled(make_response(400, {"error": {"code": code}})))
+        self.assertFalse(rate_limit.is_throttled(make_response(400, {"error": {"code": 100}})))
+        self.assertFalse(rate_limit.is_throttled(make_response(500, {"error": {"code": 4}})))
+        self.assertFalse(rate_limit.is_throttled(make_response(200)))
+
+    def record_usage(self, response, scope=None):
+        client = MagicMock()
+        with patch.object(rate_limit, "get_redis", return_value=client), patch.object(rate_limit, "_redis", client), \
+                patch("core.utils.rate_limit.time.time", return_value=1000):
+            rate_limit.record_usage(response, scope)
+        pipe = client.pipeline.return_value
+        return {call.args[0:2]: call.args[2] for call in pipe.hset.call_args_list}
+
+    def test_record_usage(self):
+        response = make_response(200, headers={
+            "X-App-Usage": {"call_count": 12},
+            "X-Business-Use-Case-Usage": {"123": [{"call_count": 90, "estimated_time_to_regain_access": 1}]},
+        })
+        self.assertEqual(self.record_usage(response, "catalog:123"), {
+            ("graph_rate_limit:app", "usage"): 12,
+            ("graph_rate_limit:catalog:123", "usage"): 90,
+            ("graph_rate_limit:catalog:123", "blocked_until"): 1060,
+        })
+        # the business use case header is only recorded for a scope
+        self.assertEqual(self.record_usage(response), {("graph_rate_limit:app", "usage"): 12})
+
+    def test_throttled_without_estimate_backs_off(self):
+        response = make_response(400, {"error": {"code": 80004}})
+        backoff = 1000 + settings.GRAPH_RATE_LIMIT_THROTTLED_BACKOFF
+        self.assertEqual(self.record_usage(response, "catalog:123"), {
+            ("graph_rate_limit:catalog:123", "usage"): 100,
+            ("graph_rate_limit:catalog:123", "blocked_until"): backoff,
+        })
+        self.assertEqual(self.record_usage(response), {
+            ("graph_rate_limit:app", "usage"): 100,
+            ("graph_rate_limit:app", "blocked_until"): backoff,
+        })
+
+
+class TokenBucketTests(SimpleTestCase):
+    KEY = "graph_rate_limit:test"
+
+    def setUp(self):
+        # fakeredis when installed with lua support, else a local redis
+        try:
+            import fakeredis
+            client = fakeredis.FakeStrictRedis()
+        except ImportError:
+            client = redis.Redis.from_url(settings.CELERY_BROKER_URL or "redis://127.0.0.1:6379/0", socket_timeout=0.5)
+        try:
+            client.delete(self.KEY)
+            self.bucket = client.register_script(rate_limit._TOKEN_BUCKET_SCRIPT)
+            self.take(0)
+        except Exception as e:
+            self.skipTest("no redis to run the token bucket script: {}".format(e))
+        client.delete(self.KEY)
+        self.addCleanup(client.delete, self.KEY)
+        self.client = client
+
+    def take(self, now, rate=10, capacity=2, threshold=75):
+        return float(self.bucket(keys=[self.KEY], args=[now, rate, capacity, threshold]))
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.take(100), self.take(100)], [0, 0])
+        self.assertAlmostEqual(self.take(100), 0.1)
+        self.assertEqual(self.take(100.2), 0)
+
+    def test_refill_slows_down_over_threshold(self):
+        self.client.hset(self.KEY, "usage", 95)
+        for _ in range(2):
+            self.take(100)
+        # the refill runs at a fifth of the rate at 95% usage with a 75% threshold
+        self.assertAlmostEqual(self.take(100), 0.5)
+
+    def test_blocked_until(self):
+        self.client.hset(self.KEY, "blocked_until", 130)
+        self.assertEqual(self.take(100), 30)
+        self.assertEqual(self.take(130), 0)
+
+
+class GraphBatchTests(TestCase):
+    def test_responses_in_request_order(self):
+        batch_requests = [
+            get_batch_request("POST", "fake_order_{}/shipments".format(n), {"items": []}) for n in (1, 999, 2, 3, 998)
+        ]
+        with self.settings(GRAPH_BATCH_MAX_REQUESTS=2), fake_graph_api(orders=3) as app:
+            responses = graph_batch(batch_requests, "token")
+        self.assertEqual(app.calls["batch"], 3)
+        self.assertEqual([code for code, _ in responses], [200, 400, 200, 200, 400])
+        self.assertEqual(responses[0][1], {"success": True})
+
+    def test_failed_calls_keep_alignment(self):
+        batch_requests = [get_batch_request("POST", "fake_order_{}/shipments".format(n)) for n in range(1, 6)]
+        # the second call is answered for its first sub-request only, the third fails
+        responses = iter([
+            [{"code": 200, "body": "{\"success\": true}"}] * 2,
+            [{"code": 200, "body": "{\"success\": true}"}],
+            {"error": {"message": "An unexpected error has occurred."}},
+        ])
+        with self.settings(GRAPH_BATCH_MAX_REQUESTS=2), patch("core.utils.graph.graph_post") as post:
+            post.return_value.json.side_effect = lambda: next(responses)
+            results = graph_batch(batch_requests, "token")
+        self.assertEqual(results, [(200, {"success": True})] * 3 + [(None, None)] * 2)
+
+
+class GraphRequestTests(SimpleTestCase):
+    def request(self, *responses, max_retries=2):
+        url = "{}{}/fake_catalog/items_batch".format(settings.BASE_API_URL, settings.API_VERSION)
+        with self.settings(GRAPH_RATE_LIMIT_REDIS_URL=""), patch("core.utils.graph.get_session") as session, \
+                patch("core.utils.graph.time.sleep") as sleep:
+            session.return_value.request.side_effect = responses
+            try:
+                return graph_request("POST", url, max_retries=max_retries)
+            finally:
+                self.calls = session.return_value.request.call_count
+                self.sleeps = sleep.call_count
+
+    def test_server_errors_retried(self):
+        response = self.request(make_response(500), make_response(503), make_response(200))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.calls, self.sleeps), (3, 2))
+
+    def test_throttling_retried(self):
+        response = self.request(make_response(400, {"error": {"code": 80004}}), make_response(429), make_response(200))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, 3)
+
+    def test_connection_errors_retried(self):
+        response = self.request(requests.ConnectionError("reset"), requests.Timeout("read timeout"), make_response(200))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, 3)
+
+    def test_gives_up_after_max_retries(self):
+        response = self.request(*[make_response(500)] * 3)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual((self.calls, self.sleeps), (3, 2))
+        with self.assertRaises(requests.ConnectionError):
+            self.request(*[requests.ConnectionError("reset")] * 3)
+        self.assertEqual(self.calls, 3)
+
+    def test_client_errors_not_retried(self):
+        response = self.request(make_response(400, {"error": {"code": 100}}), make_response(200))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((self.calls, self.sleeps), (1, 0))
+        self.assertEqual(self.request(make_response(404), make_response(200)).status_code, 404)
+        self.assertEqual(self.calls, 1)
+
+
+class StoreEngineTests(SimpleTestCase):
+    def test_store_failures_isolated(self):
+        def sync_store(store_id):
+            # later stores finish first
+            time.sleep(0.01 * (5 - store_id))
+            if store_id == 2:
+                raise ValueError("store 2 failed")
+            return store_id * 10
+
+        results = run_for_stores([4, 2, 1, 3], sync_store, concurrency=4)
+        self.assertEqual(list(results), [4, 2, 1, 3])
+        self.assertIsInstance(results.pop(2), ValueError)
+        self.assertEqual(results, {4: 40, 1: 10, 3: 30})
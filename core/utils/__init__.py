@@ -4,3 +4,4 @@
 
 from .create_google_product_categories import create_google_product_categories
 from .misc import get_idempotency_key
+from .graph import graph_request, graph_get, graph_post, graph_batch, get_batch_request
@@ -2,13 +2,14 @@
 import json
 import os
 
-import requests
 from django.conf import settings
 
+from .graph import graph_get
+
 
 def create_google_product_categories():
     """ This method creates a JSON of the google product categories that is used to populate the dropdown """
-    r = requests.get(
+    r = graph_get(
         "https://www.google.com/basepages/producttype/taxonomy-with-ids.en-US.txt"
     )
 
@@ -0,0 +1,289 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.test import override_settings
+
+_VERSION = re.compile(r"^v\d+\.\d+$")
+
+
+class FakeGraphAPI:
+    """A local stand-in for the Graph API endpoints this project calls, as a WSGI app.
+    Used to run load and benchmark tests without calling FB: point settings.BASE_API_URL at it.
+
+    config:
+    latency: seconds added to every response
+    latency_jitter: up to this many extra seconds added at random
+    error_rate: fraction of calls answered with a transient 500 error
+    throttle_rate: fraction of calls answered with a rate limiting error
+    item_error_rate: fraction of items_batch requests reported with a validation error
+    usage: percentage reported in the X-App-Usage and X-Business-Use-Case-Usage headers
+    orders: number of orders returned by commerce_orders
+    items_per_order: number of items in each order
+    page_size: orders per commerce_orders page
+    retailer_ids: product ids the order items are picked from. made up ids if not provided
+    seed: seed of the random errors and datasets, for repeatable runs
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        latency_jitter=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        item_error_rate=0.0,
+        usage=0,
+        orders=100,
+        items_per_order=2,
+        page_size=25,
+        retailer_ids=None,
+        seed=None,
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.item_error_rate = item_error_rate
+        self.usage = usage
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # calls and request bytes received per endpoint
+        self.calls = Counter()
+        self.bytes_received = Counter()
+        self.next_id = 1
+        retailer_ids = list(retailer_ids or ["fake_product_{}".format(n) for n in range(1, 101)])
+        self.orders = [
+            self.make_order(n, [self.random.choice(retailer_ids) for _ in range(items_per_order)])
+            for n in range(1, orders + 1)
+        ]
+        self.orders_by_id = {order["id"]: order for order in self.orders}
+
+    def __call__(self, environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        parts = [part for part in environ.get("PATH_INFO", "").split("/") if part]
+        if parts and _VERSION.match(parts[0]):
+            parts = parts[1:]
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+        params = dict(parse_qsl(environ.get("QUERY_STRING", "")))
+        params.update(self.parse_body(body, environ.get("CONTENT_TYPE", "")))
+        base_url = "{}://{}/".format(environ["wsgi.url_scheme"], environ["HTTP_HOST"])
+
+        endpoint = parts[-1] if parts else "batch"
+        with self.lock:
+            self.calls[endpoint] += 1
+            self.bytes_received[endpoint] += length
+            roll = self.random.random()
+        delay = self.latency + (self.random.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        usage = self.usage
+        if roll < self.error_rate:
+            status, data = 500, {"error": {
+                "message": "An unexpected error has occurred. Please retry your request later.",
+                "type": "OAuthException", "code": 2, "is_transient": True,
+            }}
+        elif roll < self.error_rate + self.throttle_rate:
+            usage = 100
+            status, data = 400, {"error": {
+                "message": "There have been too many calls from this business.",
+                "type": "OAuthException", "code": 80014, "is_transient": True,
+            }}
+        else:
+            status, data = self.dispatch(method, parts, params, base_url)
+
+        usage_header = json.dumps({"call_count": usage, "total_time": usage, "total_cputime": usage})
+        start_response("{} {}".format(status, "OK" if status < 400 else "Error"), [
+            ("Content-Type", "application/json"),
+            ("X-App-Usage", usage_header),
+            ("X-Business-Use-Case-Usage", json.dumps({"fake_business": [{
+                "type": "CATALOG", "call_count": usage, "total_time": usage, "total_cputime": usage,
+                "estimated_time_to_regain_access": 0,
+            }]})),
+        ])
+        return [json.dumps(data).encode("utf-8")]
+
+    @staticmethod
+    def parse_body(body, content_type):
+        if not body:
+            return {}
+        if content_type.startswith("application/json"):
+            return json.loads(body)
+        return dict(parse_qsl(body.decode("utf-8")))
+
+    def get_id(self):
+        with self.lock:
+            self.next_id += 1
+            return str(self.next_id)
+
+    def dispatch(self, method, parts, params, base_url):
+        ''' route a call to its endpoint, returns (status code, json data) '''
+        if not parts and method == "POST" and "batch" in params:
+            return 200, self.batch(params, base_url)
+        if parts == ["oauth", "access_token"]:
+            return 200, {"access_token": "fake_user_token", "token_type": "bearer", "expires_in": 5183944}
+        if parts == ["fbe_business", "fbe_installs"]:
+            return 200, {"data": [{
+                "business_manager_id": "fake_business_manager",
+                "commerce_merchant_settings_id": "fake_commerce_account",
+                "catalog_id": "fake_catalog",
+                "pages": ["fake_page"],
+                "pixel_id": "fake_pixel",
+            }]}
+        if len(parts) != 2:
+            return 404, {"error": {"message": "Unknown path components: /{}".format("/".join(parts)), "code": 2500}}
+        node, edge = parts
+        handler = getattr(self, "{}_{}".format(method.lower(), edge), None)
+        if handler is None:
+            return 400, {"error": {"message": "Unsupported {} request on {}".format(method, edge), "code": 100}}
+        return handler(node, params, base_url)
+
+    def batch(self, params, base_url):
+        results = []
+        for sub_request in json.loads(params["batch"]):
+            url = urlsplit(sub_request["relative_url"])
+            parts = [part for part in url.path.split("/") if part]
+            if parts and _VERSION.match(parts[0]):
+                parts = parts[1:]
+            sub_params = dict(parse_qsl(url.query))
+            sub_params.update(parse_qsl(sub_request.get("body", "")))
+            status, data = self.dispatch(sub_request["method"], parts, sub_params, base_url)
+            results.append({"code": status, "headers": [], "body": json.dumps(data)})
+        return results
+
+    # catalog
+
+    def post_items_batch(self, catalog_id, params, base_url):
+        item_requests = json.loads(params.get("requests", "[]"))
+        validation_status = []
+        for item_request in item_requests:
+            with self.lock:
+                failed = self.random.random() < self.item_error_rate
+            if failed:
+                validation_status.append({
+                    "retailer_id": item_request.get("data", {}).get("id"),
+                    "errors": [{"message": "fake validation error"}],
+                })
+        return 200, {"handles": ["fake_handle_{}".format(self.get_id())], "validation_status": validation_status}
+
+    def get_check_batch_request_status(self, catalog_id, params, base_url):
+        return 200, {"data": [{"status": "finished", "errors": [], "ids_of_invalid_requests": []}]}
+
+    def post_product_feeds(self, catalog_id, params, base_url):
+        return 200, {"id": self.get_id()}
+
+    def post_access_token(self, business_manager_id, params, base_url):
+        return 200, {"access_token": "fake_system_user_token"}
+
+    # orders
+
+    def make_order(self, n, retailer_ids):
+        return {
+            "id": "fake_order_{}".format(n),
+            "order_status": {"state": "CREATED"},
+            "items": {"data": [
+                {"id": "fake_item_{}_{}".format(n, i), "retailer_id": retailer_id, "quantity": 1}
+                for i, retailer_id in enumerate(retailer_ids)
+            ], "paging": {}},
+            "buyer_details": {"name": "Buyer {}".format(n), "email": "buyer{}@example.com".format(n)},
+            "shipping_address": {"name": "Buyer {}".format(n), "street1": "{} Main St".format(n), "country": "US"},
+        }
+
+    def get_commerce_orders(self, page_id, params, base_url):
+        states = set(params.get("state", "CREATED").split(","))
+        with self.lock:
+            orders = [order for order in self.orders if order["order_status"]["state"] in states]
+        after = int(params.get("after", 0))
+        page = orders[after:after + self.page_size]
+        paging = {"cursors": {"before": str(after), "after": str(after + len(page))}}
+        if after + self.page_size < len(orders):
+            paging["next"] = "{}{}/commerce_orders?{}".format(
+                base_url, page_id, urlencode({**params, "after": after + self.page_size})
+            )
+        return 200, {"data": json.loads(json.dumps(page)), "paging": paging}
+
+    def post_acknowledge_orders(self, page_id, params, base_url):
+        results = []
+        with self.lock:
+            for order in json.loads(params.get("orders", "[]")):
+                fake_order = self.orders_by_id.get(order["id"])
+                if fake_order:
+                    fake_order["order_status"]["state"] = "IN_PROGRESS"
+                results.append({"id": order["id"], "state": "IN_PROGRESS" if fake_order else "FB_PROCESSING"})
+        return 200, {"orders": results}
+
+    def set_order_state(self, order_id, state):
+        with self.lock:
+            order = self.orders_by_id.get(order_id)
+            if order is None:
+                return 400, {"error": {"message": "Unknown order {}".format(order_id), "code": 100}}
+            order["order_status"]["state"] = state
+        return 200, {"success": True}
+
+    def post_shipments(self, order_id, params, base_url):
+        return self.set_order_state(order_id, "COMPLETED")
+
+    def post_cancellations(self, order_id, params, base_url):
+        return self.set_order_state(order_id, "COMPLETED")
+
+    def post_refunds(self, order_id, params, base_url):
+        return self.set_order_state(order_id, "COMPLETED")
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def make_fake_graph_server(app, host="127.0.0.1", port=0, quiet=True):
+    ''' a threaded http server for a FakeGraphAPI. port 0 picks a free port '''
+    handler = QuietWSGIRequestHandler if quiet else WSGIRequestHandler
+    return make_server(host, port, app, server_class=ThreadingWSGIServer, handler_class=handler)
+
+
+def start_fake_graph_server(host="127.0.0.1", port=0, **config):
+    ''' run a FakeGraphAPI in a background thread of this process
+
+    params:
+    host, port: address to listen on. port 0 picks a free port
+    config: FakeGraphAPI config
+    returns:
+    server, base_url: the running server, with the FakeGraphAPI as server.application, and the url
+                      to use as BASE_API_URL. stop it with server.shutdown()
+    '''
+    server = make_fake_graph_server(FakeGraphAPI(**config), host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://{}:{}/".format(*server.server_address)
+
+
+@contextmanager
+def fake_graph_api(**config):
+    ''' run a FakeGraphAPI for the duration of the block, and send the Graph API calls made in it there
+    calls skip the shared redis rate limiter and are not retried, so errors show up right away
+
+    params:
+    config: FakeGraphAPI config
+    yields:
+    app: the FakeGraphAPI, to check the calls it received
+    '''
+    server, base_url = start_fake_graph_server(**config)
+    try:
+        with override_settings(BASE_API_URL=base_url, GRAPH_RATE_LIMIT_REDIS_URL="", GRAPH_API_MAX_RETRIES=0):
+            yield server.get_app()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,160 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+
+from .rate_limit import is_throttled, record_usage, throttle
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    ''' per process keep-alive session shared by all outbound calls
+    calls beyond the settings.GRAPH_API_POOL_SIZE connections of the pool wait for a free one,
+    instead of opening connections that are thrown away after the call
+    '''
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=settings.GRAPH_API_POOL_SIZE,
+                pool_maxsize=settings.GRAPH_API_POOL_SIZE,
+                pool_block=True,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def get_retry_delay(attempt, response=None):
+    ''' seconds to wait before retrying, exponential backoff with full jitter
+    a Retry-After header of the response is honoured if it asks for longer
+    '''
+    backoff = min(settings.GRAPH_API_RETRY_MAX_BACKOFF, settings.GRAPH_API_RETRY_BACKOFF * 2 ** attempt)
+    delay = random.uniform(0, backoff)
+    try:
+        retry_after = float(response.headers.get("Retry-After", 0)) if response is not None else 0
+    except ValueError:
+        retry_after = 0
+    return max(delay, min(retry_after, settings.GRAPH_API_RETRY_MAX_BACKOFF))
+
+
+def is_retryable(response):
+    ''' check if a failed response is worth retrying: server errors and rate limiting '''
+    return response.status_code >= 500 or is_throttled(response)
+
+
+def graph_request(method, url, rate_limit_scope=None, timeout=None, max_retries=None, **kwargs):
+    ''' send a request through the shared session, retrying connection errors, timeouts,
+    server errors and rate limiting with jittered exponential backoff.
+    the same params and body are sent on every attempt, so an idempotency_key in them
+    (see core.utils.get_idempotency_key) is reused and FB applies the action only once.
+    calls to the Graph API also go through the rate limiter of core.utils.rate_limit.
+
+    params:
+    method: http method, such as "GET" or "POST"
+    url: url to call
+    rate_limit_scope: optional. the catalog or page the call is made for, see core.utils.rate_limit
+    timeout: optional. (connect, read) timeout in seconds, defaults to the GRAPH_API_*_TIMEOUT settings
+    max_retries: optional. defaults to settings.GRAPH_API_MAX_RETRIES
+    kwargs: passed on to requests, such as params, data or json
+    returns:
+    response: the last requests.Response. raises the last requests.RequestException if no response was received
+    '''
+    timeout = timeout or (settings.GRAPH_API_CONNECT_TIMEOUT, settings.GRAPH_API_READ_TIMEOUT)
+    max_retries = settings.GRAPH_API_MAX_RETRIES if max_retries is None else max_retries
+    is_graph = url.startswith(settings.BASE_API_URL)
+    for attempt in range(max_retries + 1):
+        if is_graph:
+            throttle(rate_limit_scope)
+        try:
+            response = get_session().request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            print("WARN: {} {} failed ({}), retrying".format(method, url.split("?")[0], e))
+            time.sleep(get_retry_delay(attempt))
+            continue
+        if is_graph:
+            record_usage(response, rate_limit_scope)
+        if response.ok or not is_retryable(response) or attempt == max_retries:
+            return response
+        print("WARN: {} {} returned {}, retrying".format(method, url.split("?")[0], response.status_code))
+        time.sleep(get_retry_delay(attempt, response))
+
+
+def graph_get(url, **kwargs):
+    ''' GET with graph_request '''
+    return graph_request("GET", url, **kwargs)
+
+
+def graph_post(url, **kwargs):
+    ''' POST with graph_request '''
+    return graph_request("POST", url, **kwargs)
+
+
+def get_batch_request(method, relative_url, body=None):
+    ''' a sub-request of a Graph batch call
+    body params that are not strings, such as lists or dicts, are sent json encoded
+
+    params:
+    method: http method of the sub-request
+    relative_url: url of the sub-request relative to the Graph API, such as "<order id>/shipments"
+    body: optional. dict of params of the sub-request
+    '''
+    batch_request = {"method": method, "relative_url": relative_url}
+    if body:
+        batch_request["body"] = urlencode({
+            key: value if isinstance(value, str) else json.dumps(value)
+            for key, value in body.items()
+        })
+    return batch_request
+
+
+def graph_batch(batch_requests, access_token, rate_limit_scope=None):
+    ''' send sub-requests through the Graph batch endpoint, settings.GRAPH_BATCH_MAX_REQUESTS per call
+
+    params:
+    batch_requests: list of sub-requests, see get_batch_request
+    access_token: access token used for all sub-requests
+    rate_limit_scope: optional. the catalog or page the calls are made for, see core.utils.rate_limit
+    returns:
+    responses: list of (status code, json body) of each sub-request, in the order of batch_requests.
+               (None, None) if FB did not complete the sub-request, or the batch call failed
+    '''
+    responses = []
+    max_requests = settings.GRAPH_BATCH_MAX_REQUESTS
+    for start in range(0, len(batch_requests), max_requests):
+        batch = batch_requests[start:start + max_requests]
+        try:
+            res = graph_post(settings.BASE_API_URL, data={
+                "access_token": access_token,
+                "batch": json.dumps(batch),
+                "include_headers": "false",
+            }, rate_limit_scope=rate_limit_scope)
+            results = res.json()
+        except (requests.RequestException, ValueError) as e:
+            print("graph batch call failed: {}".format(e))
+            results = None
+        if not isinstance(results, list):
+            print("graph batch call failed: {}".format(results))
+            results = []
+        # one response per sub-request, so the responses of later calls stay aligned
+        for result in (results + [None] * len(batch))[:len(batch)]:
+            if result is None:
+                responses.append((None, None))
+                continue
+            try:
+                body = json.loads(result.get("body") or "null")
+            except ValueError:
+                body = None
+            responses.append((result.get("code"), body))
+    return responses
@@ -0,0 +1,199 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# token bucket shared by all workers through redis, refilled at `rate` tokens per second up to `capacity`.
+# the refill slows down once the usage reported by Graph passes `threshold` percent, and stops
+# until `blocked_until` when Graph asks to back off. returns the seconds to wait, 0 if a token was taken.
+_TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local threshold = tonumber(ARGV[4])
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts", "usage", "blocked_until")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+local usage = tonumber(state[3]) or 0
+local blocked_until = tonumber(state[4]) or 0
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+if usage > threshold then
+    rate = rate * math.max(0.05, (100 - usage) / (100 - threshold))
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call("HMSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("EXPIRE", KEYS[1], 3600)
+return tostring(wait)
+"""
+
+APP_SCOPE = "app"
+# usage header values, as a percentage of the limit
+USAGE_KEYS = ("call_count", "total_time", "total_cputime")
+# Graph error codes of app, user, page and custom rate limits. 80000-80099 are business use case limits
+THROTTLING_ERROR_CODES = {4, 17, 32, 613}
+
+_redis = None
+_redis_lock = threading.Lock()
+_token_bucket = None
+
+
+def get_redis():
+    ''' redis client of the rate limiter, None if settings.GRAPH_RATE_LIMIT_REDIS_URL is not set '''
+    global _redis, _token_bucket
+    if not settings.GRAPH_RATE_LIMIT_REDIS_URL:
+        return None
+    # the token bucket slows the refill down over the usage between the threshold and 100
+    if not 0 <= settings.GRAPH_RATE_LIMIT_USAGE_THRESHOLD < 100:
+        raise ImproperlyConfigured("GRAPH_RATE_LIMIT_USAGE_THRESHOLD must be a percentage from 0 to 99")
+    with _redis_lock:
+        if _redis is None:
+            # short timeouts, so an unresponsive redis fails open instead of blocking every Graph call
+            _redis = redis.Redis.from_url(
+                settings.GRAPH_RATE_LIMIT_REDIS_URL,
+                socket_timeout=settings.GRAPH_RATE_LIMIT_REDIS_TIMEOUT,
+                socket_connect_timeout=settings.GRAPH_RATE_LIMIT_REDIS_TIMEOUT,
+            )
+            _token_bucket = _redis.register_script(_TOKEN_BUCKET_SCRIPT)
+    return _redis
+
+
+def get_bucket_key(scope):
+    return "graph_rate_limit:{}".format(scope)
+
+
+def get_catalog_scope(catalog_id):
+    ''' rate limit scope of the calls made for a FB catalog '''
+    return "catalog:{}".format(catalog_id)
+
+
+def get_page_scope(page_id):
+    ''' rate limit scope of the calls made for a FB page, such as its commerce orders '''
+    return "page:{}".format(page_id)
+
+
+def throttle(scope=None):
+    ''' wait for a token of the app bucket, and of the scope's bucket if given, before a Graph call
+    waits at most settings.GRAPH_RATE_LIMIT_MAX_WAIT seconds in total, then lets the call through.
+    does nothing if the limiter's redis is not configured or not reachable.
+
+    params:
+    scope: optional. the catalog or page the call is made for, such as "catalog:<id>" or "page:<id>"
+    returns:
+    waited: seconds spent waiting
+    '''
+    if get_redis() is None:
+        return 0
+    waited = 0
+    for bucket_scope in [APP_SCOPE] + ([scope] if scope else []):
+        while True:
+            try:
+                wait = float(_token_bucket(
+                    keys=[get_bucket_key(bucket_scope)],
+                    args=[
+                        time.time(),
+                        settings.GRAPH_RATE_LIMIT_RATE,
+                        settings.GRAPH_RATE_LIMIT_BURST,
+                        settings.GRAPH_RATE_LIMIT_USAGE_THRESHOLD,
+                    ],
+                ))
+            except redis.RedisError as e:
+                # throttling is best effort, never fail the call because of it
+                print("WARN: graph rate limiter unavailable: {}".format(e))
+                return waited
+            if wait <= 0:
+                break
+            if waited + wait > settings.GRAPH_RATE_LIMIT_MAX_WAIT:
+                print("WARN: graph rate limit wait for {} exceeds {}s, sending anyway".format(
+                    bucket_scope, settings.GRAPH_RATE_LIMIT_MAX_WAIT
+                ))
+                return waited
+            time.sleep(wait)
+            waited += wait
+    return waited
+
+
+def get_usage(headers):
+    ''' parse the usage headers of a Graph response
+
+    params:
+    headers: headers of the Graph response
+    returns:
+    app_usage, scope_usage, regain_seconds: highest percentage used of the app's and of the
+        business use case's limits, None when the header is missing, and seconds until access
+        is regained if throttled
+    '''
+    app_usage = None
+    scope_usage = None
+    regain_seconds = 0
+    try:
+        if headers.get("X-App-Usage"):
+            app = json.loads(headers["X-App-Usage"])
+            app_usage = max(app.get(k, 0) for k in USAGE_KEYS)
+        if headers.get("X-Business-Use-Case-Usage"):
+            scope_usage = 0
+            for use_cases in json.loads(headers["X-Business-Use-Case-Usage"]).values():
+                for use_case in use_cases:
+                    scope_usage = max([scope_usage] + [use_case.get(k, 0) for k in USAGE_KEYS])
+                    # in minutes
+                    regain_seconds = max(regain_seconds, use_case.get("estimated_time_to_regain_access", 0) * 60)
+    except (ValueError, AttributeError):
+        pass
+    return app_usage, scope_usage, regain_seconds
+
+
+def is_throttled(response):
+    ''' check if a Graph response is a rate limiting error '''
+    if response.status_code == 429:
+        return True
+    if response.status_code not in (400, 403):
+        return False
+    try:
+        code = response.json().get("error", {}).get("code")
+    except (ValueError, AttributeError):
+        return False
+    return code in THROTTLING_ERROR_CODES or (isinstance(code, int) and 80000 <= code < 80100)
+
+
+def record_usage(response, scope=None):
+    ''' store the usage a Graph response reports, so every worker slows down before being throttled
+
+    params:
+    response: requests.Response of a Graph call
+    scope: optional. the catalog or page the call was made for, as passed to throttle
+    '''
+    if response is None or get_redis() is None:
+        return
+    app_usage, scope_usage, regain_seconds = get_usage(response.headers)
+    updates = {}
+    if app_usage is not None:
+        updates[get_bucket_key(APP_SCOPE)] = (app_usage, 0)
+    if scope and scope_usage is not None:
+        updates[get_bucket_key(scope)] = (scope_usage, regain_seconds)
+    if not regain_seconds and is_throttled(response):
+        # throttled without an estimate, back off the scope, or the whole app without one
+        updates[get_bucket_key(scope or APP_SCOPE)] = (100, settings.GRAPH_RATE_LIMIT_THROTTLED_BACKOFF)
+    if not updates:
+        return
+    now = time.time()
+    try:
+        pipe = _redis.pipeline()
+        for key, (usage, block_seconds) in updates.items():
+            pipe.hset(key, "usage", usage)
+            if block_seconds:
+                pipe.hset(key, "blocked_until", now + block_seconds)
+            pipe.expire(key, 3600)
+        pipe.execute()
+    except redis.RedisError as e:
+        print("WARN: graph rate limiter unavailable: {}".format(e))
@@ -0,0 +1,60 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+def run_for_stores(store_ids, store_fn, concurrency=None):
+    ''' run a per store sync, such as an order fetch or a catalog push, for many stores
+    concurrently in this worker instead of one celery task per store.
+    an asyncio event loop schedules the stores, at most `concurrency` at a time. each store's
+    sync is blocking HTTP and db work, so it runs in a thread executor while other stores wait on FB.
+    outbound calls of all stores wait for a connection of the shared session (see core.utils.graph),
+    and their catalog chunk uploads share one executor (see catalog.utils.item_batch.get_upload_executor),
+    so the stores' syncs together stay within settings.GRAPH_API_POOL_SIZE connections.
+
+    params:
+    store_ids: ids of the stores to sync
+    store_fn: function called with a store id in an executor thread
+    concurrency: optional. max stores synced at the same time, defaults to settings.STORE_SYNC_ENGINE_CONCURRENCY
+    returns:
+    results: dict of store id to the result of store_fn, or the exception it raised
+    '''
+    concurrency = concurrency or settings.STORE_SYNC_ENGINE_CONCURRENCY
+    return asyncio.run(run_for_stores_async(list(store_ids), store_fn, concurrency))
+
+
+async def run_for_stores_async(store_ids, store_fn, concurrency):
+    ''' coroutine of run_for_stores, for callers that already run an event loop '''
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="store-sync") as executor:
+        async def run_for_store(store_id):
+            async with semaphore:
+                try:
+                    return await loop.run_in_executor(executor, run_in_thread, store_fn, store_id)
+                except Exception as e:
+                    # one store failing should not stop the others
+                    print("store id {} sync failed: {!r}".format(store_id, e))
+                    return e
+
+        results = await asyncio.gather(*[run_for_store(store_id) for store_id in store_ids])
+
+    failed = sum(isinstance(result, Exception) for result in results)
+    print("synced {} stores ({} failed) in {:.2f}s with concurrency {}".format(
+        len(store_ids), failed, time.monotonic() - start, concurrency
+    ))
+    return dict(zip(store_ids, results))
+
+
+def run_in_thread(store_fn, store_id):
+    try:
+        return store_fn(store_id)
+    finally:
+        # db connections are per thread, do not leave one open per executor thread
+        connections.close_all()
@@ -28,7 +28,7 @@ def viewAsyncTasks(request, storeId):
         },
         {
             "name": "Sync Catalog",
-            "description": "Load all items in local catalog and sync to FB, inserting missing items, updating existing ones, does not delete",
+            "description": "Load all items in local catalog and sync to FB, inserting missing items, updating existing ones, and deleting items removed from the catalog",
             "view_method": "syncCatalog",
         },
     ]
@@ -2,8 +2,8 @@
 import datetime
 import json
 
-import requests
 from core.models.utils import datetime_utc_now_with_tz
+from core.utils import graph_get
 from django.conf import settings
 from fb_metadata.models import FacebookMetadata
 from shop.models import Store
@@ -25,7 +25,7 @@ def retrieveAndStoreFBEInstallationInfo(
     returns:
     store id associated with this FacebookMetadata object
     """
-    info = requests.get(
+    info = graph_get(
         settings.FBE_INFO_API_URL.format(fbe_external_business_id, access_token)
     ).json()["data"][0]
 
@@ -3,9 +3,9 @@ import json
 import os
 import sys
 
-import requests
 from core.models.utils import datetime_utc_now_with_tz
 from core.tasks import sync_catalog_async
+from core.utils import graph_get, graph_post
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.http import HttpResponse, HttpResponseRedirect
@@ -67,7 +67,7 @@ def fbe_callback(request):
 
     # store the info
     try:
-        res = requests.get(settings.GET_ACCESS_TOKEN_URL + request.GET.get("code"))
+        res = graph_get(settings.GET_ACCESS_TOKEN_URL + request.GET.get("code"))
         if not res.ok:
             print("request error:", json.dumps(res.json()))
             return HttpResponse(
@@ -149,7 +149,7 @@ def tokenSettings(request, storeId):
             "scope": _SCOPE,
             "fbe_external_business_id": fb_meta.fbe_external_business_id,
         }
-        res = requests.post(url, data=data)
+        res = graph_post(url, data=data)
         system_user_access_token = res.json()["access_token"]
 
         # update access token
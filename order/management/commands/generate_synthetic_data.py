@@ -0,0 +1,51 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Store
+from catalog.utils.synthetic import create_synthetic_store, generate_catalog
+from order.utils.synthetic import generate_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a seeded, repeatable synthetic catalog (products and variant groups) and orders "
+        "(customers, orders and order items) with bulk inserts, to reproduce production scale locally. "
+        "Creates a new store with FB metadata unless --store is given. "
+        "The products are not queued for syncing and no inventory is decremented for the orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store", type=int, help="id of an existing store to add the data to")
+        parser.add_argument("--products", type=int, default=10000, help="number of products")
+        parser.add_argument("--grouped-share", type=float, default=0.4, help="share of the products that are variants")
+        parser.add_argument("--orders", type=int, default=0, help="number of orders")
+        parser.add_argument("--customers", type=int, help="number of customers, defaults to a third of the orders")
+        parser.add_argument("--days", type=int, default=365, help="days the orders are spread over")
+        parser.add_argument("--seed", type=int, default=0, help="seed of the random values")
+        parser.add_argument("--batch-size", type=int, help="rows per bulk insert and transaction")
+
+    def handle(self, *args, **options):
+        if options["store"]:
+            store = Store.objects.filter(id=options["store"]).first()
+            if store is None:
+                raise CommandError("Store {} does not exist".format(options["store"]))
+        else:
+            store = create_synthetic_store()
+        start = time.perf_counter()
+        try:
+            if options["products"]:
+                catalog = generate_catalog(
+                    store, options["products"], options["grouped_share"], options["seed"], options["batch_size"]
+                )
+                self.stdout.write("{products} products and {groups} product groups created".format(**catalog))
+            if options["orders"]:
+                orders = generate_orders(
+                    store, options["orders"], options["customers"], options["days"],
+                    seed=options["seed"], batch_size=options["batch_size"],
+                )
+                self.stdout.write("{customers} customers, {orders} orders and {items} order items created".format(**orders))
+        except Exception as e:
+            raise CommandError(e)
+        self.stdout.write("store {} ({}) generated in {:.1f}s".format(store.id, store.name, time.perf_counter() - start))
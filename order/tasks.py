@@ -1,13 +1,15 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from catalog.utils import post_item_batch_by_id
+from catalog.tasks import request_catalog_sync
 from .utils import (
     fetch_and_ack_orders_by_id,
     cancel_order_by_id,
     refund_order_by_id,
     fulfill_order_by_id,
-    get_order_items,
+    fulfill_orders_by_id,
+    cancel_orders_by_id,
+    refund_orders_by_id,
 )
 logger = get_task_logger(__name__)
 
@@ -22,6 +24,7 @@ def fetch_orders_async(store_id):
 @shared_task
 def fulfill_order_async(order_id, carrier, tracking_number, items=None):
     ''' Async task to fulfill an order by id, and sync the order's items
+    the inventory changes are synced to FB from the catalog sync outbox, debounced per store
 
     params:
     order_id: id of the Order to fulfill
@@ -34,15 +37,7 @@ def fulfill_order_async(order_id, carrier, tracking_number, items=None):
 
     # check if fulfill is successful
     if order is not None:
-        # get just items in the order or items being fulfilld for syncing
-        items = items or get_order_items(order)
-        logger.info("sync catalog to FB after fulfill order for store id {}{}".format(
-                order.store.id,
-                ", and products: {}".format(items) if items else "."
-            )
-        )
-        res = post_item_batch_by_id(order.store.id, True, items)
-        logger.info("post_item_batch_by_id response: {}".format(res.json()))
+        request_catalog_sync(order.store_id)
 
 
 @shared_task
@@ -56,7 +51,11 @@ def cancel_order_async(order_id, cancel_reason, restock_items:bool = False, item
     items: the subset of items this particular cancellation is for
     '''
     logger.info("cancel_order_async for order id {}".format(order_id))
-    cancel_order_by_id(order_id, cancel_reason, restock_items, items)
+    order, _ = cancel_order_by_id(order_id, cancel_reason, restock_items, items)
+
+    # the restocked inventory is synced to FB from the catalog sync outbox
+    if order is not None and restock_items:
+        request_catalog_sync(order.store_id)
 
 @shared_task
 def refund_order_async(order_id, reason_code, items=None):
@@ -69,3 +68,46 @@ def refund_order_async(order_id, reason_code, items=None):
     '''
     logger.info("refund_order_async for order id {}".format(order_id))
     refund_order_by_id(order_id, reason_code, items)
+
+
+@shared_task
+def fulfill_orders_async(fulfillments):
+    ''' Async task to fulfill orders in bulk by id through Graph batch calls, and sync their items
+
+    params:
+    fulfillments: list of [order_id, carrier, tracking_number] or [order_id, carrier, tracking_number, items]
+    '''
+    logger.info("fulfill_orders_async for {} orders".format(len(fulfillments)))
+    results = fulfill_orders_by_id(fulfillments)
+    fulfilled = [order for order, _ in results if order is not None]
+    logger.info("fulfill_orders_async fulfilled {} of {} orders".format(len(fulfilled), len(fulfillments)))
+    for store_id in {order.store_id for order in fulfilled}:
+        request_catalog_sync(store_id)
+
+
+@shared_task
+def cancel_orders_async(order_ids, cancel_reason, restock_items:bool = False):
+    ''' Async task to cancel orders in bulk by id through Graph batch calls
+
+    params:
+    order_ids: ids of the Orders to cancel
+    cancel_reason: CancellationReasonCode
+    restock_items: set True if inventory should be restocked on successful cancel
+    '''
+    logger.info("cancel_orders_async for {} orders".format(len(order_ids)))
+    results = cancel_orders_by_id(order_ids, cancel_reason, restock_items)
+    if restock_items:
+        for store_id in {order.store_id for order, _ in results if order is not None}:
+            request_catalog_sync(store_id)
+
+
+@shared_task
+def refund_orders_async(order_ids, reason_code):
+    ''' Async task to refund orders in bulk by id through Graph batch calls
+
+    params:
+    order_ids: ids of the Orders to refund
+    reason_code: refund reason code
+    '''
+    logger.info("refund_orders_async for {} orders".format(len(order_ids)))
+    refund_orders_by_id(order_ids, reason_code)
@@ -0,0 +1,86 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+from django.test import TestCase
+
+from core.utils.fake_graph_api import fake_graph_api
+from catalog.models import CatalogSyncOutbox, Product
+from catalog.utils.synthetic import create_synthetic_store, generate_catalog
+from shop.utils import createStore
+from .models import Customer, Order, OrderItem
+from .models.choices import OrderCancellationState, OrderFulfillmentState, OrderRefundState, OrderStatus
+from .utils.order_actions import (
+    cancel_orders_by_id, fulfill_orders, fulfill_orders_by_id, post_order_actions, refund_orders_by_id,
+)
+
+
+class BulkOrderActionsTests(TestCase):
+    def setUp(self):
+        self.store = create_synthetic_store()
+        generate_catalog(self.store, 3, grouped_share=0)
+        self.product = Product.objects.first()
+        # orders the fake Graph API knows, and one it does not
+        self.orders = [self.create_order(self.store, "fake_order_{}".format(n)) for n in (1, 2, 999)]
+
+    def create_order(self, store, ext_order_id):
+        customer = Customer.objects.create(store=store, full_name="Buyer", email="buyer@example.com")
+        order = Order.objects.create(store=store, customer=customer, ext_order_id=ext_order_id)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1)
+        return order
+
+    def test_partial_failures(self):
+        with fake_graph_api(orders=2):
+            results = fulfill_orders([(order, "UPS", "T") for order in self.orders])
+        self.assertEqual([order for order, _ in results], self.orders[:2] + [None])
+        self.assertEqual(
+            list(Order.objects.order_by("id").values_list("order_status", "order_fulfillment_state")),
+            [(OrderStatus.COMPLETED, OrderFulfillmentState.FULLY_FULFILLED)] * 2
+            + [(OrderStatus.FB_CREATED, OrderFulfillmentState.NO_FULFILLMENT)],
+        )
+
+    def test_store_without_metadata(self):
+        # its orders are listed first, the other store's orders are still sent and updated
+        other_store = createStore("No metadata", self.store.merchant, None)
+        orders = [self.create_order(other_store, "fake_order_3")] + self.orders[:2]
+        with fake_graph_api(orders=3):
+            results = post_order_actions([(order, "shipments", {"items": []}) for order in orders])
+            fulfilled = fulfill_orders([(order, "UPS", "T") for order in orders])
+        self.assertEqual(results, [None, {"success": True}, {"success": True}])
+        self.assertEqual([order for order, _ in fulfilled], [None] + orders[1:])
+        self.assertEqual(Order.objects.filter(order_status=OrderStatus.COMPLETED).count(), 2)
+
+    def test_fulfillment_materializes_inventory(self):
+        inventory = self.product.inventory
+        with fake_graph_api(orders=2):
+            fulfill_orders([(order, "UPS", "T") for order in self.orders])
+        self.assertEqual(Product.objects.get(id=self.product.id).inventory, inventory - 2)
+        self.assertEqual(
+            list(CatalogSyncOutbox.objects.values_list("store_id", "product_id", "fields")),
+            [(self.store.id, self.product.id, "inventory")],
+        )
+
+    def test_cancel_and_refund(self):
+        inventory = self.product.inventory
+        with fake_graph_api(orders=2):
+            cancelled = cancel_orders_by_id([self.orders[0].id, self.orders[2].id], "CUSTOMER_REQUESTED", True)
+            refunded = refund_orders_by_id([self.orders[1].id], "BUYERS_REMORSE")
+        self.assertEqual([order for order, _ in cancelled], [self.orders[0], None])
+        self.assertEqual([order for order, _ in refunded], [self.orders[1]])
+        self.assertEqual(
+            list(Order.objects.order_by("id").values_list("order_status", "order_cancellation_state", "order_refund_state")),
+            [
+                (OrderStatus.COMPLETED, OrderCancellationState.FULLY_CANCELLED, OrderRefundState.NO_REFUNDS),
+                (OrderStatus.COMPLETED, OrderCancellationState.NO_CANCELLATION, OrderRefundState.FULLY_REFUNDED),
+                (OrderStatus.FB_CREATED, OrderCancellationState.NO_CANCELLATION, OrderRefundState.NO_REFUNDS),
+            ],
+        )
+        # only the cancelled order's item is restocked
+        self.assertEqual(Product.objects.get(id=self.product.id).inventory, inventory + 1)
+
+    def test_missing_ids_skipped(self):
+        missing_id = max(order.id for order in self.orders) + 1
+        order_ids = [missing_id, self.orders[0].id]
+        with fake_graph_api(orders=2):
+            fulfilled = fulfill_orders_by_id([(order_id, "UPS", "T") for order_id in order_ids])
+            cancelled = cancel_orders_by_id(order_ids, "CUSTOMER_REQUESTED")
+            refunded = refund_orders_by_id(order_ids, "BUYERS_REMORSE")
+        for results in (fulfilled, cancelled, refunded):
+            self.assertEqual([order for order, _ in results], [None, self.orders[0]])
@@ -11,5 +11,11 @@ from .order_actions import (
     refund_order_by_id,
     fulfill_order,
     fulfill_order_by_id,
+    fulfill_orders,
+    fulfill_orders_by_id,
+    cancel_orders,
+    cancel_orders_by_id,
+    refund_orders,
+    refund_orders_by_id,
     get_order_items,
 )
@@ -1,23 +1,27 @@
 # Copyright 2004-present, Facebook. All Rights Reserved.
-import requests
 import json
 from typing import List, Dict
 from django.db import transaction
+from django.db.models import Sum
 from django.conf import settings
 
-from core.utils import get_idempotency_key
+from core.utils import get_idempotency_key, get_batch_request, graph_batch, graph_get, graph_post
+from core.utils.rate_limit import get_page_scope
 from catalog.models import Product
+from catalog.models.choices import InventoryChangeReason
+from catalog.utils.inventory import materialize_inventory, record_inventory_changes
 from shop.models import Store
 from fb_metadata.models import FacebookMetadata
 from order.models.choices import OrderStatus, OrderFulfillmentState, OrderCancellationState, OrderRefundState, CancellationReasonCode
 from order.models import Customer, Order, OrderItem
 
 
-def paginate_order_items(order_items:Dict):
+def paginate_order_items(order_items:Dict, rate_limit_scope=None):
     ''' Iterate through all order item pages and return a list of all order items
 
     params:
     order_items: dict of order items for an order, with a page of `data` and paging info.
+    rate_limit_scope: optional. rate limit scope of the page, see core.utils.rate_limit
     return:
     results: complete list of order items for this order.
     '''
@@ -26,7 +30,7 @@ def paginate_order_items(order_items:Dict):
     results = []
     results += items
     while 'next' in paging:
-        res = requests.get(paging['next'])
+        res = graph_get(paging['next'], rate_limit_scope=rate_limit_scope)
         res = res.json()
         items = res['data']
         paging = res['paging']
@@ -34,28 +38,30 @@ def paginate_order_items(order_items:Dict):
     return results
 
 
-def pageinate_orders(orders:List[Dict]):
+def pageinate_orders(orders:List[Dict], rate_limit_scope=None):
     ''' Iterate through a page (list) of orders and fetch the order items of each
     replace the paginated `item` field in the order data with the complete list
 
     params:
     orders: list (page) of orders whose order items can also be paginated.
+    rate_limit_scope: optional. rate limit scope of the page, see core.utils.rate_limit
     return:
     results: list of all orders from all pages with their order items resolved.
     '''
     results = []
     for order in orders:
-        items = paginate_order_items(order['items'])
+        items = paginate_order_items(order['items'], rate_limit_scope)
         results.append(order.copy())
         results[-1]['items']=items
     return results
 
 
-def process_list_order_response(orders_response_json:Dict):
+def process_list_order_response(orders_response_json:Dict, rate_limit_scope=None):
     ''' Build list of orders and their order items from response of first commerce_orders request
 
     params:
     orders_response_json: json of the response of commerce_orders GET call
+    rate_limit_scope: optional. rate limit scope of the page, see core.utils.rate_limit
     returns:
     results: complete list of orders with their order items
     '''
@@ -67,15 +73,15 @@ def process_list_order_response(orders_response_json:Dict):
 
     orders = orders_response_json['data']
     results = []
-    results += pageinate_orders(orders)
+    results += pageinate_orders(orders, rate_limit_scope)
     paging = 'paging' in orders_response_json and orders_response_json['paging']
     if paging:
         while 'next' in paging:
-            res = requests.get(results['paging']['next'])
+            res = graph_get(paging['next'], rate_limit_scope=rate_limit_scope)
             res = res.json()
             orders = res['data']
             paging = res['paging']
-            results += pageinate_orders(orders)
+            results += pageinate_orders(orders, rate_limit_scope)
     return results
 
 
@@ -95,8 +101,9 @@ def list_orders(page_id, token, states:List = None, fields:List = None):
     params = {'access_token': token}
     params['state'] = ','.join(states) if states else 'FB_PROCESSING,CREATED,IN_PROGRESS,COMPLETED'
     params['fields'] = ','.join(set(fields).union({'id','items','order_status','buyer_details','shipping_address'})) if fields else "id,order_status,items,buyer_details,shipping_address"
-    res = requests.get(url, params=params)
-    order_data = process_list_order_response(res.json())
+    scope = get_page_scope(page_id)
+    res = graph_get(url, params=params, rate_limit_scope=scope)
+    order_data = process_list_order_response(res.json(), scope)
     return order_data
 
 
@@ -119,10 +126,16 @@ def acknowledge_orders(page_id, token, orders:List[Dict]):
         'idempotency_key': get_idempotency_key(),
         'orders': json.dumps(orders)
     }
-    res = requests.post(url, data=data)
+    # the idempotency key is generated once, so retries of the request are only applied once
+    res = graph_post(url, data=data, rate_limit_scope=get_page_scope(page_id))
     print('acknowledge_orders response:',res.json())
     orders = res.json()['orders']
-    [update_order_state(order['id'], OrderStatus.CONFIRMED_ORDER) if "state" in order and order['state']=="IN_PROGRESS" else delete_order(order['id']) for order in orders]
+    acked_ids = [order['id'] for order in orders if "state" in order and order['state']=="IN_PROGRESS"]
+    confirmed_orders = list(Order.objects.filter(ext_order_id__in=acked_ids))
+    for order in confirmed_orders:
+        order.order_status = OrderStatus.CONFIRMED_ORDER
+    Order.bulk_update_validated(confirmed_orders, ['order_status'])
+    delete_orders([order['id'] for order in orders if order['id'] not in acked_ids])
 
 
 @transaction.atomic
@@ -141,7 +154,7 @@ def update_order_state(order, order_status:OrderStatus):
 
 @transaction.atomic
 def update_order_fulfillment_state(order, order_fulfillment_state:OrderFulfillmentState):
-    ''' update order fulfillment state by id or Order and decrement inventory
+    ''' update order fulfillment state by id or Order, and record the inventory decrement in the inventory ledger
 
     params:
     order: Order object or order id
@@ -150,16 +163,42 @@ def update_order_fulfillment_state(order, order_fulfillment_state:OrderFulfillme
     if not isinstance(order, Order):
         order = Order.objects.get(ext_order_id=order)
     order.order_fulfillment_state = order_fulfillment_state
-
-    # For all OrderItems in order, need to decrement inventory
-    orderItems = OrderItem.objects.filter(order=order)
-    for item in orderItems:
-        product = item.product
-        product.inventory = product.inventory - item.quantity
-        product.save()
+    record_order_inventory_changes([order], InventoryChangeReason.FULFILLMENT)
     order.save()
 
 
+@transaction.atomic
+def record_order_inventory_changes(orders:List[Order], reason:InventoryChangeReason):
+    ''' record the inventory movements of all items of orders in the inventory ledger
+    one entry per product of each order, referencing the ext order id: items are removed from
+    the inventory for a fulfillment, and put back for a restock. quantities are summed with one
+    query. the movements are materialized in the same transaction, locking the products in id
+    order (see catalog.utils.inventory.materialize_inventory), so the order updates, the inventory
+    of their products and the queued catalog sync of the changes commit or roll back together.
+
+    params:
+    orders: list of Order objects
+    reason: InventoryChangeReason.FULFILLMENT or InventoryChangeReason.RESTOCK
+    returns:
+    product_ids: ids of the products whose inventory moved
+    '''
+    sign = 1 if reason == InventoryChangeReason.RESTOCK else -1
+    quantities = (
+        OrderItem.objects.filter(order__in=orders).exclude(product=None)
+        .values_list('order__store_id', 'order__ext_order_id', 'product_id').annotate(quantity=Sum('quantity')).order_by()
+    )
+    changes = {}
+    for store_id, ext_order_id, product_id, quantity in quantities:
+        changes.setdefault(store_id, []).append((product_id, sign * quantity, ext_order_id or ""))
+    stores = Store.objects.in_bulk(list(changes))
+    product_ids = set()
+    for store_id, store_changes in changes.items():
+        product_ids |= record_inventory_changes(stores[store_id], store_changes, reason)
+    if product_ids:
+        materialize_inventory(product_ids)
+    return product_ids
+
+
 @transaction.atomic
 def update_order_cancel_state(order, order_cancellation_state:OrderCancellationState):
     ''' update order cancellation state by id or Order
@@ -201,67 +240,101 @@ def delete_order(order):
     order.delete()
 
 
+@transaction.atomic
+def delete_orders(order_ids:List):
+    ''' delete orders by id in bulk, including all OrderItem
+
+    params:
+    order_ids: ext order ids of the orders
+    '''
+    if not order_ids:
+        return
+    OrderItem.objects.filter(order__ext_order_id__in=order_ids).delete()
+    Order.objects.filter(ext_order_id__in=order_ids).delete()
+
+
 @transaction.atomic
 def write_orders(store:Store, orders:List[Dict]):
     ''' write orders and order items.  create Customer object if customer info is new.
     populate orders with 'merchant_order_reference' for acknowledge step
+    customers, orders and products are looked up with one query each, and the new customers,
+    orders and items are validated and inserted together (see BaseModel.bulk_create_validated)
 
     note: retailer_id is a REQUIRED field of the items
     params:
     store: the store the orders belongs to
     orders: list of orders
     '''
+    customer_keys = []
     for order in orders:
         buyer = order.pop('buyer_details')
-        shipping_addr_str = json.dumps(order.pop('shipping_address'))
-        try:
-            customer = Customer.objects.get(store=store, full_name=buyer['name'], email=buyer['email'], addr=shipping_addr_str)
-        except Exception:
-            print("Buyer info not found in Customer table.  Creating Customer entry for {} ({})".format(buyer['name'], buyer['email']))
-            customer = Customer(
-                store=store,
-                full_name=buyer['name'],
-                email=buyer['email'],
-                addr=shipping_addr_str,
-            )
-            customer.save()
-        try:
-            order_model = Order.objects.get(store=store, customer=customer, ext_order_id=order['id'])
+        customer_keys.append((buyer['name'], buyer['email'], json.dumps(order.pop('shipping_address'))))
+
+    def get_customers():
+        customers = Customer.objects.filter(store=store, email__in={email for _, email, _ in customer_keys})
+        return {(customer.full_name, customer.email, customer.addr): customer for customer in customers}
+
+    customers = get_customers()
+    new_customers = []
+    for key in dict.fromkeys(customer_keys):
+        if key not in customers:
+            print("Buyer info not found in Customer table.  Creating Customer entry for {} ({})".format(key[0], key[1]))
+            new_customers.append(Customer(store=store, full_name=key[0], email=key[1], addr=key[2]))
+    if new_customers:
+        Customer.bulk_create_validated(new_customers)
+        # primary keys are not set by bulk_create on every db, read them back
+        customers = get_customers()
+
+    def get_orders():
+        existing = Order.objects.filter(store=store, ext_order_id__in=[order['id'] for order in orders])
+        return {(order.customer_id, order.ext_order_id): order for order in existing}
+
+    existing_orders = get_orders()
+    products = Product.objects.in_bulk([item['retailer_id'] for order in orders for item in order['items']])
+    new_orders = {}
+    for order, key in zip(orders, customer_keys):
+        order_key = (customers[key].id, order['id'])
+        if order_key in existing_orders or order_key in new_orders:
             print("Order with ext order id {} already exists".format(order['id']))
             continue
-        except Exception:
-            print("Order not found or is new, writing...")
-            order_model = Order(
-                store=store,
-                customer=customer,
-                ext_order_id=order['id'],
-            )
-            if order['order_status']['state'] == "IN_PROGRESS":
-                print("WARN: order is already IN_PROGRESS and missing from orders table.  Filling.")
-                order_model.order_status = OrderStatus.IN_PROGRESS
-            order_model.save()
-        items = order.pop('items')
-        try:
-            items_products = [(item, Product.objects.get(id=item['retailer_id'])) for item in items]
-        except Exception:
+        order_model = Order(
+            store=store,
+            customer=customers[key],
+            ext_order_id=order['id'],
+        )
+        if order['order_status']['state'] == "IN_PROGRESS":
+            print("WARN: order is already IN_PROGRESS and missing from orders table.  Filling.")
+            order_model.order_status = OrderStatus.IN_PROGRESS
+        if any(item['retailer_id'] not in products for item in order['items']):
             # at least 1 product does not exist in db (anymore)
             order_model.missing_items = True
-            order_model.save()
             print("WARN: order contains products that no longer exist")
+        new_orders[order_key] = (order, order_model)
+    if not new_orders:
+        return
+    Order.bulk_create_validated([order_model for _, order_model in new_orders.values()])
+    order_ids = {key: order_model.id for key, order_model in get_orders().items()}
+
+    items = []
+    for order_key, (order, order_model) in new_orders.items():
+        order_items = order.pop('items')
+        if order_model.missing_items:
             continue
         # update order with 'merchant_order_reference' for the acknowledge step
-        order['merchant_order_reference'] = order_model.id
-        for item, product in items_products:
-            try:
-                item_model = OrderItem.objects.get(order=order_model, product=product)
-                print("item product id {} already on order with id {}".format(product.id, order_model.id))
-            except Exception:
-                item_model = OrderItem(
-                    order=order_model,
-                    product=product,
-                    quantity=int(item['quantity']),
-                )
-                item_model.save()
+        order['merchant_order_reference'] = order_ids[order_key]
+        order_products = set()
+        for item in order_items:
+            if item['retailer_id'] in order_products:
+                print("item product id {} already on order with id {}".format(item['retailer_id'], order_ids[order_key]))
+                continue
+            order_products.add(item['retailer_id'])
+            items.append(OrderItem(
+                order_id=order_ids[order_key],
+                product=products[item['retailer_id']],
+                quantity=int(item['quantity']),
+            ))
+    OrderItem.bulk_create_validated(items)
+    print("wrote {} new orders with {} items".format(len(new_orders), len(items)))
 
 
 def fetch_and_ack_orders_by_id(store_id):
@@ -310,7 +383,7 @@ def fetch_and_ack_orders(store):
     except Exception as e:
         # only if something went wrong in the try block.  "normal" failures,
         # like if only some orders were successfully acked, are not handled here
-        [delete_order(order['id']) for order in orders_to_ack]
+        delete_orders([order['id'] for order in orders_to_ack])
         raise e
     return fetched_orders, acked_orders
 
@@ -348,14 +421,9 @@ def fulfill_order(order:Order, carrier, tracking_number, items=None):
     url = settings.BASE_API_URL + order.ext_order_id + '/shipments'
     body = {
         'access_token': token,
-        'items': items or get_order_items(order),
-        'tracking_info': {
-            'carrier': carrier,
-            'tracking_number': tracking_number,
-        },
-        'idempotency_key': get_idempotency_key(),
+        **get_fulfillment_body(order, carrier, tracking_number, items),
     }
-    res = requests.post(url, json=body)
+    res = graph_post(url, json=body, rate_limit_scope=get_page_scope(fb_meta.fbe_page_id))
     data = res.json()
     if not data.get("success", False):
         print(json.dumps(res.json(), indent=2))
@@ -366,6 +434,25 @@ def fulfill_order(order:Order, carrier, tracking_number, items=None):
     return order, data
 
 
+def get_fulfillment_body(order, carrier, tracking_number, items=None):
+    ''' params of an order shipment, without the access token
+
+    params:
+    order: the Order to fulfill
+    carrier: the shipping carrier
+    tracking_number: tracking number from the carrier
+    items: the subset of items this particular fulfillment is for, all order items by default
+    '''
+    return {
+        'items': items or get_order_items(order),
+        'tracking_info': {
+            'carrier': carrier,
+            'tracking_number': tracking_number,
+        },
+        'idempotency_key': get_idempotency_key(),
+    }
+
+
 def get_order_items(order):
     ''' get retailer_id and quantity for all items in an order
 
@@ -375,7 +462,7 @@ def get_order_items(order):
     items: list of dicts of product ids and quantities of said product in the order
     '''
     items = OrderItem.objects.filter(order=order)
-    items = [{"retailer_id": i.product.id, "quantity": i.quantity} for i in items]
+    items = [{"retailer_id": i.product_id, "quantity": i.quantity} for i in items]
     return items
 
 
@@ -412,6 +499,25 @@ def cancel_order(order, cancel_reason:CancellationReasonCode, restock_items:bool
     url = settings.BASE_API_URL + order.ext_order_id + '/cancellations'
     body = {
         'access_token': token,
+        **get_cancellation_body(cancel_reason, restock_items, items),
+    }
+    res = graph_post(url, json=body, rate_limit_scope=get_page_scope(fb_meta.fbe_page_id))
+    data = res.json()
+    if not data.get("success", False):
+        print(json.dumps(res.json(), indent=2))
+        return None, None
+
+    with transaction.atomic():
+        update_order_cancel_state(order, OrderCancellationState.FULLY_CANCELLED)
+        update_order_state(order, OrderStatus.COMPLETED)
+        if restock_items:
+            record_order_inventory_changes([order], InventoryChangeReason.RESTOCK)
+    return order, data
+
+
+def get_cancellation_body(cancel_reason:CancellationReasonCode, restock_items:bool = False, items=None):
+    ''' params of an order cancellation, without the access token. see cancel_order '''
+    body = {
         'idempotency_key': get_idempotency_key(),
         'cancel_reason': {
             'reason_code': str(cancel_reason.name),
@@ -421,15 +527,7 @@ def cancel_order(order, cancel_reason:CancellationReasonCode, restock_items:bool
     }
     if items:
         body['items'] = items
-    res = requests.post(url, json=body)
-    data = res.json()
-    if not data.get("success", False):
-        print(json.dumps(res.json(), indent=2))
-        return None, None
-
-    update_order_cancel_state(order, OrderCancellationState.FULLY_CANCELLED)
-    update_order_state(order, OrderStatus.COMPLETED)
-    return order, data
+    return body
 
 
 def refund_order_by_id(order_id, reason_code, items=None):
@@ -463,12 +561,9 @@ def refund_order(order, reason_code, items=None):
     url = settings.BASE_API_URL + order.ext_order_id + '/refunds'
     body = {
         'access_token': token,
-        'idempotency_key': get_idempotency_key(),
-        'reason_code': reason_code,
+        **get_refund_body(reason_code, items),
     }
-    if items:
-        body['items'] = items
-    res = requests.post(url, json=body)
+    res = graph_post(url, json=body, rate_limit_scope=get_page_scope(fb_meta.fbe_page_id))
     data = res.json()
     if not data.get("success", False):
         print(json.dumps(res.json(), indent=2))
@@ -477,3 +572,188 @@ def refund_order(order, reason_code, items=None):
     update_order_refund_state(order, OrderRefundState.FULLY_REFUNDED)
     update_order_state(order, OrderStatus.COMPLETED)
     return order, data
+
+
+def get_refund_body(reason_code, items=None):
+    ''' params of an order refund, without the access token. see refund_order '''
+    body = {
+        'idempotency_key': get_idempotency_key(),
+        'reason_code': reason_code,
+    }
+    if items:
+        body['items'] = items
+    return body
+
+
+def post_order_actions(actions):
+    ''' POST order actions with Graph batch calls, one batch of up to
+    settings.GRAPH_BATCH_MAX_REQUESTS actions per call instead of one call per order
+
+    params:
+    actions: list of (order, edge, body) tuples, such as (order, 'shipments', get_fulfillment_body(...))
+    returns:
+    results: list of the response data of each successful action, None for failed ones and for the
+             actions of stores without FB metadata, in the order of actions
+    '''
+    results = [None] * len(actions)
+    # orders of different stores are sent with their store's token
+    actions_by_store = {}
+    for index, (order, edge, body) in enumerate(actions):
+        actions_by_store.setdefault(order.store_id, []).append((index, order, edge, body))
+    # looked up before any action is sent, so a store that can not be sent for does not stop
+    # the local updates of the actions already applied on FB for other stores
+    fb_metas = FacebookMetadata.objects.in_bulk(list(actions_by_store), field_name="store_id")
+    for store_id, store_actions in actions_by_store.items():
+        fb_meta = fb_metas.get(store_id)
+        if fb_meta is None or not fb_meta.token_info:
+            print("store id {} doesnot have metadata or token info, {} order actions not sent".format(
+                store_id, len(store_actions)
+            ))
+            continue
+        batch_requests = [
+            get_batch_request('POST', order.ext_order_id + '/' + edge, body)
+            for _, order, edge, body in store_actions
+        ]
+        responses = graph_batch(batch_requests, fb_meta.token_info, get_page_scope(fb_meta.fbe_page_id))
+        for (index, order, edge, _), (code, data) in zip(store_actions, responses):
+            if data and data.get("success", False):
+                results[index] = data
+            else:
+                print("order {} {} failed ({}): {}".format(order.id, edge, code, json.dumps(data)))
+    return results
+
+
+def fulfill_orders(fulfillments:List):
+    ''' Fulfil orders in bulk through Graph batch calls
+    the local state of all orders fulfilled on FB is updated in one transaction
+    NOTE: currently only fulfills orders COMPLETELY
+
+    params:
+    fulfillments: list of (order, carrier, tracking_number) or (order, carrier, tracking_number, items) tuples
+    returns:
+    results: list of (order, data) tuples for each fulfillment, (None, None) for the failed ones
+    '''
+    actions = [
+        (fulfillment[0], 'shipments', get_fulfillment_body(*fulfillment))
+        for fulfillment in fulfillments
+    ]
+    results = post_order_actions(actions)
+    fulfilled = [(order, data) for (order, _, _), data in zip(actions, results) if data]
+    fulfilled_orders = [order for order, _ in fulfilled]
+    with transaction.atomic():
+        record_order_inventory_changes(fulfilled_orders, InventoryChangeReason.FULFILLMENT)
+        for order in fulfilled_orders:
+            order.order_fulfillment_state = OrderFulfillmentState.FULLY_FULFILLED
+            order.order_status = OrderStatus.COMPLETED
+        # the states are choices constants, the orders do not need validating again
+        Order.objects.bulk_update(fulfilled_orders, ['order_fulfillment_state', 'order_status'])
+    return [(order, data) if data else (None, None) for (order, _, _), data in zip(actions, results)]
+
+
+def get_orders_by_id(order_ids:List):
+    ''' look up orders by id with one query, reporting the ids that do not exist
+
+    params:
+    order_ids: ids of the Orders
+    returns:
+    orders: dict of the Orders that exist, by id
+    '''
+    orders = Order.objects.in_bulk(order_ids)
+    missing = [order_id for order_id in order_ids if order_id not in orders]
+    if missing:
+        print("orders {} do not exist, skipping them".format(missing))
+    return orders
+
+
+def get_results_by_id(order_ids:List, orders:Dict, results:List):
+    # results of the orders that exist, spread back over all ids with (None, None) for the missing ones
+    results = iter(results)
+    return [next(results) if order_id in orders else (None, None) for order_id in order_ids]
+
+
+def fulfill_orders_by_id(fulfillments:List):
+    ''' Fulfil orders in bulk by id, see fulfill_orders
+    ids of orders that do not exist are skipped, and get (None, None) results
+
+    params:
+    fulfillments: list of (order_id, carrier, tracking_number) or (order_id, carrier, tracking_number, items)
+    '''
+    order_ids = [fulfillment[0] for fulfillment in fulfillments]
+    orders = get_orders_by_id(order_ids)
+    results = fulfill_orders([
+        (orders[fulfillment[0]], *fulfillment[1:]) for fulfillment in fulfillments if fulfillment[0] in orders
+    ])
+    return get_results_by_id(order_ids, orders, results)
+
+
+def cancel_orders(orders:List[Order], cancel_reason:CancellationReasonCode, restock_items:bool = False):
+    ''' Cancel orders in bulk through Graph batch calls
+    the local state of all orders cancelled on FB is updated in one transaction
+    NOTE: currently only cancels orders COMPLETELY
+
+    params:
+    orders: the Orders to cancel
+    cancel_reason: CancellationReasonCode
+    restock_items: set True if inventory should be restocked on successful cancel
+    returns:
+    results: list of (order, data) tuples for each order, (None, None) for the failed ones
+    '''
+    results = post_order_actions([
+        (order, 'cancellations', get_cancellation_body(cancel_reason, restock_items)) for order in orders
+    ])
+    cancelled_orders = [order for order, data in zip(orders, results) if data]
+    with transaction.atomic():
+        if restock_items:
+            record_order_inventory_changes(cancelled_orders, InventoryChangeReason.RESTOCK)
+        for order in cancelled_orders:
+            order.order_cancellation_state = OrderCancellationState.FULLY_CANCELLED
+            order.order_status = OrderStatus.COMPLETED
+        # the states are choices constants, the orders do not need validating again
+        Order.objects.bulk_update(cancelled_orders, ['order_cancellation_state', 'order_status'])
+    return [(order, data) if data else (None, None) for order, data in zip(orders, results)]
+
+
+def cancel_orders_by_id(order_ids:List, cancel_reason, restock_items:bool = False):
+    ''' Cancel orders in bulk by id, see cancel_orders
+    ids of orders that do not exist are skipped, and get (None, None) results
+
+    params:
+    order_ids: ids of the Orders to cancel
+    cancel_reason: name of the CancellationReasonCode
+    restock_items: set True if inventory should be restocked on successful cancel
+    '''
+    orders = get_orders_by_id(order_ids)
+    results = cancel_orders(
+        [orders[order_id] for order_id in order_ids if order_id in orders], CancellationReasonCode[cancel_reason], restock_items
+    )
+    return get_results_by_id(order_ids, orders, results)
+
+
+def refund_orders(orders:List[Order], reason_code):
+    ''' Refund orders in bulk through Graph batch calls
+    the local state of all orders refunded on FB is updated in one transaction
+    NOTE: currently only refunds orders COMPLETELY
+
+    params:
+    orders: the Orders to refund
+    reason_code: refund reason code
+    returns:
+    results: list of (order, data) tuples for each order, (None, None) for the failed ones
+    '''
+    results = post_order_actions([(order, 'refunds', get_refund_body(reason_code)) for order in orders])
+    refunded_orders = [order for order, data in zip(orders, results) if data]
+    for order in refunded_orders:
+        order.order_refund_state = OrderRefundState.FULLY_REFUNDED
+        order.order_status = OrderStatus.COMPLETED
+    # the states are choices constants, the orders do not need validating again
+    Order.objects.bulk_update(refunded_orders, ['order_refund_state', 'order_status'])
+    return [(order, data) if data else (None, None) for order, data in zip(orders, results)]
+
+
+def refund_orders_by_id(order_ids:List, reason_code):
+    ''' Refund orders in bulk by id, see refund_orders
+    ids of orders that do not exist are skipped, and get (None, None) results
+    '''
+    orders = get_orders_by_id(order_ids)
+    results = refund_orders([orders[order_id] for order_id in order_ids if order_id in orders], reason_code)
+    return get_results_by_id(order_ids, orders, results)
@@ -0,0 +1,165 @@
+# Copyright 2004-present, Facebook. All Rights Reserved.
+import json
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+
+from core.models.utils import datetime_utc_now_with_tz
+from shop.models import Store
+from catalog.models import Product
+from catalog.utils.synthetic import SYNTHETIC_BATCH_SIZE, get_zipf_cum_weights
+from order.models import Customer, Order, OrderItem
+from order.models.choices import OrderCancellationState, OrderFulfillmentState, OrderRefundState, OrderStatus
+
+SYNTHETIC_FIRST_NAMES = ("Alex", "Sam", "Maria", "Wei", "Priya", "Jordan", "Fatima", "Lucas", "Emma", "Kenji", "Ana", "Noah")
+SYNTHETIC_LAST_NAMES = ("Smith", "Garcia", "Chen", "Patel", "Kim", "Müller", "Silva", "Nguyen", "Johnson", "Rossi")
+SYNTHETIC_COUNTRIES = (("US", 60), ("CA", 10), ("GB", 10), ("AU", 5), ("DE", 5), ("FR", 5), ("MX", 5))
+# orders placed in the last days are still being processed, older ones are completed
+SYNTHETIC_OPEN_ORDER_DAYS = 3
+
+
+def get_store_product_ids(store: Store):
+    ''' ids of the products in a store's catalog, standalone and variants, in a stable order '''
+    return sorted(
+        Product.objects.filter(
+            Q(catalogitem__catalog=store.catalog_id) | Q(product_group__catalogitemgroup__catalog=store.catalog_id)
+        ).values_list("id", flat=True).distinct()
+    )
+
+
+def get_synthetic_order_states(rng, age):
+    ''' order status, fulfillment, cancellation and refund states of an order placed `age` ago '''
+    if age < timedelta(days=SYNTHETIC_OPEN_ORDER_DAYS):
+        status = rng.choices([OrderStatus.FB_CREATED, OrderStatus.CONFIRMED_ORDER, OrderStatus.IN_PROGRESS], [2, 5, 3])[0]
+        return status, OrderFulfillmentState.NO_FULFILLMENT, OrderCancellationState.NO_CANCELLATION, OrderRefundState.NO_REFUNDS
+    roll = rng.random()
+    if roll < 0.06:
+        return (
+            OrderStatus.COMPLETED, OrderFulfillmentState.NO_FULFILLMENT,
+            OrderCancellationState.FULLY_CANCELLED, OrderRefundState.NO_REFUNDS,
+        )
+    refund_state = OrderRefundState.FULLY_REFUNDED if roll < 0.10 else OrderRefundState.NO_REFUNDS
+    return OrderStatus.COMPLETED, OrderFulfillmentState.FULLY_FULFILLED, OrderCancellationState.NO_CANCELLATION, refund_state
+
+
+def generate_orders(store: Store, orders, customers=None, days=365, end=None, seed=0, batch_size=None):
+    ''' add `orders` synthetic orders of `customers` synthetic customers to a store, with bulk inserts
+    the same seed and end always generate the same orders. order items are picked from the products
+    of the store's catalog by zipf popularity, customers place a zipf distributed number of orders,
+    most orders have a single item of quantity 1, and orders are spread over the `days` before `end`,
+    completed, cancelled or refunded if they are older than a few days.
+    inventory is not decremented for the orders.
+
+    params:
+    store: store the orders are placed with, with products in its catalog
+    orders: number of orders to create
+    customers: number of customers to create. defaults to a third of the orders
+    days: number of days the orders are spread over
+    end: datetime of the most recent order. defaults to the start of today (UTC)
+    seed: seed of the random values
+    batch_size: rows per bulk insert and transaction. defaults to SYNTHETIC_BATCH_SIZE
+    returns:
+    summary: dict with the number of customers, orders and order items created
+    '''
+    batch_size = batch_size or SYNTHETIC_BATCH_SIZE
+    customers = customers or max(orders // 3, 1)
+    end = end or datetime_utc_now_with_tz().replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(seed)
+    if Order.objects.filter(store=store, ext_order_id="synthetic_{}_0".format(store.id)).exists():
+        raise Exception("store [{}] already has synthetic orders".format(store.name))
+    product_ids = get_store_product_ids(store)
+    if not product_ids:
+        raise Exception("store [{}] has no products to order".format(store.name))
+    # popularity rank of each product
+    rng.shuffle(product_ids)
+    product_weights = get_zipf_cum_weights(len(product_ids), 0.9)
+    summary = {"customers": 0, "orders": 0, "items": 0}
+
+    customer_ids = []
+    for start in range(0, customers, batch_size):
+        customer_ids += write_synthetic_customers(store, rng, range(start, min(start + batch_size, customers)))
+        summary["customers"] = len(customer_ids)
+    print("store [{}] synthetic orders: {} customers".format(store.name, summary["customers"]))
+    customer_weights = get_zipf_cum_weights(len(customer_ids), 0.5)
+
+    for start in range(0, orders, batch_size):
+        batch = []
+        for n in range(start, min(start + batch_size, orders)):
+            age = timedelta(seconds=rng.uniform(0, days * 86400))
+            status, fulfillment_state, cancellation_state, refund_state = get_synthetic_order_states(rng, age)
+            order = Order(
+                store=store,
+                customer_id=rng.choices(customer_ids, cum_weights=customer_weights)[0],
+                ext_order_id="synthetic_{}_{}".format(store.id, n),
+                order_status=status,
+                order_fulfillment_state=fulfillment_state,
+                order_cancellation_state=cancellation_state,
+                order_refund_state=refund_state,
+                created=end - age,
+                last_updated=min(end - age + timedelta(days=rng.uniform(0, 5)), end),
+            )
+            # mostly a single item, sometimes a basket of a few
+            item_count = 1
+            while item_count < 10 and rng.random() < 0.3:
+                item_count += 1
+            items = {
+                product_id: rng.choices([1, 2, 3, 4, 5], [85, 10, 3, 1, 1])[0]
+                for product_id in rng.choices(product_ids, cum_weights=product_weights, k=item_count)
+            }
+            batch.append((order, items))
+        write_synthetic_orders(store, batch, summary)
+    return summary
+
+
+@transaction.atomic
+def write_synthetic_customers(store, rng, numbers):
+    ''' bulk insert synthetic customers, returns their ids '''
+    new_customers = []
+    for n in numbers:
+        first_name, last_name = rng.choice(SYNTHETIC_FIRST_NAMES), rng.choice(SYNTHETIC_LAST_NAMES)
+        country = rng.choices([c for c, _ in SYNTHETIC_COUNTRIES], [share for _, share in SYNTHETIC_COUNTRIES])[0]
+        new_customers.append(Customer(
+            store=store,
+            full_name="{} {}".format(first_name, last_name),
+            email="synthetic.{}.{}@example.com".format(store.id, n),
+            # same format as the shipping address write_orders stores
+            addr=json.dumps({
+                "name": "{} {}".format(first_name, last_name),
+                "street1": "{} Main St".format(rng.randint(1, 9999)),
+                "city": "City {}".format(rng.randint(1, 500)),
+                "postal_code": "{:05d}".format(rng.randint(0, 99999)),
+                "country": country,
+            }),
+        ))
+    Customer.objects.bulk_create(new_customers)
+    # primary keys are not set by bulk_create on every db, read them back
+    ids = dict(Customer.objects.filter(store=store, email__in=[c.email for c in new_customers]).values_list("email", "id"))
+    return [ids[customer.email] for customer in new_customers]
+
+
+@transaction.atomic
+def write_synthetic_orders(store, batch, summary):
+    ''' bulk insert a batch of synthetic orders and their items
+
+    params:
+    store: store of the orders
+    batch: list of (unsaved Order, dict of product id to quantity)
+    summary: summary of generate_orders, updated with the orders and items written
+    '''
+    Order.objects.bulk_create([order for order, _ in batch])
+    # primary keys are not set by bulk_create on every db, read them back
+    order_ids = dict(
+        Order.objects.filter(store=store, ext_order_id__in=[order.ext_order_id for order, _ in batch])
+        .values_list("ext_order_id", "id")
+    )
+    items = [
+        OrderItem(order_id=order_ids[order.ext_order_id], product_id=product_id, quantity=quantity)
+        for order, order_items in batch
+        for product_id, quantity in order_items.items()
+    ]
+    OrderItem.objects.bulk_create(items)
+    summary["orders"] += len(batch)
+    summary["items"] += len(items)
+    print("store [{}] synthetic orders: {} orders, {} items".format(store.name, summary["orders"], summary["items"]))